@@ -23,9 +23,10 @@ const HistoryPage = () => {
   const [filterGender, setFilterGender] = useState('all');
   const [dateRange, setDateRange] = useState(null);
 
+  // Risk level and date range are filtered server-side
   useEffect(() => {
     fetchHistory();
-  }, []);
+  }, [filterRisk, dateRange]);
 
   // Debounce search text
   useEffect(() => {
@@ -40,14 +41,29 @@ const HistoryPage = () => {
 
   useEffect(() => {
     applyFilters();
-  }, [history, debouncedSearchText, filterRisk, filterGender, dateRange]);
+  }, [history, debouncedSearchText, filterGender]);
 
   const fetchHistory = async () => {
     setLoading(true);
     try {
-      const response = await api.getPredictionHistory();
-      setHistory(response.data);
-      setFilteredHistory(response.data);
+      const params = { limit: 1000 };
+      if (filterRisk !== 'all') {
+        params.riskLevel = filterRisk;
+      }
+      if (dateRange && dateRange.length === 2) {
+        params.dateFrom = dateRange[0].toDate().toISOString();
+        params.dateTo = dateRange[1].toDate().toISOString();
+      }
+      // Search and gender are filtered here, so follow nextCursor until every match is loaded
+      let records = [];
+      let cursor = null;
+      do {
+        const response = await api.getPredictionHistory(cursor ? { ...params, cursor } : params);
+        records = records.concat(response.data);
+        cursor = response.nextCursor;
+      } while (cursor);
+      setHistory(records);
+      setFilteredHistory(records);
     } catch (error) {
       message.error('Không thể tải lịch sử chuẩn đoán');
       console.error('Fetch history error:', error);
@@ -68,25 +84,11 @@ const HistoryPage = () => {
       );
     }
 
-    // Filter by risk level
-    if (filterRisk !== 'all') {
-      filtered = filtered.filter(item => item.prediction === filterRisk);
-    }
-
     // Filter by gender
     if (filterGender !== 'all') {
       filtered = filtered.filter(item => item.gender === filterGender);
     }
 
-    // Filter by date range
-    if (dateRange && dateRange.length === 2) {
-      const [startDate, endDate] = dateRange;
-      filtered = filtered.filter(item => {
-        const itemDate = new Date(item.createdAt);
-        return itemDate >= startDate.toDate() && itemDate <= endDate.toDate();
-      });
-    }
-
     setFilteredHistory(filtered);
   };
 
@@ -190,9 +192,9 @@ const HistoryPage = () => {
     }
   };
 
-  const handleDelete = async (index) => {
+  const handleDelete = async (id) => {
     try {
-      await api.deleteHistoryItem(index);
+      await api.deleteHistoryItem(id);
       message.success('Đã xóa bản ghi thành công!');
       fetchHistory(); // Reload history
     } catch (error) {
@@ -302,7 +304,7 @@ const HistoryPage = () => {
       width: 180,
       fixed: 'right',
       align: 'center',
-      render: (_, record, index) => (
+      render: (_, record) => (
         <Space size="small">
           <Button
             type="primary"
@@ -315,7 +317,7 @@ const HistoryPage = () => {
           <Popconfirm
             title="Xóa bản ghi này?"
             description="Bạn có chắc chắn muốn xóa bản ghi chuẩn đoán này?"
-            onConfirm={() => handleDelete(index)}
+            onConfirm={() => handleDelete(record.id)}
             okText="Xóa"
             cancelText="Hủy"
             okButtonProps={{ danger: true }}
@@ -495,7 +497,7 @@ const HistoryPage = () => {
           columns={columns}
           dataSource={filteredHistory}
           loading={loading}
-          rowKey={(record, index) => `${record.createdAt}-${index}`}
+          rowKey={(record, index) => record.id || `${record.createdAt}-${index}`}
           locale={{
             emptyText: searchText || filterRisk !== 'all' || filterGender !== 'all' || dateRange
               ? 'Không tìm thấy kết quả phù hợp với bộ lọc'
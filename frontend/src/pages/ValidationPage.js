@@ -1,5 +1,5 @@
-import React, { useState, useEffect } from 'react';
-import { Card, Button, InputNumber, message, Spin, Alert, Table, Statistic, Row, Col, Divider, Tag, Progress, Radio } from 'antd';
+import React, { useState, useEffect, useRef } from 'react';
+import { Card, Button, InputNumber, message, Spin, Alert, Table, Statistic, Row, Col, Divider, Tag, Progress, Radio, Select, Switch } from 'antd';
 import { ThunderboltOutlined, DatabaseOutlined, LineChartOutlined, CheckCircleOutlined, ExperimentOutlined } from '@ant-design/icons';
 import api from '../services/api';
 
@@ -7,12 +7,20 @@ const ValidationPage = () => {
   const [loading, setLoading] = useState(false);
   const [validationMethod, setValidationMethod] = useState('kfold'); // 'kfold' or 'holdout'
   const [kFolds, setKFolds] = useState(5);
+  const [cvMode, setCvMode] = useState('stratified');
+  const [repeats, setRepeats] = useState(3);
+  const [racing, setRacing] = useState(false);
   const [testSize, setTestSize] = useState(20); // Percentage
   const [results, setResults] = useState(null);
   const [datasetInfo, setDatasetInfo] = useState(null);
+  const [jobId, setJobId] = useState(null);
+  const [progress, setProgress] = useState({ percent: 0, message: '' });
+  const eventsRef = useRef(null);
 
   useEffect(() => {
     fetchDatasetInfo();
+    // The job keeps running on the server when the page is left; only the stream is closed
+    return () => eventsRef.current && eventsRef.current.close();
   }, []);
 
   const fetchDatasetInfo = async () => {
@@ -24,6 +32,27 @@ const ValidationPage = () => {
     }
   };
 
+  const finishValidation = async (id) => {
+    try {
+      const job = await api.getValidationJob(id);
+      if (job.status === 'succeeded') {
+        setResults(job.result);
+        message.success(job.result.method === 'holdout'
+          ? `Hoàn thành Holdout Validation với ${testSize}% test data!`
+          : `Hoàn thành K-Fold Cross Validation với K=${job.result.k_folds}!`);
+      } else if (job.status === 'cancelled') {
+        message.warning(job.message);
+      } else {
+        message.error('Không thể thực hiện validation: ' + (job.error || job.message));
+      }
+    } catch (error) {
+      message.error('Không thể thực hiện validation: ' + (error.response?.data?.error || error.message));
+    } finally {
+      setLoading(false);
+      setJobId(null);
+    }
+  };
+
   const handleValidation = async () => {
     if (validationMethod === 'kfold') {
       if (kFolds < 2 || kFolds > 20) {
@@ -34,25 +63,48 @@ const ValidationPage = () => {
 
     setLoading(true);
     setResults(null);
+    setProgress({ percent: 0, message: '' });
 
     try {
-      let response;
-      if (validationMethod === 'kfold') {
-        response = await api.kfoldValidation(kFolds);
-        message.success(`Hoàn thành K-Fold Cross Validation với K=${kFolds}!`);
-      } else {
-        response = await api.holdoutValidation(testSize / 100);
-        message.success(`Hoàn thành Holdout Validation với ${testSize}% test data!`);
-      }
-      setResults(response);
+      const options = validationMethod === 'kfold'
+        ? { method: 'kfold', k_folds: kFolds, cv: cvMode, repeats, racing }
+        : { method: 'holdout', test_size: testSize / 100 };
+      const { jobId: id } = await api.startValidationJob(options);
+      setJobId(id);
+
+      // Results of each algorithm are shown as soon as its folds are done
+      const events = api.watchValidationJob(id);
+      eventsRef.current = events;
+      events.addEventListener('progress', (e) => {
+        const event = JSON.parse(e.data);
+        setProgress({ percent: event.progress, message: event.message });
+        if (event.stage === 'algorithm') {
+          setResults((prev) => ({
+            ...(prev || { method: validationMethod === 'kfold' ? 'k_fold' : 'holdout', k_folds: kFolds }),
+            partial: true,
+            results: { ...(prev?.results || {}), [event.algorithm]: event.result },
+          }));
+        }
+      });
+      events.addEventListener('end', () => {
+        events.close();
+        finishValidation(id);
+      });
     } catch (error) {
       message.error('Không thể thực hiện validation: ' + (error.response?.data?.error || error.message));
       console.error('Validation error:', error);
-    } finally {
       setLoading(false);
     }
   };
 
+  const handleCancel = async () => {
+    try {
+      await api.cancelValidationJob(jobId);
+    } catch (error) {
+      message.error('Không thể hủy validation: ' + (error.response?.data?.error || error.message));
+    }
+  };
+
   const getMetricColor = (value) => {
     if (value >= 0.9) return '#52c41a'; // Green
     if (value >= 0.8) return '#1890ff'; // Blue
@@ -72,6 +124,11 @@ const ValidationPage = () => {
       render: (text, record) => (
         <div>
           <Tag color="blue" style={{ fontSize: 14 }}>{text}</Tag>
+          {record.eliminated && (
+            <Tag color="default" style={{ marginTop: 4 }}>
+              Dừng sau {record.eliminated.afterFolds} folds
+            </Tag>
+          )}
           {record.error && (
             <div style={{ marginTop: 8 }}>
               <Alert 
@@ -392,6 +449,7 @@ const ValidationPage = () => {
         roc_auc_mean: metrics.roc_auc?.mean || 0,
         roc_auc_std: metrics.roc_auc?.std || 0,
         train_accuracy_mean: metrics.train_accuracy?.mean || 0,
+        eliminated: metrics.eliminated,
         foldDetails,
       };
     });
@@ -514,6 +572,27 @@ const ValidationPage = () => {
                     <> ({Math.round(datasetInfo.total_rows / kFolds)} mẫu/fold)</>
                   )}
                 </div>
+                <label style={{ display: 'block', margin: '16px 0 8px', fontWeight: 'bold' }}>
+                  Cách chia folds:
+                </label>
+                <Select value={cvMode} onChange={setCvMode} style={{ width: '100%' }} size="large" disabled={loading}
+                  options={[
+                    { value: 'stratified', label: 'Stratified K-Fold (giữ tỷ lệ stroke trong mỗi fold)' },
+                    { value: 'repeated_stratified', label: 'Repeated Stratified K-Fold' },
+                    { value: 'nested', label: 'Nested CV (tối ưu tham số trong mỗi fold)' },
+                    { value: 'kfold', label: 'K-Fold thường' },
+                  ]}
+                />
+                {cvMode === 'repeated_stratified' && (
+                  <InputNumber min={1} max={10} value={repeats} onChange={setRepeats} addonBefore="Số lần lặp"
+                    style={{ width: '100%', marginTop: 8 }} disabled={loading} />
+                )}
+                <div style={{ marginTop: 16 }}>
+                  <Switch checked={racing} onChange={setRacing} disabled={loading} />
+                  <span style={{ marginLeft: 8 }}>
+                    Racing: dừng sớm thuật toán có ROC AUC chắc chắn thấp hơn thuật toán dẫn đầu
+                  </span>
+                </div>
               </div>
             ) : (
               <div>
@@ -573,11 +652,14 @@ const ValidationPage = () => {
             <p style={{ color: '#666' }}>
               Quá trình này có thể mất vài phút tùy thuộc vào cấu hình và độ phức tạp của models.
             </p>
+            <Progress percent={Math.round(progress.percent)} status="active" style={{ maxWidth: 500 }} />
+            <p style={{ color: '#666' }}>{progress.message}</p>
+            {jobId && <Button danger onClick={handleCancel}>Hủy</Button>}
           </Card>
         )}
 
         {/* Results */}
-        {results && !loading && (
+        {results && (
           <>
             <Divider orientation="left" style={{ fontSize: 18, fontWeight: 'bold' }}>
               <CheckCircleOutlined style={{ color: '#52c41a', marginRight: 8 }} />
@@ -586,11 +668,14 @@ const ValidationPage = () => {
 
             <Alert
               message={
-                results.method === 'holdout' 
+                results.partial
+                  ? `Đã có kết quả của ${Object.keys(results.results).length} thuật toán, đang chạy tiếp...`
+                  : results.method === 'holdout' 
                   ? `Hoàn thành Holdout Validation: ${results.train_samples || 0} mẫu train, ${results.test_samples || 0} mẫu test`
-                  : `Hoàn thành K-Fold với K=${results.k_folds} trên ${results.dataset_size} mẫu dữ liệu`
+                  : `Hoàn thành K-Fold với K=${results.k_folds} (${results.total_folds || results.k_folds} folds) trên ${results.dataset_size} mẫu dữ liệu`
+                    + (results.racing ? ` - racing: ${results.racing.fits}/${results.racing.fitsTotal} lần fit` : '')
               }
-              type="success"
+              type={results.partial ? 'info' : 'success'}
               showIcon
               style={{ marginBottom: 16 }}
             />
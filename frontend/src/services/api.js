@@ -39,18 +39,29 @@ const api = {
     return apiClient.post('/predictions/predict', data);
   },
 
-  getPredictionHistory: () => {
-    return apiClient.get('/predictions/history');
+  // params: { citizenId, dateFrom, dateTo, riskLevel, limit, cursor }
+  getPredictionHistory: (params = {}) => {
+    return apiClient.get('/predictions/history', { params });
   },
 
-  deleteHistoryItem: (index) => {
-    return apiClient.delete(`/predictions/history/${index}`);
+  deleteHistoryItem: (id) => {
+    return apiClient.delete(`/predictions/history/${id}`);
+  },
+
+  // payload: { ids: [...] } or { filter: { citizenId, dateFrom, dateTo, riskLevel } }
+  deleteHistoryItems: (payload) => {
+    return apiClient.post('/predictions/history/delete', payload);
   },
 
   clearAllHistory: () => {
     return apiClient.delete('/predictions/history');
   },
 
+  // Real outcome of a past prediction (stroke: 0 | 1), used by incremental training
+  labelHistoryItem: (id, stroke) => {
+    return apiClient.post(`/predictions/history/${id}/label`, { stroke });
+  },
+
   // Config endpoints
   getConfig: () => {
     return apiClient.get('/config');
@@ -69,23 +80,76 @@ const api = {
   },
 
   // Training endpoints
-  trainModels: () => {
-    return apiClient.post('/train');
+  // options: { config, algorithms, cvFolds, timeout, configs | grid, publish }
+  trainModels: (options = {}) => {
+    return apiClient.post('/train', options);
   },
 
   getTrainingStatus: () => {
     return apiClient.get('/train/status');
   },
 
+  // params: { limit, status }
+  getTrainingJobs: (params = {}) => {
+    return apiClient.get('/train/jobs', { params });
+  },
+
+  getTrainingJob: (id) => {
+    return apiClient.get(`/train/jobs/${id}`);
+  },
+
+  cancelTrainingJob: (id) => {
+    return apiClient.post(`/train/jobs/${id}/cancel`);
+  },
+
+  publishTrainingJob: (id) => {
+    return apiClient.post(`/train/jobs/${id}/publish`);
+  },
+
+  // Server-sent events (status / progress / end) for one job
+  watchTrainingJob: (id) => {
+    return new EventSource(`${API_BASE_URL}/api/${API_VERSION}/train/jobs/${id}/events`);
+  },
+
+  // Hyperparameter search, e.g. { strategy: 'halving', algorithms, nCandidates, cvFolds, metric };
+  // progress and leaderboards arrive through watchTrainingJob(jobId)
+  searchHyperparameters: (options = {}) => {
+    return apiClient.post('/search', options);
+  },
+
+  // options: { algorithms, train }
+  promoteSearch: (id, options = {}) => {
+    return apiClient.post(`/search/${id}/promote`, options);
+  },
+
   // Validation endpoints
-  kfoldValidation: (k_folds) => {
-    return apiClient.post('/validation/kfold', { k_folds });
+  // options: { cv: 'stratified' | 'repeated_stratified' | 'nested' | 'kfold', repeats, racing, configs }
+  kfoldValidation: (k_folds, options = {}) => {
+    return apiClient.post('/validation/kfold', { k_folds, ...options });
   },
 
   holdoutValidation: (test_size = 0.2) => {
     return apiClient.post('/validation/holdout', { test_size });
   },
 
+  // Background validation, e.g. { method: 'kfold', k_folds: 5, cv: 'stratified' } or { method: 'holdout', test_size: 0.2 };
+  // per-fold and per-algorithm results arrive through watchValidationJob(jobId)
+  startValidationJob: (options = {}) => {
+    return apiClient.post('/validation/jobs', options);
+  },
+
+  getValidationJob: (id) => {
+    return apiClient.get(`/validation/jobs/${id}`);
+  },
+
+  cancelValidationJob: (id) => {
+    return apiClient.post(`/validation/jobs/${id}/cancel`);
+  },
+
+  watchValidationJob: (id) => {
+    return new EventSource(`${API_BASE_URL}/api/${API_VERSION}/validation/jobs/${id}/events`);
+  },
+
   getDatasetInfo: () => {
     return apiClient.get('/validation/dataset/info');
   },
@@ -1,5 +1,6 @@
 import os
-from flask import Flask
+import time
+from flask import Flask, g, request
 from flask_cors import CORS
 
 
@@ -18,10 +19,37 @@ def create_app():
     from .routes.predictions import predictions_bp
     from .routes.config import config_bp
     from .routes.validation import validation_bp
+    from .routes.training import training_bp
 
     app.register_blueprint(predictions_bp, url_prefix=f"/api/{app.config['API_VERSION']}/predictions")
     app.register_blueprint(config_bp, url_prefix=f"/api/{app.config['API_VERSION']}")
     app.register_blueprint(validation_bp, url_prefix=f"/api/{app.config['API_VERSION']}/validation")
+    app.register_blueprint(training_bp, url_prefix=f"/api/{app.config['API_VERSION']}")
+
+    # Request metrics (see GET /metrics)
+    from .utils.metrics import REGISTRY, CONTENT_TYPE
+    requests_total = REGISTRY.counter('http_requests_total', 'HTTP requests', ('method', 'endpoint', 'status'))
+    request_seconds = REGISTRY.histogram('http_request_duration_seconds', 'HTTP request latency',
+                                         ('method', 'endpoint'))
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            # The route pattern, not the raw path, so ids do not explode the label set
+            endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+            request_seconds.observe(time.perf_counter() - started, method=request.method, endpoint=endpoint)
+            requests_total.inc(method=request.method, endpoint=endpoint, status=response.status_code)
+        return response
+
+    @app.get('/metrics')
+    def metrics():
+        # Importing the blueprint created the service, so its metrics are registered
+        return REGISTRY.render(), 200, {'Content-Type': CONTENT_TYPE}
 
     # Health check
     @app.get('/health')
@@ -31,6 +59,25 @@ def create_app():
             'timestamp': __import__('datetime').datetime.utcnow().isoformat() + 'Z'
         }
 
+    @app.get('/ready')
+    def ready():
+        # Readiness differs from /health (liveness) until model warm-up finishes
+        from .routes.predictions import service
+        status = service.readiness()
+        return {
+            'status': 'ready' if status['ready'] else 'warming_up',
+            **status
+        }, 200 if status['ready'] else 503
+
+    @app.get('/health/memory')
+    def health_memory():
+        from .utils.memory import process_memory, sibling_workers
+        workers = sibling_workers() if os.getenv('APP_SERVER') == 'gunicorn' else [os.getpid()]
+        return {
+            'pid': os.getpid(),
+            'workers': [process_memory(pid) for pid in workers]
+        }
+
     @app.get('/')
     def root():
         return {
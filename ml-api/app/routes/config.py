@@ -1,7 +1,4 @@
 import json
-import os
-import subprocess
-import threading
 from flask import Blueprint, request, jsonify
 from pathlib import Path
 
@@ -9,14 +6,6 @@ config_bp = Blueprint('config', __name__)
 
 CONFIG_FILE = Path('app/config/model_config.json')
 
-# Global variable to track training status
-training_status = {
-    'is_training': False,
-    'progress': 0,
-    'message': '',
-    'error': None
-}
-
 @config_bp.route('/config', methods=['GET'])
 def get_config():
     """Get current model configuration"""
@@ -117,71 +106,3 @@ def get_metrics():
             return jsonify({'error': 'Metrics file not found. Please train models first.'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-
-def run_training():
-    """Background thread function to run training"""
-    global training_status
-    try:
-        training_status['is_training'] = True
-        training_status['progress'] = 10
-        training_status['message'] = 'Bắt đầu training models...'
-        training_status['error'] = None
-        
-        # Run training script
-        training_status['progress'] = 30
-        training_status['message'] = 'Đang training các thuật toán ML...'
-        
-        result = subprocess.run(
-            ['python', 'train_model.py'],
-            cwd=os.getcwd(),
-            capture_output=True,
-            text=True,
-            timeout=600  # 10 minutes timeout
-        )
-        
-        if result.returncode == 0:
-            training_status['progress'] = 100
-            training_status['message'] = 'Training hoàn tất thành công!'
-            training_status['error'] = None
-        else:
-            training_status['progress'] = 0
-            training_status['message'] = 'Training thất bại'
-            training_status['error'] = result.stderr or 'Unknown error'
-            
-    except subprocess.TimeoutExpired:
-        training_status['progress'] = 0
-        training_status['message'] = 'Training timeout'
-        training_status['error'] = 'Training took too long (>10 minutes)'
-    except Exception as e:
-        training_status['progress'] = 0
-        training_status['message'] = 'Training lỗi'
-        training_status['error'] = str(e)
-    finally:
-        training_status['is_training'] = False
-
-@config_bp.route('/train', methods=['POST'])
-def train_models():
-    """Trigger model training in background"""
-    global training_status
-    
-    if training_status['is_training']:
-        return jsonify({
-            'error': 'Training is already in progress',
-            'status': training_status
-        }), 400
-    
-    # Start training in background thread
-    thread = threading.Thread(target=run_training)
-    thread.daemon = True
-    thread.start()
-    
-    return jsonify({
-        'message': 'Training started',
-        'status': training_status
-    }), 202
-
-@config_bp.route('/train/status', methods=['GET'])
-def get_training_status():
-    """Get current training status"""
-    return jsonify(training_status), 200
-
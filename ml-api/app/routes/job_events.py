@@ -0,0 +1,51 @@
+import os
+import json
+import time
+from flask import Response, request, jsonify
+
+from ..services.training_jobs import FINISHED
+
+EVENTS_POLL_SECONDS = float(os.getenv('TRAINING_EVENTS_POLL', 0.5))
+KEEPALIVE_SECONDS = 15
+
+
+def _event_stream(jobs, job_id, after):
+    """Server-sent events from the job store: id = event seq, event = status | progress | ..."""
+    yield 'retry: 3000\n\n'
+    last, idle = after, 0.0
+    while True:
+        events = jobs.events(job_id, last)
+        for event in events:
+            last = event['seq']
+            data = {**event['data'], 'jobId': event['jobId'], 'at': event['createdAt']}
+            yield f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(data)}\n\n"
+        if events:
+            idle = 0.0
+            continue
+        if job_id is not None:
+            job = jobs.get(job_id)
+            # The final status event is written after the status, so look once more before ending
+            if job is None or (job['status'] in FINISHED and not jobs.events(job_id, last)):
+                yield f"event: end\ndata: {json.dumps({'jobId': job_id})}\n\n"
+                return
+        time.sleep(EVENTS_POLL_SECONDS)
+        idle += EVENTS_POLL_SECONDS
+        if idle >= KEEPALIVE_SECONDS:
+            idle = 0.0
+            yield ': keep-alive\n\n'
+
+
+def sse_response(jobs, job_id):
+    """The events of one job (from its start) or, with job_id None, of every job from now on.
+
+    Resumes after the Last-Event-ID header or the `after` query parameter.
+    The job runs in the manager's threads, so a client that disconnects
+    loses nothing: it reconnects or reads the job later.
+    """
+    try:
+        after = request.headers.get('Last-Event-ID') or request.args.get('after')
+        after = int(after) if after is not None else (0 if job_id else jobs.last_event_seq())
+    except ValueError:
+        return jsonify({'error': 'after must be an integer'}), 400
+    return Response(_event_stream(jobs, job_id, after), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
@@ -1,6 +1,7 @@
 from flask import Blueprint, request
 from http import HTTPStatus
 from ..services.prediction_service import PredictionService
+from ..utils.helpers import read_csv_records
 
 predictions_bp = Blueprint('predictions', __name__)
 service = PredictionService()
@@ -28,14 +29,121 @@ def predict():
         }, HTTPStatus.INTERNAL_SERVER_ERROR
 
 
+@predictions_bp.post('/predict/batch')
+def predict_batch():
+    """Score a JSON array of patients (or {"patients": [...]}) or an uploaded CSV file."""
+    try:
+        if 'file' in request.files:
+            rows = read_csv_records(request.files['file'].stream)
+        else:
+            payload = request.get_json(force=True, silent=False)
+            rows = payload.get('patients') if isinstance(payload, dict) else payload
+        result = service.predict_batch(rows)
+        return {
+            'success': True,
+            'data': result,
+            'message': 'Batch prediction completed successfully'
+        }, HTTPStatus.OK
+    except ValueError as ve:
+        return {
+            'success': False,
+            'errors': [str(ve)]
+        }, HTTPStatus.BAD_REQUEST
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, HTTPStatus.INTERNAL_SERVER_ERROR
+
+
+@predictions_bp.get('/models')
+def models_status():
+    """Version and load state of the models currently served."""
+    return {
+        'success': True,
+        'data': service.readiness()
+    }, HTTPStatus.OK
+
+
+@predictions_bp.get('/cache')
+def cache_stats():
+    """Prediction cache size and hit/miss counters."""
+    return {
+        'success': True,
+        'data': service.cache_stats()
+    }, HTTPStatus.OK
+
+
+@predictions_bp.post('/models/reload')
+def reload_models():
+    """Load the model files again in the background and swap them in when ready."""
+    try:
+        return {
+            'success': True,
+            'data': service.reload_models(background=True),
+            'message': 'Model reload started'
+        }, HTTPStatus.ACCEPTED
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, HTTPStatus.INTERNAL_SERVER_ERROR
+
+
 @predictions_bp.get('/history')
 def history():
+    """History page filtered by citizenId, dateFrom/dateTo, riskLevel; paged by limit/cursor."""
+    try:
+        args = request.args
+        page = service.query_history(
+            citizen_id=args.get('citizenId') or None,
+            date_from=args.get('dateFrom') or None,
+            date_to=args.get('dateTo') or None,
+            risk_level=args.get('riskLevel') or None,
+            limit=args.get('limit', type=int),
+            cursor=args.get('cursor') or None
+        )
+        return {
+            'success': True,
+            'data': page['items'],
+            'nextCursor': page['nextCursor'],
+            'total': page['total']
+        }, HTTPStatus.OK
+    except ValueError as ve:
+        return {
+            'success': False,
+            'errors': [str(ve)]
+        }, HTTPStatus.BAD_REQUEST
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, HTTPStatus.INTERNAL_SERVER_ERROR
+
+
+@predictions_bp.post('/history/<record_id>/label')
+def label_history(record_id):
+    """Record the real outcome of a past prediction ({"stroke": 0|1}) for incremental training."""
     try:
-        items = service.get_history()
+        payload = request.get_json(force=True, silent=False) or {}
+        result = service.label_record(record_id, payload.get('stroke'))
+        if result is None:
+            return {
+                'success': False,
+                'errors': ['Record not found']
+            }, HTTPStatus.NOT_FOUND
+        from .training import queue_update
+        job = queue_update(result['labeledRows'])
         return {
             'success': True,
-            'data': items
+            'data': {**result, 'jobId': job['id'] if job else None},
+            'message': 'Outcome recorded'
         }, HTTPStatus.OK
+    except ValueError as ve:
+        return {
+            'success': False,
+            'errors': [str(ve)]
+        }, HTTPStatus.BAD_REQUEST
     except Exception as e:
         return {
             'success': False,
@@ -43,10 +151,10 @@ def history():
         }, HTTPStatus.INTERNAL_SERVER_ERROR
 
 
-@predictions_bp.delete('/history/<int:index>')
-def delete_history(index):
+@predictions_bp.delete('/history/<record_id>')
+def delete_history(record_id):
     try:
-        success = service.delete_record(index)
+        success = service.delete_record(record_id)
         if success:
             return {
                 'success': True,
@@ -55,7 +163,7 @@ def delete_history(index):
         else:
             return {
                 'success': False,
-                'error': 'Invalid index or record not found'
+                'error': 'Record not found'
             }, HTTPStatus.NOT_FOUND
     except Exception as e:
         return {
@@ -64,6 +172,29 @@ def delete_history(index):
         }, HTTPStatus.INTERNAL_SERVER_ERROR
 
 
+@predictions_bp.post('/history/delete')
+def bulk_delete_history():
+    """Delete records by {"ids": [...]} or {"filter": {citizenId, dateFrom, dateTo, riskLevel}}."""
+    try:
+        payload = request.get_json(force=True, silent=False) or {}
+        deleted = service.delete_records(record_ids=payload.get('ids'), filters=payload.get('filter'))
+        return {
+            'success': True,
+            'deleted': deleted,
+            'message': f'{deleted} history records deleted successfully'
+        }, HTTPStatus.OK
+    except ValueError as ve:
+        return {
+            'success': False,
+            'errors': [str(ve)]
+        }, HTTPStatus.BAD_REQUEST
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, HTTPStatus.INTERNAL_SERVER_ERROR
+
+
 @predictions_bp.delete('/history')
 def clear_all_history():
     try:
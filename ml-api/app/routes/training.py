@@ -0,0 +1,306 @@
+import os
+import itertools
+from flask import Blueprint, request, jsonify
+
+from ..services.training_jobs import TrainingJobManager, FINISHED, ACTIVE, SUCCEEDED
+from .job_events import sse_response
+
+# scikit-learn is imported by the job workers and handlers, not when the blueprint loads
+
+training_bp = Blueprint('training', __name__)
+
+ALGORITHMS = ('logistic_regression', 'random_forest', 'gradient_boosting', 'knn')
+TRAINING_MODES = ('full', 'incremental', 'auto')
+# One POST may queue at most this many configurations
+MAX_JOBS_PER_REQUEST = int(os.getenv('TRAINING_MAX_GRID', 100))
+# New labeled rows that queue an 'auto' retraining job by themselves (0 = only when asked)
+AUTO_UPDATE_ROWS = int(os.getenv('INCREMENTAL_AUTO_ROWS', 0))
+
+
+def _run_job(params, progress, should_stop, workdir):
+    if params.get('kind') == 'search':
+        from ..services.hyperparameter_search import search
+        return search(strategy=params['strategy'], algorithms=params.get('algorithms'), spaces=params.get('space'),
+                      n_candidates=params['nCandidates'], cv_folds=params['cvFolds'], metric=params['metric'],
+                      factor=params['factor'], min_resources=params['minResources'],
+                      workers=params.get('workers'), seed=params['seed'],
+                      progress=progress, should_stop=should_stop)
+    from ..services.incremental import retrain
+    return retrain(mode=params.get('mode', 'full'), overrides=params.get('config'),
+                   algorithms=params.get('algorithms'), cv_folds=params.get('cvFolds', 0), model_dir=workdir,
+                   progress=progress, should_stop=should_stop,
+                   workers=params.get('workers'), rf_jobs=params.get('rfJobs'))
+
+
+def _publish(workdir):
+    from ..services.training import publish
+    publish(workdir)
+
+
+def _on_finished(job):
+    if (job['result'] or {}).get('published'):
+        # Serve the new models without a restart (other workers follow via the manifest watcher)
+        from .predictions import service
+        service.reload_models(background=True)
+
+
+jobs = TrainingJobManager.from_env(_run_job, publisher=_publish, on_finished=_on_finished)
+
+
+def queue_update(labeled_rows):
+    """Queue an 'auto' job that publishes, once AUTO_UPDATE_ROWS labeled rows wait for the served models."""
+    if not AUTO_UPDATE_ROWS:
+        return None
+    from ..services.training import MODEL_DIR, MANIFEST_NAME, _read_json
+    seen = [(e.get('training') or {}).get('labeledRows', 0) for e in _read_json(MODEL_DIR / MANIFEST_NAME, [])]
+    if labeled_rows - min(seen, default=0) < AUTO_UPDATE_ROWS:
+        return None
+    if any(j['status'] in ACTIVE and j['params'].get('mode') in ('incremental', 'auto') for j in jobs.list(50)):
+        return None
+    return jobs.submit({'mode': 'auto', 'config': {}, 'algorithms': None, 'cvFolds': 0, 'timeout': None,
+                        'workers': None, 'rfJobs': None, 'publish': True, 'label': 'labeled rows'})
+
+
+def _legacy_status():
+    """The single-run status shape the model config page polls."""
+    job = jobs.latest()
+    if job is None:
+        return {'is_training': False, 'progress': 0, 'message': '', 'error': None}
+    return {
+        'is_training': job['status'] in ACTIVE,
+        'progress': job['progress'],
+        'message': job['message'],
+        'error': job['error'],
+        'jobId': job['id'],
+        'status': job['status'],
+    }
+
+
+def _check_config(config, field):
+    if not isinstance(config, dict):
+        raise ValueError(f'{field} must be an object of algorithm -> parameters')
+    for name, params in config.items():
+        if name not in ALGORITHMS:
+            raise ValueError(f'{field}: unknown algorithm {name!r}')
+        if not isinstance(params, dict):
+            raise ValueError(f'{field}.{name} must be an object of parameters')
+
+
+def _expand_grid(grid):
+    """{'knn': {'n_neighbors': [5, 15]}, ...} -> one override config per combination."""
+    _check_config(grid, 'grid')
+    axes = [(name, param, values if isinstance(values, list) else [values])
+            for name, params in grid.items() for param, values in params.items()]
+    configs = []
+    for combo in itertools.product(*(values for _, _, values in axes)):
+        config = {}
+        for (name, param, _), value in zip(axes, combo):
+            config.setdefault(name, {})[param] = value
+        configs.append(config)
+    return configs
+
+
+def _job_params(body):
+    """Request body -> one params dict per job to queue.
+
+    `config` overrides model_config.json for every job; `configs` (a list)
+    or `grid` (lists of values, expanded to every combination) queue one
+    job per entry. A single job publishes its models when it succeeds, a
+    sweep does not unless `publish` is true. `mode` is 'full' (train from
+    scratch), 'incremental' (update the served models with new labeled
+    rows) or 'auto' (see incremental.retrain).
+    """
+    base = body.get('config') or {}
+    _check_config(base, 'config')
+    algorithms = body.get('algorithms')
+    if algorithms is not None:
+        if not isinstance(algorithms, list) or not algorithms or any(a not in ALGORITHMS for a in algorithms):
+            raise ValueError(f'algorithms must be a non-empty list of {", ".join(ALGORITHMS)}')
+    cv_folds = int(body.get('cvFolds', 0))
+    if cv_folds and not 2 <= cv_folds <= 20:
+        raise ValueError('cvFolds must be between 2 and 20 (0 = no cross-validation)')
+    timeout = float(body['timeout']) if body.get('timeout') is not None else None
+    workers = int(body['workers']) if body.get('workers') is not None else None
+    if workers is not None and not 0 <= workers <= 64:
+        raise ValueError('workers must be between 0 (one per CPU) and 64')
+    rf_jobs = int(body['rfJobs']) if body.get('rfJobs') is not None else None
+    mode = body.get('mode', 'full')
+    if mode not in TRAINING_MODES:
+        raise ValueError(f'mode must be one of {", ".join(TRAINING_MODES)}')
+
+    if 'configs' in body and 'grid' in body:
+        raise ValueError('Give either configs or grid, not both')
+    if 'grid' in body:
+        variants = _expand_grid(body['grid'])
+    elif 'configs' in body:
+        variants = body['configs']
+        if not isinstance(variants, list) or not variants:
+            raise ValueError('configs must be a non-empty list')
+        for i, variant in enumerate(variants):
+            _check_config(variant, f'configs[{i}]')
+    else:
+        variants = [{}]
+    if mode == 'incremental' and (base or len(variants) > 1):
+        raise ValueError('An incremental update keeps the served models\' parameters; drop config/configs/grid')
+    if len(variants) > MAX_JOBS_PER_REQUEST:
+        raise ValueError(f'{len(variants)} configurations requested, at most {MAX_JOBS_PER_REQUEST} per request')
+
+    publish = bool(body.get('publish', len(variants) == 1))
+    params = []
+    for variant in variants:
+        config = {name: {**base.get(name, {}), **variant.get(name, {})} for name in set(base) | set(variant)}
+        params.append({'mode': mode, 'config': config, 'algorithms': algorithms, 'cvFolds': cv_folds,
+                       'timeout': timeout,
+                       'workers': workers, 'rfJobs': rf_jobs, 'publish': publish, 'label': body.get('label')})
+    return params
+
+
+@training_bp.route('/train', methods=['POST'])
+def train_models():
+    """Queue one training job, or one per configuration of a sweep"""
+    body = request.get_json(silent=True) or {}
+    try:
+        params = _job_params(body)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    queued = [jobs.submit(p) for p in params]
+    return jsonify({
+        'message': 'Training queued' if len(queued) == 1 else f'{len(queued)} training jobs queued',
+        'jobId': queued[0]['id'],
+        'jobs': queued,
+        'status': _legacy_status()
+    }), 202
+
+
+def _search_params(body):
+    from ..services.hyperparameter_search import STRATEGIES, METRICS
+    strategy = body.get('strategy', 'random')
+    if strategy not in STRATEGIES:
+        raise ValueError(f'strategy must be one of {", ".join(STRATEGIES)}')
+    metric = body.get('metric', 'roc_auc')
+    if metric not in METRICS:
+        raise ValueError(f'metric must be one of {", ".join(METRICS)}')
+    algorithms = body.get('algorithms')
+    if algorithms is not None:
+        if not isinstance(algorithms, list) or not algorithms or any(a not in ALGORITHMS for a in algorithms):
+            raise ValueError(f'algorithms must be a non-empty list of {", ".join(ALGORITHMS)}')
+    space = body.get('space')
+    if space is not None:
+        _check_config(space, 'space')
+    cv_folds = int(body.get('cvFolds', 3))
+    if not 2 <= cv_folds <= 20:
+        raise ValueError('cvFolds must be between 2 and 20')
+    n_candidates = int(body.get('nCandidates', 20))
+    if not 1 <= n_candidates <= 200:
+        raise ValueError('nCandidates must be between 1 and 200')
+    factor = int(body.get('factor', 3))
+    if factor < 2:
+        raise ValueError('factor must be at least 2')
+    workers = int(body['workers']) if body.get('workers') is not None else None
+    if workers is not None and not 0 <= workers <= 64:
+        raise ValueError('workers must be between 0 (one per CPU) and 64')
+    return {'kind': 'search', 'strategy': strategy, 'metric': metric, 'algorithms': algorithms, 'space': space,
+            'cvFolds': cv_folds, 'nCandidates': n_candidates, 'factor': factor,
+            'minResources': int(body.get('minResources', 400)), 'workers': workers, 'seed': int(body.get('seed', 0)),
+            'timeout': float(body['timeout']) if body.get('timeout') is not None else None,
+            'publish': False, 'label': body.get('label')}
+
+
+@training_bp.route('/search', methods=['POST'])
+def search_hyperparameters():
+    """Queue a hyperparameter search; follow it with /train/jobs/<id>/events"""
+    body = request.get_json(silent=True) or {}
+    try:
+        params = _search_params(body)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    job = jobs.submit(params)
+    return jsonify({'message': 'Search queued', 'jobId': job['id'], 'job': job}), 202
+
+
+@training_bp.route('/search/<job_id>/promote', methods=['POST'])
+def promote_search(job_id):
+    """Write the best parameters of a finished search to model_config.json and retrain with them"""
+    job = jobs.get(job_id)
+    if job is None or job['params'].get('kind') != 'search':
+        return jsonify({'error': 'Search not found'}), 404
+    if job['status'] != SUCCEEDED:
+        return jsonify({'error': f"Search is {job['status']}"}), 409
+    body = request.get_json(silent=True) or {}
+    algorithms = body.get('algorithms')
+    from ..services.hyperparameter_search import promote
+    try:
+        config = promote(job['result']['best'], algorithms)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+    response = {'message': 'Configuration updated', 'config': config}
+    if body.get('train', True):
+        names = [name for name in job['result']['best'] if not algorithms or name in algorithms]
+        training = jobs.submit({'config': {}, 'algorithms': names, 'cvFolds': 0, 'timeout': None, 'workers': None,
+                                'rfJobs': None, 'publish': True, 'label': f'promote {job_id}'})
+        response.update(message='Configuration updated, training queued', jobId=training['id'], job=training)
+    return jsonify(response), 202 if body.get('train', True) else 200
+
+
+@training_bp.route('/train/status', methods=['GET'])
+def get_training_status():
+    """Status of the most recent training job"""
+    return jsonify(_legacy_status()), 200
+
+
+@training_bp.route('/train/jobs', methods=['GET'])
+def list_training_jobs():
+    """Training job history, newest first"""
+    try:
+        limit = max(1, min(int(request.args.get('limit', 50)), 500))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    return jsonify({'jobs': jobs.list(limit, request.args.get('status'))}), 200
+
+
+@training_bp.route('/train/jobs/<job_id>', methods=['GET'])
+def get_training_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job), 200
+
+
+@training_bp.route('/train/jobs/<job_id>/cancel', methods=['POST'])
+@training_bp.route('/train/jobs/<job_id>', methods=['DELETE'])
+def cancel_training_job(job_id):
+    """Cancel a queued job, or stop a running one at its next fold/model"""
+    job = jobs.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['status'] in FINISHED:
+        return jsonify({'error': f"Job already {job['status']}", 'job': job}), 409
+    return jsonify({'message': 'Cancellation requested', 'job': job}), 202
+
+
+@training_bp.route('/train/jobs/<job_id>/publish', methods=['POST'])
+def publish_training_job(job_id):
+    """Serve the models of a succeeded job (e.g. the best one of a sweep)"""
+    try:
+        job = jobs.publish(job_id)
+    except KeyError:
+        return jsonify({'error': 'Job not found'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+    _on_finished(job)
+    return jsonify({'message': 'Models published', 'job': job}), 200
+
+
+@training_bp.route('/train/jobs/<job_id>/events', methods=['GET'])
+def training_job_events(job_id):
+    """Progress of one job as server-sent events; the stream ends when the job does"""
+    if jobs.get(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return sse_response(jobs, job_id)
+
+
+@training_bp.route('/train/events', methods=['GET'])
+def training_events():
+    """Progress of every job as server-sent events (for watching a sweep)"""
+    return sse_response(jobs, None)
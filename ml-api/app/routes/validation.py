@@ -1,18 +1,19 @@
 import json
 import os
-import pandas as pd
-import numpy as np
 from flask import Blueprint, request, jsonify
 from pathlib import Path
-from sklearn.model_selection import cross_validate, KFold, train_test_split, StratifiedKFold
-from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.pipeline import Pipeline
-from sklearn.linear_model import LogisticRegression
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score, confusion_matrix
+
+from ..services.training_jobs import (
+    TrainingJobManager, JobStore, QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED, FINISHED,
+)
+from ..utils.log import get_logger
+from .job_events import sse_response
+
+# pandas and scikit-learn are imported inside the handlers so that importing
+# this blueprint (i.e. API startup) does not pay for them
 
 validation_bp = Blueprint('validation', __name__)
+log = get_logger('validation')
 
 CONFIG_FILE = Path('app/config/model_config.json')
 DATASET_FILE = Path('app/data/healthcare-dataset-stroke-data.csv')
@@ -25,215 +26,145 @@ def load_config():
                 return json.load(f)
         return None
     except Exception as e:
-        print(f"[Config] Error loading config: {e}")
+        log.error('Error loading config: %s', e)
         return None
 
 def get_algorithms(config=None):
     """Get configured algorithms"""
+    from sklearn.pipeline import Pipeline
+    from ..services.features import build_preprocessor
+    from ..services.validation import classifiers
+
     if config is None:
         config = load_config()
-    
-    if not config:
-        # Default config
-        config = {
-            "logistic_regression": {"max_iter": 1000, "solver": "liblinear", "C": 1.0, "random_state": 42},
-            "random_forest": {"n_estimators": 100, "max_depth": None, "random_state": 42},
-            "gradient_boosting": {"n_estimators": 100, "learning_rate": 0.1, "random_state": 42},
-            "knn": {"n_neighbors": 5, "weights": "uniform"}
-        }
-    
-    algorithms = {}
-    
-    # Logistic Regression
-    lr_params = config.get('logistic_regression', {})
-    algorithms['Logistic Regression'] = Pipeline([
-        ('scaler', StandardScaler()),
-        ('classifier', LogisticRegression(**lr_params))
-    ])
-    
-    # Random Forest
-    rf_params = config.get('random_forest', {})
-    if rf_params.get('max_depth') is None or rf_params.get('max_depth') == 'null':
-        rf_params['max_depth'] = None
-    algorithms['Random Forest'] = Pipeline([
-        ('scaler', StandardScaler()),
-        ('classifier', RandomForestClassifier(**rf_params))
-    ])
-    
-    # Gradient Boosting
-    gb_params = config.get('gradient_boosting', {})
-    algorithms['Gradient Boosting'] = Pipeline([
-        ('scaler', StandardScaler()),
-        ('classifier', GradientBoostingClassifier(**gb_params))
-    ])
-    
-    # KNN
-    knn_params = config.get('knn', {})
-    algorithms['KNN'] = Pipeline([
-        ('scaler', StandardScaler()),
-        ('classifier', KNeighborsClassifier(**knn_params))
-    ])
-    
-    return algorithms
-
-def preprocess_data(df):
-    """Preprocess the dataset"""
-    # Make a copy to avoid modifying original
-    df = df.copy()
-    
-    # Drop id column if exists
-    if 'id' in df.columns:
-        df = df.drop('id', axis=1)
-    
-    # Handle missing values in BMI
-    if 'bmi' in df.columns:
-        df['bmi'].fillna(df['bmi'].median(), inplace=True)
-    
-    # Fill any other missing numerical values
-    numerical_cols = df.select_dtypes(include=[np.number]).columns
-    for col in numerical_cols:
-        if df[col].isnull().any():
-            df[col].fillna(df[col].median(), inplace=True)
-    
-    # Encode categorical variables
-    label_encoders = {}
-    categorical_cols = ['gender', 'ever_married', 'work_type', 'Residence_type', 'smoking_status']
-    
-    for col in categorical_cols:
-        if col in df.columns:
-            le = LabelEncoder()
-            # Fill missing categorical values with 'Unknown' before encoding
-            df[col] = df[col].fillna('Unknown').astype(str)
-            df[col] = le.fit_transform(df[col])
-            label_encoders[col] = le
-    
-    # Separate features and target
-    if 'stroke' in df.columns:
-        X = df.drop('stroke', axis=1)
-        y = df['stroke']
-    else:
-        raise ValueError("Dataset must contain 'stroke' column")
-    
-    # Final check: ensure no NaN values remain
-    if X.isnull().any().any():
-        print("[Warning] NaN values found after preprocessing, filling with 0")
-        X = X.fillna(0)
-    
-    return X, y
+
+    return {name: Pipeline([('preprocessor', build_preprocessor()), ('model', classifier)])
+            for name, classifier in classifiers(config).items()}
+
+# One request may compare at most this many configurations
+MAX_CONFIGS = int(os.getenv('VALIDATION_MAX_CONFIGS', 20))
+# Datasets larger than this (MB on disk) are validated out of core (services.out_of_core), never loaded whole
+STREAM_MB = float(os.getenv('VALIDATION_STREAM_MB', 200))
+
+
+def _too_large() -> bool:
+    """Whether the dataset is above STREAM_MB and so must be read a chunk at a time, never whole."""
+    return DATASET_FILE.exists() and DATASET_FILE.stat().st_size > STREAM_MB * 2 ** 20
+
+
+# Holdout has no out-of-core variant: a multi-GB dataset must not be loaded by a request
+HOLDOUT_TOO_LARGE = ('Dataset is larger than VALIDATION_STREAM_MB; holdout validation needs it in memory. '
+                     'Use K-Fold (out of core) instead')
+
+
+def _kfold_options(data):
+    """k_folds, cv, repeats, racing, configs and outOfCore of a K-Fold request, checked.
+
+    `configs` is a list of model_config.json-style overrides, each merged
+    into the current configuration; every one of them is validated.
+    `outOfCore` (default: whether the dataset is larger than STREAM_MB)
+    validates a chunk of the dataset at a time instead of loading it.
+    """
+    from ..services.validation import CV_MODES, DEFAULT_CV
+
+    k_folds = int(data.get('k_folds', 5))  # Default 5 folds
+    if k_folds < 2 or k_folds > 20:
+        raise ValueError('K-Folds must be between 2 and 20')
+    cv = data.get('cv', DEFAULT_CV)
+    if cv not in CV_MODES:
+        raise ValueError(f'cv must be one of {", ".join(CV_MODES)}')
+    repeats = int(data.get('repeats', 3)) if cv == 'repeated_stratified' else 1
+    if not 1 <= repeats <= 10:
+        raise ValueError('repeats must be between 1 and 10')
+    configs = data.get('configs')
+    if configs is not None:
+        if not isinstance(configs, list) or not configs or not all(isinstance(c, dict) for c in configs):
+            raise ValueError('configs must be a non-empty list of objects')
+        if len(configs) > MAX_CONFIGS:
+            raise ValueError(f'{len(configs)} configurations requested, at most {MAX_CONFIGS} per request')
+    out_of_core = data.get('outOfCore')
+    if out_of_core is None:
+        out_of_core = _too_large()
+    if out_of_core and (cv not in ('kfold', 'stratified') or data.get('racing') or configs is not None):
+        raise ValueError('Out-of-core validation supports cv kfold or stratified, without racing or configs')
+    return {'k_folds': k_folds, 'cv': cv, 'repeats': repeats, 'racing': bool(data.get('racing', False)),
+            'configs': configs, 'outOfCore': bool(out_of_core)}
+
+
+def _kfold(options, progress=None, should_stop=None):
+    """The /kfold response for _kfold_options(...)"""
+    from ..services.dataset import get_dataset
+    from ..services.validation import DEFAULT_CONFIG, get_engine
+
+    config = load_config() or DEFAULT_CONFIG
+    if options.get('outOfCore'):
+        return _kfold_streaming(options, config, progress, should_stop)
+    if options['configs'] is not None:
+        config = [{name: {**config.get(name, {}), **variant.get(name, {})} for name in set(config) | set(variant)}
+                  for variant in options['configs']]
+    # Every (algorithm, fold) fit as one batch on the engine's pool, memoised per config/CV scheme/dataset
+    run = get_engine().kfold(DATASET_FILE, config, options['k_folds'], cv=options['cv'], repeats=options['repeats'],
+                             racing=options['racing'], progress=progress, should_stop=should_stop)
+    log.info('K-Fold Cross Validation completed in %.2fs%s', run['seconds'], ' (cached)' if run['cached'] else '')
+    response = {
+        'k_folds': options['k_folds'],
+        'dataset_size': len(get_dataset(DATASET_FILE).frame()),
+        'results': run['results'],
+        'method': 'k_fold',
+        'cv': run['cv'],
+        'repeats': options['repeats'],
+        'total_folds': run['folds'],
+        'fits': run['fits'],
+        'cached': run['cached'],
+        'seconds': run['seconds']
+    }
+    if 'racing' in run:
+        response['racing'] = run['racing']
+    return response
+
+
+def _kfold_streaming(options, config, progress=None, should_stop=None):
+    """The /kfold response, computed a chunk of the dataset at a time (see out_of_core.kfold)"""
+    from ..services import out_of_core
+
+    # With millions of rows, random folds (by row position) are as balanced as stratified ones
+    run = out_of_core.kfold(DATASET_FILE, options['k_folds'], config=config, progress=progress,
+                            should_stop=should_stop)
+    log.info('Out-of-core K-Fold Cross Validation of %d rows completed in %.2fs', run['rows'], run['seconds'])
+    return {
+        'k_folds': options['k_folds'],
+        'dataset_size': run['rows'],
+        'results': run['results'],
+        'method': 'k_fold',
+        'cv': 'kfold',
+        'repeats': 1,
+        'total_folds': run['folds'],
+        'fits': run['folds'] * len(run['results']),
+        'cached': False,
+        'seconds': run['seconds'],
+        'outOfCore': True,
+        'sampleRows': run['sampleRows'],
+    }
+
 
 @validation_bp.route('/kfold', methods=['POST'])
 def kfold_validation():
-    """Perform K-Fold Cross Validation"""
+    """Perform K-Fold Cross Validation (plain, stratified, repeated stratified or nested, optionally racing)"""
     try:
         data = request.get_json()
-        k_folds = data.get('k_folds', 5)  # Default 5 folds
-        
-        if k_folds < 2 or k_folds > 20:
-            return jsonify({'error': 'K-Folds must be between 2 and 20'}), 400
+        try:
+            options = _kfold_options(data)
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
         
         # Check if dataset exists
         if not DATASET_FILE.exists():
             return jsonify({'error': f'Dataset not found at {DATASET_FILE}'}), 404
         
-        # Load dataset
-        df = pd.read_csv(DATASET_FILE)
-        print(f"[Validation] Loaded dataset with {len(df)} rows")
-        
-        # Preprocess
-        X, y = preprocess_data(df)
-        
-        # Load configuration
-        config = load_config()
-        algorithms = get_algorithms(config)
-        
-        # Define scoring metrics with handling for imbalanced data
-        scoring = {
-            'accuracy': 'accuracy',
-            'precision': 'precision_macro',  # Use macro average for imbalanced data
-            'recall': 'recall_macro',
-            'f1': 'f1_macro',
-            'roc_auc': 'roc_auc'
-        }
-        
-        # Perform K-Fold Cross Validation for each algorithm
-        results = {}
-        kfold = KFold(n_splits=k_folds, shuffle=True, random_state=42)
-        
-        for name, pipeline in algorithms.items():
-            print(f"[Validation] Running K-Fold for {name}...")
-            
-            try:
-                cv_results = cross_validate(
-                    pipeline, X, y,
-                    cv=kfold,
-                    scoring=scoring,
-                    return_train_score=True,
-                    n_jobs=-1,
-                    error_score='raise'  # Raise errors to catch them
-                )
-                
-                # Calculate statistics for each metric
-                results[name] = {
-                    'accuracy': {
-                        'mean': float(np.mean(cv_results['test_accuracy'])),
-                        'std': float(np.std(cv_results['test_accuracy'])),
-                        'folds': [float(x) for x in cv_results['test_accuracy']]
-                    },
-                    'precision': {
-                        'mean': float(np.mean(cv_results['test_precision'])),
-                        'std': float(np.std(cv_results['test_precision'])),
-                        'folds': [float(x) for x in cv_results['test_precision']]
-                    },
-                    'recall': {
-                        'mean': float(np.mean(cv_results['test_recall'])),
-                        'std': float(np.std(cv_results['test_recall'])),
-                        'folds': [float(x) for x in cv_results['test_recall']]
-                    },
-                    'f1': {
-                        'mean': float(np.mean(cv_results['test_f1'])),
-                        'std': float(np.std(cv_results['test_f1'])),
-                        'folds': [float(x) for x in cv_results['test_f1']]
-                    },
-                    'roc_auc': {
-                        'mean': float(np.mean(cv_results['test_roc_auc'])),
-                        'std': float(np.std(cv_results['test_roc_auc'])),
-                        'folds': [float(x) for x in cv_results['test_roc_auc']]
-                    },
-                    'train_accuracy': {
-                        'mean': float(np.mean(cv_results['train_accuracy'])),
-                        'std': float(np.std(cv_results['train_accuracy']))
-                    }
-                }
-                
-                print(f"[Validation] {name} - Accuracy: {results[name]['accuracy']['mean']:.4f} (+/- {results[name]['accuracy']['std']:.4f})")
-                
-            except Exception as e:
-                print(f"[Validation] Error in {name}: {str(e)}")
-                import traceback
-                traceback.print_exc()
-                
-                # If K-Fold fails, try with Stratified K-Fold or return error
-                results[name] = {
-                    'error': str(e),
-                    'accuracy': {'mean': 0.0, 'std': 0.0, 'folds': []},
-                    'precision': {'mean': 0.0, 'std': 0.0, 'folds': []},
-                    'recall': {'mean': 0.0, 'std': 0.0, 'folds': []},
-                    'f1': {'mean': 0.0, 'std': 0.0, 'folds': []},
-                    'roc_auc': {'mean': 0.0, 'std': 0.0, 'folds': []},
-                    'train_accuracy': {'mean': 0.0, 'std': 0.0}
-                }
-        
-        print(f"[Validation] K-Fold Cross Validation completed")
-        
-        return jsonify({
-            'k_folds': k_folds,
-            'dataset_size': len(df),
-            'results': results,
-            'method': 'k_fold'
-        }), 200
+        return jsonify(_kfold(options)), 200
         
     except Exception as e:
-        print(f"[Validation] Error: {e}")
+        log.error('Error: %s', e)
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
@@ -246,131 +177,159 @@ def holdout_validation():
     Chia dữ liệu thành tập train và test với tỷ lệ tùy chỉnh
     Phương pháp này phù hợp cho tất cả các thuật toán
     """
+    from ..services.validation import holdout
+
     try:
         data = request.get_json()
         test_size = data.get('test_size', 0.2)  # Mặc định 80% train, 20% test
         random_state = data.get('random_state', 42)
         
-        print(f"[Validation] Starting Holdout Validation with test_size={test_size}")
+        log.info('Starting Holdout Validation with test_size=%s', test_size)
         
         if not DATASET_FILE.exists():
             return jsonify({'error': 'Dataset not found'}), 404
+        if _too_large():
+            return jsonify({'error': HOLDOUT_TOO_LARGE}), 400
         
-        df = pd.read_csv(DATASET_FILE)
-        print(f"[Validation] Loaded dataset with {len(df)} rows")
+        result = holdout(DATASET_FILE, load_config(), test_size, random_state)
+        log.info('Holdout Validation completed')
         
-        # Preprocess data using the same function as K-Fold
-        X, y = preprocess_data(df)
-        
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, 
-            test_size=test_size, 
-            random_state=random_state,
-            stratify=y  # Đảm bảo tỷ lệ class giống nhau ở train và test
-        )
-        
-        print(f"[Validation] Train samples: {len(X_train)} (Stroke: {y_train.sum()}, No stroke: {(1-y_train).sum()})")
-        print(f"[Validation] Test samples: {len(X_test)} (Stroke: {y_test.sum()}, No stroke: {(1-y_test).sum()})")
-        
-        # Get configured algorithms
-        config = load_config()
-        algorithms = get_algorithms(config)
-        
-        # Evaluate each algorithm
-        results = {}
-        for name, pipeline in algorithms.items():
-            print(f"[Validation] Running Holdout for {name}...")
-            
-            try:
-                # Train
-                pipeline.fit(X_train, y_train)
-                
-                # Predict
-                y_train_pred = pipeline.predict(X_train)
-                y_test_pred = pipeline.predict(X_test)
-                y_test_proba = pipeline.predict_proba(X_test)[:, 1] if hasattr(pipeline, 'predict_proba') else None
-                
-                # Calculate metrics
-                train_metrics = {
-                    'accuracy': float(accuracy_score(y_train, y_train_pred)),
-                    'precision': float(precision_score(y_train, y_train_pred, average='macro', zero_division=0)),
-                    'recall': float(recall_score(y_train, y_train_pred, average='macro', zero_division=0)),
-                    'f1': float(f1_score(y_train, y_train_pred, average='macro', zero_division=0))
-                }
-                
-                test_metrics = {
-                    'accuracy': float(accuracy_score(y_test, y_test_pred)),
-                    'precision': float(precision_score(y_test, y_test_pred, average='macro', zero_division=0)),
-                    'recall': float(recall_score(y_test, y_test_pred, average='macro', zero_division=0)),
-                    'f1': float(f1_score(y_test, y_test_pred, average='macro', zero_division=0))
-                }
-                
-                if y_test_proba is not None:
-                    test_metrics['roc_auc'] = float(roc_auc_score(y_test, y_test_proba))
-                else:
-                    test_metrics['roc_auc'] = 0.0
-                
-                # Confusion matrix
-                cm = confusion_matrix(y_test, y_test_pred)
-                
-                results[name] = {
-                    'train_metrics': train_metrics,
-                    'test_metrics': test_metrics,
-                    'confusion_matrix': {
-                        'tn': int(cm[0][0]),
-                        'fp': int(cm[0][1]),
-                        'fn': int(cm[1][0]),
-                        'tp': int(cm[1][1])
-                    }
-                }
-                
-                print(f"[Validation] {name} - Test Accuracy: {test_metrics['accuracy']:.4f}, ROC-AUC: {test_metrics['roc_auc']:.4f}")
-                
-            except Exception as e:
-                print(f"[Validation] Error in {name}: {str(e)}")
-                import traceback
-                traceback.print_exc()
-                results[name] = {'error': str(e)}
-        
-        print(f"[Validation] Holdout Validation completed")
-        
-        return jsonify({
-            'success': True,
-            'results': results,
-            'method': 'holdout',
-            'test_size': test_size,
-            'train_samples': len(X_train),
-            'test_samples': len(X_test),
-            'dataset_size': len(y)
-        }), 200
+        return jsonify({'success': True, **result}), 200
         
     except Exception as e:
-        print(f"[Validation] Error: {e}")
+        log.error('Error: %s', e)
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+
+def _run_validation(params, progress, should_stop, workdir):
+    """Job runner: the same result as the synchronous endpoint of params['method']"""
+    from ..services.validation import holdout
+
+    if params['method'] == 'holdout':
+        if _too_large():
+            raise ValueError(HOLDOUT_TOO_LARGE)
+        return {'success': True, **holdout(DATASET_FILE, load_config(), params['test_size'], params['random_state'],
+                                           progress=progress, should_stop=should_stop)}
+    return _kfold(params, progress=progress, should_stop=should_stop)
+
+
+# Validation runs in these worker threads, not in the request: the API worker is
+# free at once and a client that goes away can read the result later
+jobs = TrainingJobManager(
+    JobStore(os.getenv('VALIDATION_JOBS_DB', 'app/data/validation_jobs.sqlite3')),
+    _run_validation,
+    artifacts_dir=None,
+    workers=int(os.getenv('VALIDATION_JOB_WORKERS', 1)),
+    timeout=float(os.getenv('VALIDATION_TIMEOUT', 900)),
+    keep=int(os.getenv('VALIDATION_JOB_HISTORY', 50)),
+    name='validation',
+    messages={
+        QUEUED: 'Đang chờ trong hàng đợi...',
+        RUNNING: 'Bắt đầu validation...',
+        SUCCEEDED: 'Validation hoàn tất!',
+        FAILED: 'Validation thất bại',
+        CANCELLED: 'Validation đã bị hủy',
+    },
+)
+
+
+def _validation_params(body):
+    method = body.get('method', 'kfold')
+    if method == 'kfold':
+        params = {'method': method, **_kfold_options(body)}
+    elif method == 'holdout':
+        test_size = float(body.get('test_size', 0.2))
+        if not 0 < test_size < 1:
+            raise ValueError('test_size must be between 0 and 1')
+        if _too_large():
+            raise ValueError(HOLDOUT_TOO_LARGE)
+        params = {'method': method, 'test_size': test_size, 'random_state': int(body.get('random_state', 42))}
+    else:
+        raise ValueError('method must be kfold or holdout')
+    params['timeout'] = float(body['timeout']) if body.get('timeout') is not None else None
+    params['label'] = body.get('label')
+    return params
+
+
+@validation_bp.route('/jobs', methods=['POST'])
+def start_validation_job():
+    """Queue a K-Fold or holdout validation; follow it with /jobs/<id>/events"""
+    body = request.get_json(silent=True) or {}
+    try:
+        params = _validation_params(body)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    if not DATASET_FILE.exists():
+        return jsonify({'error': f'Dataset not found at {DATASET_FILE}'}), 404
+    job = jobs.submit(params)
+    return jsonify({'message': 'Validation queued', 'jobId': job['id'], 'job': job}), 202
+
+
+@validation_bp.route('/jobs', methods=['GET'])
+def list_validation_jobs():
+    """Validation job history (and results), newest first"""
+    try:
+        limit = max(1, min(int(request.args.get('limit', 50)), 500))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    return jsonify({'jobs': jobs.list(limit, request.args.get('status'))}), 200
+
+
+@validation_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_validation_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job), 200
+
+
+@validation_bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+@validation_bp.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_validation_job(job_id):
+    """Cancel a queued validation, or stop a running one at its next fit"""
+    job = jobs.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['status'] in FINISHED:
+        return jsonify({'error': f"Job already {job['status']}", 'job': job}), 409
+    return jsonify({'message': 'Cancellation requested', 'job': job}), 202
+
+
+@validation_bp.route('/jobs/<job_id>/events', methods=['GET'])
+def validation_job_events(job_id):
+    """Per-fold and per-algorithm results of one job as server-sent events; the stream ends when the job does"""
+    if jobs.get(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return sse_response(jobs, job_id)
+
+def dataset_info(df):
+    return {
+        'total_rows': len(df),
+        'total_columns': len(df.columns),
+        'columns': list(df.columns),
+        'stroke_distribution': {
+            'no_stroke': int(df[df['stroke'] == 0].shape[0]),
+            'stroke': int(df[df['stroke'] == 1].shape[0])
+        },
+        'missing_values': df.isnull().sum().to_dict()
+    }
+
 @validation_bp.route('/dataset/info', methods=['GET'])
 def get_dataset_info():
     """Get dataset information"""
+    from ..services.dataset import get_dataset
+
     try:
         if not DATASET_FILE.exists():
             return jsonify({'error': 'Dataset not found'}), 404
         
-        df = pd.read_csv(DATASET_FILE)
-        
-        info = {
-            'total_rows': len(df),
-            'total_columns': len(df.columns),
-            'columns': list(df.columns),
-            'stroke_distribution': {
-                'no_stroke': int(df[df['stroke'] == 0].shape[0]),
-                'stroke': int(df[df['stroke'] == 1].shape[0])
-            },
-            'missing_values': df.isnull().sum().to_dict()
-        }
-        
+        if _too_large():
+            from ..services.out_of_core import describe
+            info = describe(DATASET_FILE)
+        else:
+            info = get_dataset(DATASET_FILE).derived('info', dataset_info)
         return jsonify(info), 200
         
     except Exception as e:
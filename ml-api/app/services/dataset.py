@@ -0,0 +1,208 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Any, Callable, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..utils.log import get_logger
+from ..utils.metrics import REGISTRY
+
+log = get_logger('data')
+
+LOADS = REGISTRY.counter('ml_dataset_loads_total', 'Dataset reads by source (csv parse, disk cache, memory)',
+                         ('source',))
+CACHE_FORMAT = 1
+# Cache entries kept per CSV name; older ones are removed when a new one is written
+KEEP_ENTRIES = 4
+
+
+class DatasetCache:
+    """One CSV file, parsed once and kept in memory together with results derived from it.
+
+    Every access stats the file; when its mtime or size changed the content
+    hash is recomputed and, if the content really differs, the parsed frame
+    and all derived results are dropped. The parsed columns are also written
+    to `<cache_dir>/<name>-<hash>/` as one .npy file each, so a cold start
+    loads arrays instead of parsing the CSV again.
+
+    Returned frames are shared between callers: treat them as read-only.
+    """
+
+    def __init__(self, path, cache_dir=None):
+        self.path = Path(path)
+        self._cache_dir = Path(cache_dir) if cache_dir else None
+        self._lock = threading.RLock()
+        self._stat = None
+        self._hash = None
+        self._frame = None
+        self._source = None
+        self._load_ms = None
+        self._derived: Dict[str, Any] = {}
+
+    def frame(self) -> pd.DataFrame:
+        with self._lock:
+            self._refresh()
+            return self._frame
+
+    def derived(self, name: str, fn: Callable[[pd.DataFrame], Any]):
+        """fn(frame), computed once per content version of the file."""
+        with self._lock:
+            self._refresh()
+            if name not in self._derived:
+                self._derived[name] = fn(self._frame)
+            return self._derived[name]
+
+    def version(self) -> str:
+        """SHA-256 of the current content, e.g. to key caches of anything computed from it."""
+        with self._lock:
+            self._refresh(load=False)
+            return self._hash
+
+    def describe(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'path': str(self.path), 'hash': self._hash, 'source': self._source,
+                    'loadMs': self._load_ms, 'derived': sorted(self._derived)}
+
+    def _refresh(self, load: bool = True):
+        """Rehash the file if its stat changed and, with `load`, parse it if needed.
+
+        The hash is computed a block at a time, so version() of a file too
+        large to parse (see out_of_core) costs no more memory than a block.
+        """
+        if not self.path.exists():
+            raise FileNotFoundError(f'Dataset not found at {self.path}')
+        st = os.stat(self.path)
+        stat = (st.st_mtime_ns, st.st_size)
+        started = time.perf_counter()
+        if stat != self._stat:
+            digest = _file_digest(self.path)
+            self._stat = stat
+            if digest != self._hash:
+                if self._hash is not None:
+                    log.info('Dataset %s changed, reloading', self.path)
+                self._hash, self._frame, self._derived = digest, None, {}
+        if not load:
+            return
+        if self._frame is not None:
+            LOADS.inc(source='memory')
+            return  # unchanged, or touched only
+        frame, source = self._load_cached(self._hash), 'disk'
+        if frame is None:
+            frame, source = pd.read_csv(self.path), 'csv'
+            self._save_cached(self._hash, frame)
+        LOADS.inc(source=source)
+        self._frame, self._source = frame, source
+        self._load_ms = round((time.perf_counter() - started) * 1000, 2)
+        log.info('Loaded dataset %s (%d rows) from %s in %.1f ms', self.path, len(frame), source, self._load_ms)
+
+    # Binary column cache
+
+    def _entry(self, digest: str) -> Path:
+        return self._cache_dir / f'{self.path.stem}-{digest[:16]}'
+
+    def _load_cached(self, digest: str):
+        if self._cache_dir is None:
+            return None
+        entry = self._entry(digest)
+        try:
+            with open(entry / 'meta.json', 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('format') != CACHE_FORMAT or meta.get('sha256') != digest:
+                return None
+            return _read_columns(entry, meta['columns'])
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            log.warning('Ignoring unreadable dataset cache %s: %s', entry, e)
+            return None
+
+    def _save_cached(self, digest: str, frame: pd.DataFrame):
+        if self._cache_dir is None:
+            return
+        entry = self._entry(digest)
+        try:
+            self._cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp = Path(tempfile.mkdtemp(prefix=entry.name + '.', suffix='.tmp', dir=self._cache_dir))
+            columns = _write_columns(tmp, frame)
+            with open(tmp / 'meta.json', 'w', encoding='utf-8') as f:
+                json.dump({'format': CACHE_FORMAT, 'sha256': digest, 'source': str(self.path),
+                           'rows': len(frame), 'columns': columns}, f, indent=2)
+            try:
+                os.replace(tmp, entry)
+            except OSError:
+                # Another process wrote the same entry first
+                shutil.rmtree(tmp, ignore_errors=True)
+            self._prune(entry)
+        except Exception as e:
+            log.warning('Could not write dataset cache %s: %s', entry, e)
+
+    def _prune(self, current: Path):
+        entries = sorted((p for p in self._cache_dir.glob(f'{self.path.stem}-*')
+                          if p.is_dir() and not p.name.endswith('.tmp') and p != current),
+                         key=lambda p: p.stat().st_mtime, reverse=True)
+        for stale in entries[KEEP_ENTRIES - 1:]:
+            shutil.rmtree(stale, ignore_errors=True)
+
+
+def _write_columns(directory: Path, frame: pd.DataFrame):
+    """One .npy per column; strings as fixed-width unicode with a null mask, never pickled."""
+    columns = []
+    for i, (name, series) in enumerate(frame.items()):
+        spec = {'name': name, 'file': f'{i:03d}.npy', 'dtype': str(series.dtype)}
+        if series.dtype == object:
+            mask = series.isna().to_numpy()
+            values = series.where(~mask, '').astype(str).to_numpy()
+            np.save(directory / spec['file'], values.astype(str), allow_pickle=False)
+            if mask.any():
+                spec['mask'] = f'{i:03d}.mask.npy'
+                np.save(directory / spec['mask'], mask, allow_pickle=False)
+        else:
+            np.save(directory / spec['file'], series.to_numpy(), allow_pickle=False)
+        columns.append(spec)
+    return columns
+
+
+def _read_columns(directory: Path, columns) -> pd.DataFrame:
+    data = {}
+    for spec in columns:
+        values = np.load(directory / spec['file'], allow_pickle=False)
+        if spec['dtype'] == 'object':
+            values = values.astype(object)
+            if 'mask' in spec:
+                values[np.load(directory / spec['mask'], allow_pickle=False)] = np.nan
+        data[spec['name']] = values
+    return pd.DataFrame(data)
+
+
+def _file_digest(path, block: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(block), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+_datasets: Dict[Tuple[str, str], DatasetCache] = {}
+_datasets_lock = threading.Lock()
+
+
+def get_dataset(path) -> DatasetCache:
+    """The process-wide DatasetCache of a CSV file.
+
+    The disk cache lives in DATASET_CACHE_DIR (default app/data/.cache);
+    DATASET_CACHE=0 keeps the cache in memory only.
+    """
+    cache_dir = os.getenv('DATASET_CACHE_DIR', 'app/data/.cache') \
+        if os.getenv('DATASET_CACHE', '1').lower() in ('1', 'true', 'yes') else ''
+    key = (os.path.abspath(path), cache_dir)
+    with _datasets_lock:
+        if key not in _datasets:
+            _datasets[key] = DatasetCache(path, cache_dir or None)
+        return _datasets[key]
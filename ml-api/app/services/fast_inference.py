@@ -0,0 +1,152 @@
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+
+def _is_nan(value) -> bool:
+    return isinstance(value, float) and value != value
+
+
+class CompiledPipeline:
+    """A fitted `preprocessor -> estimator` Pipeline flattened for one-row inference.
+
+    The ColumnTransformer (SimpleImputer + OneHotEncoder) is reduced at load
+    time to numeric fill values and a category -> column index map, so a
+    request dict is encoded straight into a NumPy row without building a
+    DataFrame. It mirrors sklearn's semantics: numeric None/NaN are imputed,
+    categorical NaN is imputed while None or an unseen category encodes as
+    all zeros (handle_unknown='ignore').
+    """
+
+    def __init__(self, estimator, numeric: List[tuple], categorical: List[tuple], n_features: int):
+        self.estimator = estimator
+        self._numeric = numeric          # (column, output index, fill value)
+        self._categorical = categorical  # (column, fill value or None, {category: output index})
+        self._n_features = n_features
+
+    def encode(self, data: Dict[str, Any]) -> np.ndarray:
+        row = np.zeros((1, self._n_features))
+        for column, index, fill in self._numeric:
+            value = data.get(column)
+            row[0, index] = fill if value is None or _is_nan(value) else float(value)
+        for column, fill, mapping in self._categorical:
+            value = data.get(column)
+            if fill is not None and _is_nan(value):
+                value = fill
+            try:
+                index = mapping.get(value)
+            except TypeError:  # unhashable input can never match a category
+                index = None
+            if index is not None:
+                row[0, index] = 1.0
+        return row
+
+    def predict_proba(self, data: Dict[str, Any]) -> float:
+        """Probability of the positive class for one adapted request."""
+        return float(self.estimator.predict_proba(self.encode(data))[0, 1])
+
+
+def compile_pipeline(pipeline) -> Optional[CompiledPipeline]:
+    """Build a CompiledPipeline, or None when the pipeline uses steps we cannot flatten."""
+    from sklearn.pipeline import Pipeline
+    from sklearn.compose import ColumnTransformer
+    from sklearn.impute import SimpleImputer
+    from sklearn.preprocessing import OneHotEncoder
+
+    if not isinstance(pipeline, Pipeline) or len(pipeline.steps) != 2:
+        return None
+    preprocessor, estimator = pipeline.steps[0][1], pipeline.steps[1][1]
+    if not isinstance(preprocessor, ColumnTransformer) or not hasattr(estimator, 'predict_proba'):
+        return None
+
+    numeric, categorical = [], []
+    offset = 0
+    for name, transformer, columns in preprocessor.transformers_:
+        if name == 'remainder' and transformer == 'drop':
+            continue
+        steps = transformer.steps if isinstance(transformer, Pipeline) else [(name, transformer)]
+        imputer, encoder = None, None
+        for _, step in steps:
+            if isinstance(step, SimpleImputer) and imputer is None and encoder is None:
+                imputer = step
+            elif isinstance(step, OneHotEncoder) and encoder is None:
+                encoder = step
+            else:
+                return None
+        if imputer is not None and (imputer.add_indicator or not _is_nan(imputer.missing_values)):
+            return None
+        if encoder is not None and (encoder.drop_idx_ is not None
+                                    or getattr(encoder, '_infrequent_enabled', False)
+                                    or encoder.handle_unknown != 'ignore'):
+            return None
+
+        for i, column in enumerate(columns):
+            fill = imputer.statistics_[i] if imputer is not None else None
+            if encoder is None:
+                if fill is None:
+                    return None
+                numeric.append((column, offset, float(fill)))
+                offset += 1
+            else:
+                categories = encoder.categories_[i]
+                mapping = {category: offset + j for j, category in enumerate(categories.tolist())}
+                categorical.append((column, fill.item() if hasattr(fill, 'item') else fill, mapping))
+                offset += len(categories)
+
+    if offset != getattr(estimator, 'n_features_in_', offset):
+        return None
+    return CompiledPipeline(estimator, numeric, categorical, offset)
+
+
+def parity_rows(compiled: CompiledPipeline, n: int = 64, seed: int = 0) -> List[Dict[str, Any]]:
+    """Synthetic requests cycling through every category with spread-out numeric values."""
+    rng = np.random.RandomState(seed)
+    rows = []
+    for k in range(n):
+        row: Dict[str, Any] = {}
+        for column, _, fill in compiled._numeric:
+            row[column] = float(max(fill * rng.uniform(0.2, 2.5), 0.0))
+        for column, _, mapping in compiled._categorical:
+            categories = list(mapping)
+            row[column] = categories[k % len(categories)]
+        rows.append(row)
+    return rows
+
+
+def edge_rows(compiled: CompiledPipeline, base: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Variants of `base` with missing, NaN, boolean, string and unseen values."""
+    variants = []
+    for value in (None, float('nan')):
+        variants.append({**base, **{c: value for c, _, _ in compiled._numeric}})
+    for value in (None, float('nan'), '__unseen__', True, '1'):
+        variants.append({**base, **{c: value for c, _, _ in compiled._categorical}})
+    variants.append({**base, **{c: str(base[c]) for c, _, _ in compiled._numeric}})
+    return variants
+
+
+def check_parity(pipeline, compiled: CompiledPipeline, rows: List[Dict[str, Any]] = None,
+                 atol: float = 1e-9) -> float:
+    """Largest |pipeline - compiled| probability gap; raises if above atol.
+
+    The regular sample is scored as one frame; edge cases are scored as
+    one-row frames, the way single requests reach the pipeline (a mixed
+    frame would let pandas coerce e.g. None to NaN across the column).
+    """
+    import pandas as pd
+
+    columns = list(getattr(pipeline, 'feature_names_in_',
+                           [c for c, _, _ in compiled._numeric + compiled._categorical]))
+
+    def frame(batch):
+        return pd.DataFrame([{c: r.get(c) for c in columns} for r in batch], columns=columns)
+
+    rows = rows if rows is not None else parity_rows(compiled)
+    expected = list(pipeline.predict_proba(frame(rows))[:, 1]) if rows else []
+    actual = [compiled.predict_proba(r) for r in rows]
+    for row in edge_rows(compiled, rows[0]) if rows else []:
+        expected.append(pipeline.predict_proba(frame([row]))[0, 1])
+        actual.append(compiled.predict_proba(row))
+    gap = float(np.max(np.abs(np.array(expected) - np.array(actual)))) if actual else 0.0
+    if gap > atol:
+        raise AssertionError(f'compiled pipeline differs from Pipeline.predict_proba by {gap:.3g}')
+    return gap
@@ -0,0 +1,127 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+from ..utils.metrics import REGISTRY
+
+# The feature pipeline of every model: training fits it, validation and the
+# hyperparameter search score with it, and the served pipelines carry it, so
+# all of them see the same columns, cleaning, imputation and encoding.
+
+TARGET_COL = 'stroke'
+NUM_COLS = ['age', 'avg_glucose_level', 'bmi']
+CAT_COLS = ['gender', 'hypertension', 'heart_disease', 'ever_married', 'work_type', 'Residence_type', 'smoking_status']
+FEATURE_COLUMNS = NUM_COLS + CAT_COLS
+
+TRANSFORMS = REGISTRY.counter('ml_feature_transforms_total', 'Fitted feature transforms by how they were answered',
+                              ('source',))
+
+# Fitted transforms of this process (the API or a pool worker): key -> (preprocessor, matrices)
+CACHE_SIZE = int(os.getenv('FEATURE_CACHE_SIZE', 32))
+_cache: 'OrderedDict' = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def clean(df):
+    # Basic cleaning
+    return df.dropna(subset=['age', 'avg_glucose_level'])
+
+
+def load_frame(path):
+    """The cleaned frame of a dataset CSV (read-only), computed once per content version."""
+    from .dataset import get_dataset
+    return get_dataset(path).derived('features', clean)
+
+
+def split_xy(df):
+    return df[FEATURE_COLUMNS], df[TARGET_COL]
+
+
+def to_frame(rows: List[Dict[str, Any]]):
+    """Dataset-named records -> the frame a fitted pipeline expects (missing keys become None)."""
+    import pandas as pd
+    return pd.DataFrame([{c: row.get(c) for c in FEATURE_COLUMNS} for row in rows], columns=FEATURE_COLUMNS)
+
+
+def build_preprocessor(categories=None, scale: bool = False):
+    """The ColumnTransformer of every served pipeline.
+
+    `categories` (one list per CAT_COLS column) fixes the one-hot columns
+    instead of learning them from the rows it is fitted on, e.g. when it is
+    fitted on a sample of a larger dataset. `scale` standardises the numeric
+    columns, for estimators trained by gradient steps (out_of_core).
+    """
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+    from sklearn.impute import SimpleImputer
+    from sklearn.compose import ColumnTransformer
+    from sklearn.pipeline import Pipeline
+
+    numeric_transformer = Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='median')),
+    ] + ([('scaler', StandardScaler())] if scale else []))
+
+    categorical_transformer = Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='most_frequent')),
+        ('onehot', OneHotEncoder(categories=categories if categories is not None else 'auto',
+                                 handle_unknown='ignore')),
+    ])
+
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ('num', numeric_transformer, NUM_COLS),
+            ('cat', categorical_transformer, CAT_COLS),
+        ]
+    )
+    return preprocessor
+
+
+def _dense(Z):
+    if hasattr(Z, 'toarray'):
+        Z = Z.toarray()
+    return np.ascontiguousarray(Z, dtype=float)
+
+
+def _lookup(key):
+    with _cache_lock:
+        if key not in _cache:
+            return None
+        _cache.move_to_end(key)
+        TRANSFORMS.inc(source='cache')
+        return _cache[key]
+
+
+def fit_transform(key, X_fit, y_fit, X_val=None, y_val=None) -> Tuple[Any, np.ndarray, np.ndarray, Any, Any]:
+    """(preprocessor, Z_fit, y_fit, Z_val, y_val): the preprocessor fitted on X_fit and both parts transformed.
+
+    The preprocessor does not depend on the model, so every estimator fitted
+    on the same rows shares one fit and one pair of dense matrices. Results
+    are memoised under `key`, which must name the rows, e.g. (dataset
+    version, labeled rows, split); treat them as read-only.
+    """
+    cached = _lookup(key)
+    if cached is not None:
+        return cached
+    preprocessor = build_preprocessor().fit(X_fit)
+    Z_val = _dense(preprocessor.transform(X_val)) if X_val is not None else None
+    result = (preprocessor, _dense(preprocessor.transform(X_fit)), np.asarray(y_fit),
+              Z_val, np.asarray(y_val) if y_val is not None else None)
+    TRANSFORMS.inc(source='computed')
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def fold_matrices(key, X, y, splits) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+    """(Z_fit, y_fit, Z_val, y_val) per (fit_idx, val_idx) of `splits`, preprocessor fitted once per fold."""
+    matrices = []
+    for fold, (fit_idx, val_idx) in enumerate(splits):
+        entry = _lookup((key, fold)) or fit_transform((key, fold), X.iloc[fit_idx], y.iloc[fit_idx],
+                                                      X.iloc[val_idx], y.iloc[val_idx])
+        matrices.append(entry[1:])
+    return matrices
+
@@ -0,0 +1,135 @@
+from bisect import bisect_left, insort
+from typing import Dict, Any, List, Optional, Tuple
+
+# Sort key of a record: (createdAt, insertion sequence) - unique and time ordered
+Key = Tuple[str, int]
+
+
+class HistoryIndex:
+    """In-memory history keyed by record id, with secondary indexes on
+    citizenId, risk level and createdAt.
+
+    Every index is a list of keys sorted by time, so a date range is two
+    bisections and a page is a slice walked newest first. Indexes are updated
+    incrementally on add/remove instead of being rebuilt.
+    """
+
+    def __init__(self):
+        self._seq = 0
+        self._records: Dict[Key, Dict[str, Any]] = {}
+        self._by_id: Dict[str, Key] = {}
+        self._by_time: List[Key] = []
+        self._by_citizen: Dict[str, List[Key]] = {}
+        self._by_risk: Dict[str, List[Key]] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_time)
+
+    def add(self, record: Dict[str, Any]):
+        self._seq += 1
+        key = (record.get('createdAt') or '', self._seq)
+        self._records[key] = record
+        self._by_id[record['id']] = key
+        insort(self._by_time, key)
+        for index, value in self._secondary(record):
+            insort(index.setdefault(value, []), key)
+
+    def remove(self, record: Dict[str, Any]) -> bool:
+        key = self._by_id.pop(record['id'], None)
+        if key is None:
+            return False
+        del self._records[key]
+        self._discard(self._by_time, key)
+        for index, value in self._secondary(record):
+            keys = index.get(value)
+            if keys is not None:
+                self._discard(keys, key)
+                if not keys:
+                    del index[value]
+        return True
+
+    def clear(self):
+        self.__init__()
+
+    def oldest(self) -> Optional[Dict[str, Any]]:
+        return self._records[self._by_time[0]] if self._by_time else None
+
+    def get(self, record_id: str) -> Optional[Dict[str, Any]]:
+        key = self._by_id.get(record_id)
+        return self._records[key] if key is not None else None
+
+    def records(self) -> List[Dict[str, Any]]:
+        """All records, newest first."""
+        return [self._records[k] for k in reversed(self._by_time)]
+
+    def query(self, citizen_id: Optional[str] = None, date_from: Optional[str] = None,
+              date_to: Optional[str] = None, risk_level: Optional[str] = None,
+              limit: Optional[int] = 100, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Return one page of matching records (newest first) and the cursor of the next page.
+
+        limit=None returns every match.
+        """
+        keys, lo, hi = self._range(citizen_id, date_from, date_to, risk_level)
+        if cursor:
+            hi = min(hi, bisect_left(keys, self._decode_cursor(cursor)))
+
+        page: List[Dict[str, Any]] = []
+        i = hi - 1
+        while i >= lo and (limit is None or len(page) < limit):
+            record = self._records[keys[i]]
+            if risk_level is None or record.get('prediction') == risk_level:
+                page.append(record)
+            i -= 1
+
+        next_cursor = None
+        if i >= lo and page:
+            next_cursor = self._encode_cursor(self._by_id[page[-1]['id']])
+        return page, next_cursor
+
+    def count(self, citizen_id: Optional[str] = None, date_from: Optional[str] = None,
+              date_to: Optional[str] = None, risk_level: Optional[str] = None) -> int:
+        """Number of records matching the filters of query (all pages)."""
+        keys, lo, hi = self._range(citizen_id, date_from, date_to, risk_level)
+        if citizen_id is None or risk_level is None:
+            return max(hi - lo, 0)
+        return sum(1 for k in keys[lo:hi] if self._records[k].get('prediction') == risk_level)
+
+    def _range(self, citizen_id, date_from, date_to, risk_level) -> Tuple[List[Key], int, int]:
+        """The index to walk and the [lo, hi) slice of it within the date range."""
+        # Walk the most selective index, then check the remaining predicate
+        if citizen_id is not None:
+            keys = self._by_citizen.get(str(citizen_id), [])
+        elif risk_level is not None:
+            keys = self._by_risk.get(risk_level, [])
+        else:
+            keys = self._by_time
+        lo = bisect_left(keys, (date_from, 0)) if date_from else 0
+        hi = bisect_left(keys, (date_to, float('inf'))) if date_to else len(keys)
+        return keys, lo, hi
+
+    def _secondary(self, record: Dict[str, Any]):
+        """(index, value) pairs the record is listed under."""
+        pairs = []
+        if record.get('citizenId'):
+            pairs.append((self._by_citizen, str(record['citizenId'])))
+        if record.get('prediction'):
+            pairs.append((self._by_risk, record['prediction']))
+        return pairs
+
+    @staticmethod
+    def _discard(keys: List[Key], key: Key):
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            del keys[i]
+
+    @staticmethod
+    def _encode_cursor(key: Key) -> str:
+        return f'{key[0]}~{key[1]}'
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Key:
+        created_at, _, seq = cursor.rpartition('~')
+        try:
+            return created_at, int(seq)
+        except ValueError:
+            raise ValueError(f'Invalid cursor: {cursor}')
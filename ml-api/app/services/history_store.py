@@ -0,0 +1,320 @@
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Callable, Optional
+from pathlib import Path
+
+from ..utils.log import get_logger
+
+log = get_logger('history')
+
+
+class RetentionPolicy:
+    """How many history records to keep (0 disables a limit)."""
+
+    def __init__(self, max_records: int = 1000, max_age_days: int = 0):
+        self.max_records = max_records
+        self.max_age_days = max_age_days
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_records=int(os.getenv('HISTORY_RETENTION', 1000)),
+            max_age_days=int(os.getenv('HISTORY_RETENTION_DAYS', 0)),
+        )
+
+    def cutoff(self) -> Optional[str]:
+        """Oldest createdAt still retained, in the same ISO format as the records."""
+        if not self.max_age_days:
+            return None
+        return (datetime.utcnow() - timedelta(days=self.max_age_days)).isoformat() + 'Z'
+
+
+class HistoryStore:
+    """Persistence backend for prediction history.
+
+    Records are handed over oldest first and carry a stable `id`. `append`
+    and `delete` must cost O(1) writes; `rewrite` replaces the whole content
+    and is reserved for rare operations.
+    """
+
+    # True when several processes may write the same store concurrently
+    shared = False
+
+    def load(self) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def append(self, record: Dict[str, Any]):
+        self.append_many([record])
+
+    def append_many(self, records: List[Dict[str, Any]]):
+        """Append a burst of records in one write."""
+        raise NotImplementedError
+
+    def delete(self, record_ids: List[str]):
+        """Remove records by id in one persisted write."""
+        raise NotImplementedError
+
+    def rewrite(self, records: List[Dict[str, Any]]):
+        raise NotImplementedError
+
+    def needs_compaction(self, live_count: int) -> bool:
+        return False
+
+    def has_external_changes(self) -> bool:
+        """True if another process wrote to the store since we last looked."""
+        return False
+
+    def compact(self, live_count: int, records_fn: Callable[[], List[Dict[str, Any]]]):
+        """Drop records evicted by retention once enough of them piled up."""
+        pass
+
+    def describe(self) -> str:
+        return self.__class__.__name__
+
+
+class JsonlHistoryStore(HistoryStore):
+    """Append-only JSON Lines log, compacted when it holds too many dead lines.
+
+    Deletes are appended as tombstone lines `{"_deleted": [ids]}`.
+    """
+
+    def __init__(self, path: str, compact_slack: int = 100):
+        self._path = Path(path)
+        self._compact_slack = compact_slack
+        self._lines = 0
+
+    def load(self) -> List[Dict[str, Any]]:
+        records: Dict[Any, Dict[str, Any]] = {}
+        if not self._path.exists():
+            return []
+
+        with open(self._path, 'r', encoding='utf-8') as f:
+            for n, line in enumerate(f):
+                line = line.strip()
+                if not line:
+                    continue
+                self._lines += 1
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line after a crash; the next compaction drops it
+                    log.warning('Skipped corrupt line in %s', self._path)
+                    continue
+                if '_deleted' in entry:
+                    for record_id in entry['_deleted']:
+                        records.pop(record_id, None)
+                else:
+                    records[entry.get('id', ('line', n))] = entry
+        return list(records.values())
+
+    def append_many(self, records: List[Dict[str, Any]]):
+        self._write_lines(records)
+
+    def delete(self, record_ids: List[str]):
+        if record_ids:
+            self._write_lines([{'_deleted': list(record_ids)}])
+
+    def _write_lines(self, entries: List[Dict[str, Any]]):
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self._path, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(e, ensure_ascii=False) + '\n' for e in entries))
+        self._lines += len(entries)
+
+    def rewrite(self, records: List[Dict[str, Any]]):
+        # Write a temp file and rename it over the log so a crash never leaves a half-written file
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._path.with_name(self._path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path)
+        self._lines = len(records)
+
+    def needs_compaction(self, live_count: int) -> bool:
+        # Amortized O(1): only rewrite once dead lines outnumber live ones
+        return self._lines > 2 * live_count + self._compact_slack
+
+    def compact(self, live_count: int, records_fn: Callable[[], List[Dict[str, Any]]]):
+        if self.needs_compaction(live_count):
+            self.rewrite(records_fn())
+            log.info('Compacted %s to %d records', self._path, live_count)
+
+    def describe(self) -> str:
+        return f'jsonl:{self._path}'
+
+
+class SqliteHistoryStore(HistoryStore):
+    """Embedded SQLite table, one row per record.
+
+    Safe for several worker processes: the connection is reopened after a
+    fork, and PRAGMA data_version tells us when another process committed.
+    """
+
+    shared = True
+
+    def __init__(self, path: str, compact_slack: int = 100):
+        self._path = Path(path)
+        self._compact_slack = compact_slack
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._data_version = None
+        # data_version is per connection: only comparable within the process that read it
+        self._version_pid = None
+        conn = self._connection()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS history ('
+            'seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'record_id TEXT, '
+            'created_at TEXT, '
+            'record TEXT NOT NULL)'
+        )
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(history)')]
+        if 'record_id' not in columns:
+            # Tables created before records had ids; ids are back-filled by the next rewrite
+            conn.execute('ALTER TABLE history ADD COLUMN record_id TEXT')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_history_record_id ON history (record_id)')
+        conn.commit()
+        self._rows = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections must not cross a fork (e.g. gunicorn preload)
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(str(self._path), check_same_thread=False, timeout=30)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._pid = os.getpid()
+        return self._conn
+
+    def load(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            conn = self._connection()
+            rows = conn.execute('SELECT record FROM history ORDER BY seq').fetchall()
+            self._data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+            self._version_pid = os.getpid()
+        self._rows = len(rows)
+        return [json.loads(r[0]) for r in rows]
+
+    def append_many(self, records: List[Dict[str, Any]]):
+        with self._lock, self._connection() as conn:
+            conn.executemany(
+                'INSERT INTO history (record_id, created_at, record) VALUES (?, ?, ?)',
+                [self._row(r) for r in records]
+            )
+        self._rows += len(records)
+
+    def delete(self, record_ids: List[str]):
+        with self._lock, self._connection() as conn:
+            cursor = conn.executemany(
+                'DELETE FROM history WHERE record_id = ?',
+                [(record_id,) for record_id in record_ids]
+            )
+        self._rows -= max(cursor.rowcount, 0)
+
+    def rewrite(self, records: List[Dict[str, Any]]):
+        with self._lock, self._connection() as conn:
+            conn.execute('DELETE FROM history')
+            conn.executemany(
+                'INSERT INTO history (record_id, created_at, record) VALUES (?, ?, ?)',
+                [self._row(r) for r in records]
+            )
+        self._rows = len(records)
+
+    def import_records(self, records: List[Dict[str, Any]]) -> int:
+        """Insert records only if the table is still empty (one transaction, so concurrent workers import once)."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if conn.execute('SELECT COUNT(*) FROM history').fetchone()[0]:
+                    conn.rollback()
+                    return 0
+                conn.executemany('INSERT INTO history (record_id, created_at, record) VALUES (?, ?, ?)',
+                                 [self._row(r) for r in records])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        self._rows += len(records)
+        return len(records)
+
+    def needs_compaction(self, live_count: int) -> bool:
+        # Batched like the JSONL log so a full table does not cost a DELETE per insert
+        return self._rows > live_count + self._compact_slack
+
+    def compact(self, live_count: int, records_fn: Callable[[], List[Dict[str, Any]]]):
+        if self.needs_compaction(live_count):
+            with self._lock, self._connection() as conn:
+                conn.execute(
+                    'DELETE FROM history WHERE seq NOT IN '
+                    '(SELECT seq FROM history ORDER BY seq DESC LIMIT ?)',
+                    (live_count,)
+                )
+            self._rows = live_count
+
+    def has_external_changes(self) -> bool:
+        # data_version only moves for commits made through other connections
+        with self._lock:
+            version = self._connection().execute('PRAGMA data_version').fetchone()[0]
+        if self._data_version is None:
+            return False
+        if self._version_pid != os.getpid():
+            # Loaded before a fork (gunicorn preload): our own connection is new, so reload once
+            return True
+        return version != self._data_version
+
+    @staticmethod
+    def _row(record: Dict[str, Any]):
+        return record.get('id'), record.get('createdAt'), json.dumps(record, ensure_ascii=False)
+
+    def describe(self) -> str:
+        return f'sqlite:{self._path}'
+
+
+DEFAULT_HISTORY_FILES = {
+    'jsonl': 'app/data/history.jsonl',
+    'sqlite': 'app/data/history.sqlite3',
+}
+
+
+def create_history_store(backend: str, path: Optional[str] = None) -> HistoryStore:
+    """Build the history backend selected by HISTORY_BACKEND.
+
+    SQLite never opens a JSONL log: given a `.jsonl` path (e.g. HISTORY_FILE
+    kept from a single-worker setup when gunicorn switches to SQLite) it
+    uses the `.sqlite3` file next to it. An empty SQLite store imports the
+    records of that JSONL log (or of the default one), which is then renamed
+    to `.jsonl.migrated`, so no history is lost.
+    """
+    backend = (backend or 'jsonl').lower()
+    if backend not in DEFAULT_HISTORY_FILES:
+        raise ValueError(f"Unknown history backend '{backend}' (expected 'jsonl' or 'sqlite')")
+    path = path or DEFAULT_HISTORY_FILES[backend]
+    if backend == 'jsonl':
+        return JsonlHistoryStore(path)
+
+    jsonl_path = Path(DEFAULT_HISTORY_FILES['jsonl'])
+    if Path(path).suffix == '.jsonl':
+        jsonl_path, path = Path(path), Path(path).with_suffix('.sqlite3')
+        log.info('HISTORY_BACKEND=sqlite with a JSONL HISTORY_FILE: using %s', path)
+    elif Path(path).is_file() and Path(path).stat().st_size and not _is_sqlite(path):
+        raise ValueError(f"HISTORY_FILE {path} is not a SQLite database; point it at a .sqlite3 file "
+                         f"or set HISTORY_BACKEND=jsonl")
+    store = SqliteHistoryStore(str(path))
+    if jsonl_path.exists() and jsonl_path.resolve() != Path(path).resolve():
+        records = JsonlHistoryStore(str(jsonl_path)).load()
+        if records and store.import_records(records):
+            # Renamed so a later, deliberately emptied store does not import it again
+            jsonl_path.replace(jsonl_path.with_name(jsonl_path.name + '.migrated'))
+            log.info('Imported %d history records from %s into %s', len(records), jsonl_path, path)
+    return store
+
+
+def _is_sqlite(path) -> bool:
+    with open(path, 'rb') as f:
+        return f.read(16) == b'SQLite format 3\x00'
@@ -0,0 +1,166 @@
+import os
+import time
+import queue
+import threading
+from typing import Dict, Any, List, Callable
+
+from .history_store import HistoryStore
+from ..utils.rwlock import ReadWriteLock
+from ..utils.log import get_logger
+from ..utils.metrics import REGISTRY
+
+log = get_logger('history')
+
+WRITE_SECONDS = REGISTRY.histogram('ml_history_write_seconds', 'History store write latency', ('op',))
+WRITE_FAILURES = REGISTRY.counter('ml_history_write_failures_total', 'Failed background history writes')
+RECORDS_WRITTEN = REGISTRY.counter('ml_history_records_written_total', 'History records appended to the store')
+
+
+class HistoryWriter:
+    """Single background thread that owns all writes to a HistoryStore.
+
+    Request threads only enqueue operations (while holding the history write
+    lock, so the queue order matches the in-memory order). The writer drains
+    everything pending at once and coalesces it: consecutive appends become
+    one batched write, and a rewrite makes all earlier pending operations moot.
+
+    For stores shared between processes the writer also pulls in records
+    written by other workers (`sync`), replacing the in-memory history via
+    `reload_fn` while nothing of ours is still queued.
+    """
+
+    def __init__(self, store: HistoryStore, lock: ReadWriteLock,
+                 live_count_fn: Callable[[], int], records_fn: Callable[[], List[Dict[str, Any]]],
+                 reload_fn: Callable[[List[Dict[str, Any]]], None] = None):
+        self._store = store
+        self._lock = lock
+        self._live_count_fn = live_count_fn
+        self._records_fn = records_fn
+        self._reload_fn = reload_fn
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._stale = False
+        self._start_lock = threading.Lock()
+
+    def append(self, record: Dict[str, Any]):
+        self._submit(('append', record))
+
+    def delete(self, record_ids: List[str]):
+        self._submit(('delete', list(record_ids)))
+
+    def rewrite(self, records: List[Dict[str, Any]]):
+        self._submit(('rewrite', records))
+
+    def flush(self, timeout: float = None):
+        """Block until every operation submitted so far is on disk."""
+        if not self._running():
+            return
+        done = threading.Event()
+        self._queue.put(('flush', done))
+        done.wait(timeout)
+
+    def sync(self, timeout: float = None):
+        """Block until records written by other processes are visible in memory."""
+        if not self._store.shared or self._reload_fn is None:
+            return
+        done = threading.Event()
+        self._submit(('sync', done))
+        done.wait(timeout)
+
+    def pending(self) -> int:
+        """Operations queued but not yet written."""
+        return self._queue.qsize() if self._running() else 0
+
+    def _submit(self, op):
+        self._ensure_started()
+        self._queue.put(op)
+
+    def _running(self) -> bool:
+        return self._thread is not None and self._pid == os.getpid()
+
+    def _ensure_started(self):
+        # Threads do not survive fork(), so a forked worker starts its own writer
+        if self._running():
+            return
+        with self._start_lock:
+            if not self._running():
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            ops = [self._queue.get()]
+            while True:
+                try:
+                    ops.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._apply(ops)
+
+    def _apply(self, ops):
+        # Anything queued before the last rewrite is already reflected in it
+        last_rewrite = max((i for i, op in enumerate(ops) if op[0] == 'rewrite'), default=None)
+        waiters = [op[1] for op in ops if op[0] in ('flush', 'sync')]
+        wants_sync = any(op[0] == 'sync' for op in ops)
+        if last_rewrite is not None:
+            ops = ops[last_rewrite:]
+
+        pending: List[Dict[str, Any]] = []
+        try:
+            for kind, payload in ops:
+                if kind == 'append':
+                    pending.append(payload)
+                    continue
+                if pending:
+                    self._timed('append', self._store.append_many, pending)
+                    pending = []
+                if kind == 'delete':
+                    self._timed('delete', self._store.delete, payload)
+                elif kind == 'rewrite':
+                    self._timed('rewrite', self._store.rewrite, payload)
+            if pending:
+                self._timed('append', self._store.append_many, pending)
+            if wants_sync:
+                self._maybe_reload()
+            self._maybe_compact()
+        except Exception as e:
+            WRITE_FAILURES.inc()
+            log.error('Background write failed: %s', e)
+        finally:
+            for done in waiters:
+                done.set()
+
+    @staticmethod
+    def _timed(op, fn, payload):
+        started = time.perf_counter()
+        fn(payload)
+        WRITE_SECONDS.observe(time.perf_counter() - started, op=op)
+        if op == 'append':
+            RECORDS_WRITTEN.inc(len(payload))
+
+    def _maybe_compact(self):
+        # Snapshot only while nothing is queued, otherwise records still in the
+        # queue would be written twice (once by the compaction, once appended)
+        with self._lock.read():
+            if not self._queue.empty():
+                return
+            live_count = self._live_count_fn()
+            if not self._store.needs_compaction(live_count):
+                return
+            records = self._records_fn()
+        with WRITE_SECONDS.time(op='compact'):
+            self._store.compact(live_count, lambda: records)
+
+    def _maybe_reload(self):
+        if not (self._stale or self._store.has_external_changes()):
+            return
+        records = self._store.load()
+        with self._lock.write():
+            # Ops queued meanwhile are not in `records` yet; the next sync retries
+            self._stale = not self._queue.empty()
+            if not self._stale:
+                self._reload_fn(records)
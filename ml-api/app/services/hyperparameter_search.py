@@ -0,0 +1,283 @@
+import os
+import json
+import math
+import time
+import itertools
+from typing import Dict, Any, Callable, List, Optional
+
+import numpy as np
+from sklearn.model_selection import train_test_split, StratifiedKFold
+from sklearn.metrics import roc_auc_score, average_precision_score, f1_score, accuracy_score, balanced_accuracy_score
+
+from .training import (
+    ESTIMATORS, CONFIG_FILE, TrainingCancelled,
+    algorithm_params, load_config, load_data, run_tasks, split_key, _write_json,
+)
+from . import features
+from .features import split_xy
+from .training_store import get_training_store
+from ..utils.log import get_logger
+
+log = get_logger('training')
+
+# Searched parameters per algorithm: a list is a set of choices, {'low', 'high'[, 'log', 'int']}
+# a range for random sampling. Everything else comes from model_config.json.
+SEARCH_SPACES = {
+    'logistic_regression': {
+        'C': {'low': 0.001, 'high': 100.0, 'log': True},
+        'penalty': ['l1', 'l2'],
+        'class_weight': ['balanced', None],
+    },
+    'random_forest': {
+        'n_estimators': [100, 200, 300],
+        'max_depth': [None, 4, 8, 16],
+        'min_samples_leaf': [1, 2, 5, 10],
+        'max_features': ['sqrt', 'log2'],
+    },
+    'gradient_boosting': {
+        'n_estimators': [50, 100, 200],
+        'learning_rate': {'low': 0.01, 'high': 0.3, 'log': True},
+        'max_depth': [2, 3, 4],
+        'subsample': [0.7, 0.85, 1.0],
+    },
+    'knn': {
+        'n_neighbors': {'low': 5, 'high': 75, 'int': True},
+        'weights': ['uniform', 'distance'],
+        'p': [1, 2],
+    },
+}
+# name -> (scorer, needs probabilities)
+METRICS = {
+    'roc_auc': (roc_auc_score, True),
+    'average_precision': (average_precision_score, True),
+    'f1': (f1_score, False),
+    'accuracy': (accuracy_score, False),
+    'balanced_accuracy': (balanced_accuracy_score, False),
+}
+STRATEGIES = ('grid', 'random', 'halving')
+MAX_CANDIDATES = 500
+
+
+def grid_candidates(space: Dict[str, Any]) -> List[Dict[str, Any]]:
+    for name, values in space.items():
+        if not isinstance(values, list):
+            raise ValueError(f'Grid search needs a list of values for {name}')
+    names = list(space)
+    return [dict(zip(names, combo)) for combo in itertools.product(*(space[n] for n in names))]
+
+
+def sample_candidate(space: Dict[str, Any], rng: np.random.Generator) -> Dict[str, Any]:
+    params = {}
+    for name, values in space.items():
+        if isinstance(values, list):
+            params[name] = values[int(rng.integers(len(values)))]
+            continue
+        low, high = float(values['low']), float(values['high'])
+        if values.get('log'):
+            value = math.exp(rng.uniform(math.log(low), math.log(high)))
+        else:
+            value = rng.uniform(low, high)
+        params[name] = int(round(value)) if values.get('int') else float(f'{value:.4g}')
+    return params
+
+
+def random_candidates(space: Dict[str, Any], n: int, rng: np.random.Generator) -> List[Dict[str, Any]]:
+    seen, candidates = set(), []
+    for _ in range(n * 20):
+        params = sample_candidate(space, rng)
+        key = json.dumps(params, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            candidates.append(params)
+            if len(candidates) == n:
+                break
+    return candidates
+
+
+def fold_matrices(rows: Optional[int], folds: int, seed: int):
+    """Preprocessed (X_fit, y_fit, X_val, y_val) per CV fold of the training split.
+
+    `rows` takes a stratified subsample of the training split (None = all
+    of it). The preprocessor does not depend on any searched parameter, so
+    it is fitted once per fold and every candidate only fits its estimator
+    on the cached matrices. The matrices live in the feature transform
+    cache, keyed by the training split: a full-size search with seed 42
+    shares them with the CV folds of training.
+    """
+    labeled = get_training_store().count()
+    df = load_data(labeled)
+    X, y = split_xy(df)
+    # The same split as training: the test rows never take part in the search
+    X_train, _, y_train, _ = train_test_split(X, y, test_size=0.25, random_state=42, stratify=y)
+    if rows is not None and rows < len(X_train):
+        X_train, _, y_train, _ = train_test_split(X_train, y_train, train_size=rows,
+                                                  random_state=seed, stratify=y_train)
+    else:
+        rows = None
+    splits = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed).split(X_train, y_train)
+    return features.fold_matrices((split_key(labeled), rows, folds, seed), X_train, y_train, splits)
+
+
+def _score_task(data, rows, fold, candidate_id, algorithm, params, metric) -> Dict[str, Any]:
+    X_fit, y_fit, X_val, y_val = data[rows][fold]
+    scorer, needs_proba = METRICS[metric]
+    started = time.perf_counter()
+    result = {'id': candidate_id, 'fold': fold}
+    try:
+        model = ESTIMATORS[algorithm](**params).fit(X_fit, y_fit)
+        predicted = model.predict_proba(X_val)[:, 1] if needs_proba else model.predict(X_val)
+        result['score'] = float(scorer(y_val, predicted))
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+def _rung_sizes(strategy, n_rows, n_candidates, factor, min_resources):
+    """Training rows per rung; the last rung always uses every row."""
+    if strategy != 'halving':
+        return [None]
+    by_candidates = int(math.floor(math.log(max(n_candidates, 1), factor))) + 1
+    by_rows = int(math.floor(math.log(max(n_rows / min_resources, 1), factor))) + 1
+    rungs = max(1, min(by_candidates, by_rows))
+    return [int(n_rows / factor ** (rungs - 1 - i)) for i in range(rungs - 1)] + [None]
+
+
+def search(strategy: str = 'random', algorithms: Optional[List[str]] = None,
+           spaces: Optional[Dict[str, Dict[str, Any]]] = None, n_candidates: int = 20, cv_folds: int = 3,
+           metric: str = 'roc_auc', factor: int = 3, min_resources: int = 400, workers: Optional[int] = None,
+           seed: int = 0, top: int = 10,
+           progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+           should_stop: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
+    """Cross-validated hyperparameter search on the training split, per algorithm.
+
+    strategy: 'grid' (every combination of list-valued spaces), 'random'
+    (n_candidates samples per algorithm) or 'halving' (successive halving
+    of n_candidates random samples: each rung scores the survivors on
+    `factor` times more training rows and keeps the best 1/factor, the
+    last rung uses all rows). Candidates start from model_config.json with
+    the sampled parameters on top. Folds and candidates run through
+    run_tasks with `workers` processes (default SEARCH_WORKERS, else 1).
+    `progress` gets a 'candidate' event whenever a candidate's folds are
+    all scored, carrying the current leaderboard.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f'strategy must be one of {", ".join(STRATEGIES)}')
+    if metric not in METRICS:
+        raise ValueError(f'metric must be one of {", ".join(METRICS)}')
+    started = time.perf_counter()
+    workers = int(os.getenv('SEARCH_WORKERS', 1)) if workers is None else workers
+    workers = workers or os.cpu_count() or 1
+    spaces = {**SEARCH_SPACES, **(spaces or {})}
+    base = algorithm_params(names=algorithms)
+    rng = np.random.default_rng(seed)
+
+    candidates: Dict[str, Dict[str, Any]] = {}
+    for algorithm in base:
+        space = spaces.get(algorithm) or {}
+        sampled = grid_candidates(space) if strategy == 'grid' else random_candidates(space, n_candidates, rng)
+        for i, params in enumerate(sampled):
+            candidates[f'{algorithm}-{i}'] = {'id': f'{algorithm}-{i}', 'algorithm': algorithm, 'sampled': params,
+                                              'params': {**base[algorithm], **params}}
+    if not candidates:
+        raise ValueError('Nothing to search')
+    if len(candidates) > MAX_CANDIDATES:
+        raise ValueError(f'{len(candidates)} candidates, at most {MAX_CANDIDATES}; narrow the grid')
+
+    _, y_fit, _, y_val = fold_matrices(None, cv_folds, seed)[0]
+    n_rows = len(y_fit) + len(y_val)
+    per_algorithm = max(sum(1 for c in candidates.values() if c['algorithm'] == a) for a in base)
+    rungs = _rung_sizes(strategy, n_rows, per_algorithm, factor, min_resources)
+    data = {rows: fold_matrices(rows, cv_folds, seed) for rows in rungs}
+
+    # Tasks over all rungs, for the progress percentage
+    planned, alive = 0, {a: sum(1 for c in candidates.values() if c['algorithm'] == a) for a in base}
+    for _ in rungs:
+        planned += sum(alive.values()) * cv_folds
+        alive = {a: math.ceil(n / factor) for a, n in alive.items()}
+    done_tasks = 0
+    scores: Dict[str, Dict[int, float]] = {}
+    leaderboard: Dict[str, Dict[str, Any]] = {}
+
+    def check():
+        if should_stop is not None and should_stop():
+            raise TrainingCancelled('Search cancelled')
+
+    def ranked():
+        return sorted(leaderboard.values(), key=lambda e: (e['score'] is not None, e['rows'], e['score'] or 0),
+                      reverse=True)
+
+    survivors = list(candidates)
+    for rung, rows in enumerate(rungs):
+        rows_used = rows or n_rows
+        pending = {cid: {} for cid in survivors}
+        errors: Dict[str, str] = {}
+
+        def collect(result):
+            nonlocal done_tasks
+            done_tasks += 1
+            cid = result['id']
+            if 'error' in result:
+                errors[cid] = result['error']
+            pending[cid][result['fold']] = result.get('score')
+            if len(pending[cid]) < cv_folds:
+                return
+            candidate = candidates[cid]
+            values = [v for v in pending[cid].values() if v is not None]
+            entry = {'id': cid, 'algorithm': candidate['algorithm'], 'params': candidate['sampled'],
+                     'rung': rung, 'rows': rows_used,
+                     'score': float(np.mean(values)) if cid not in errors else None,
+                     'std': float(np.std(values)) if cid not in errors else None}
+            if cid in errors:
+                entry['error'] = errors[cid]
+            leaderboard[cid] = entry
+            scores[cid] = pending[cid]
+            if progress is not None:
+                best = ranked()[0]
+                progress({'stage': 'candidate', 'progress': round(100.0 * done_tasks / planned, 1),
+                          'message': f"{cid}: {metric} {entry['score'] if entry['score'] is not None else 'error'}"
+                                     f" on {rows_used} rows; best {best['id']} {best['score']}",
+                          'candidate': entry, 'leaderboard': ranked()[:top]})
+
+        tasks = [(_score_task, rows, fold, cid, candidates[cid]['algorithm'], candidates[cid]['params'], metric)
+                 for cid in survivors for fold in range(cv_folds)]
+        used = run_tasks(tasks, data, workers, collect, check)
+
+        if rung < len(rungs) - 1:
+            kept = []
+            for algorithm in base:
+                ranked_ids = sorted((cid for cid in survivors if candidates[cid]['algorithm'] == algorithm
+                                     and leaderboard[cid]['score'] is not None),
+                                    key=lambda cid: leaderboard[cid]['score'], reverse=True)
+                n_alive = sum(1 for cid in survivors if candidates[cid]['algorithm'] == algorithm)
+                kept.extend(ranked_ids[:math.ceil(n_alive / factor)])
+            log.info('Search rung %d (%d rows): kept %d of %d candidates', rung, rows_used, len(kept), len(survivors))
+            survivors = kept
+
+    best = {}
+    for algorithm in base:
+        finalists = [e for e in ranked() if e['algorithm'] == algorithm and e['score'] is not None]
+        if finalists:
+            winner = finalists[0]
+            best[algorithm] = {**winner, 'params': candidates[winner['id']]['params']}
+    seconds = time.perf_counter() - started
+    log.info('%s search: %d candidates, %d fits in %.1fs', strategy, len(candidates), done_tasks, seconds)
+    return {
+        'strategy': strategy, 'metric': metric, 'cvFolds': cv_folds, 'rungs': [r or n_rows for r in rungs],
+        'candidates': len(candidates), 'fits': done_tasks, 'workers': used, 'seconds': seconds,
+        'best': best, 'leaderboard': ranked()[:max(top, 50)],
+    }
+
+
+def promote(best: Dict[str, Dict[str, Any]], algorithms: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Write the winning parameters of a search result (its `best`) into model_config.json."""
+    chosen = {name: entry['params'] for name, entry in best.items() if not algorithms or name in algorithms}
+    if not chosen:
+        raise ValueError('The search has no result for these algorithms')
+    config = load_config()
+    for name, params in chosen.items():
+        config[name] = {**config.get(name, {}), **params}
+    CONFIG_FILE.parent.mkdir(parents=True, exist_ok=True)
+    _write_json(CONFIG_FILE, config)
+    log.info('Promoted search results for %s to %s', ', '.join(chosen), CONFIG_FILE)
+    return config
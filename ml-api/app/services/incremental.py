@@ -0,0 +1,233 @@
+import os
+import math
+import time
+import warnings
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Callable, List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.model_selection import train_test_split
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+from sklearn.neighbors import KNeighborsClassifier
+
+from .training import (
+    MODEL_DIR, MANIFEST_NAME, ESTIMATORS, EXPORT_COMPACT, EXPORT_FLOAT32,
+    _Progress, _read_json, _record_models, evaluate, load_data, train,
+)
+from .features import FEATURE_COLUMNS, TARGET_COL, clean, split_xy
+from .training_store import get_training_store
+from .model_artifacts import dump_joblib, export_compact, compact_path, load_model
+from ..utils.log import get_logger
+
+log = get_logger('training')
+
+MODES = ('full', 'incremental', 'auto')
+# In auto mode a model is retrained from scratch once its last full training is this old
+# or it has had this many incremental updates (each one adds trees to the ensembles)
+FULL_RETRAIN_DAYS = float(os.getenv('INCREMENTAL_FULL_RETRAIN_DAYS', 7))
+MAX_UPDATES = int(os.getenv('INCREMENTAL_MAX_UPDATES', 20))
+# Trees added per update, as a fraction of the ensemble, and old rows replayed with the new ones
+ADD_TREES = float(os.getenv('INCREMENTAL_ADD_TREES', 0.1))
+REPLAY_ROWS = int(os.getenv('INCREMENTAL_REPLAY_ROWS', 2000))
+
+
+def _stack(a, b):
+    if sparse.issparse(a) or sparse.issparse(b):
+        return sparse.vstack([a, b]).tocsr()
+    return np.vstack([a, b])
+
+
+def update_pipeline(pipeline, X_new, y_new, X_seen, y_seen, add_trees: float = ADD_TREES,
+                    replay: int = REPLAY_ROWS, seed: int = 0) -> str:
+    """Fold new rows into a fitted preprocessor + model pipeline, in place; returns the method used.
+
+    `X_seen`/`y_seen` are the rows the model was trained on so far. The
+    preprocessor stays as fitted. Estimators with partial_fit get the new
+    rows; KNN appends them to its index; random forest and gradient
+    boosting keep their trees and grow `add_trees` of the ensemble more
+    (warm_start) on the new rows plus `replay` sampled old ones; anything
+    else (e.g. liblinear logistic regression) refits the estimator on all
+    rows, warm-started where the estimator supports it.
+    """
+    preprocessor, model = pipeline.named_steps['preprocessor'], pipeline.named_steps['model']
+    Z_new, y_new = preprocessor.transform(X_new), np.asarray(y_new)
+    if hasattr(model, 'partial_fit'):
+        model.partial_fit(Z_new, y_new)
+        return 'partial_fit'
+    if isinstance(model, KNeighborsClassifier):
+        # A neighbours model is its training rows: refitting only rebuilds the search index
+        model.fit(_stack(model._fit_X, Z_new), np.concatenate([model.classes_[model._y], y_new]))
+        return 'append'
+    if isinstance(model, (RandomForestClassifier, GradientBoostingClassifier)):
+        rng = np.random.default_rng(seed)
+        idx = rng.choice(len(X_seen), size=min(replay, len(X_seen)), replace=False)
+        Z = _stack(Z_new, preprocessor.transform(X_seen.iloc[idx]))
+        y = np.concatenate([y_new, np.asarray(y_seen)[idx]])
+        extra = max(1, math.ceil(model.n_estimators * add_trees))
+        model.set_params(warm_start=True, n_estimators=model.n_estimators + extra)
+        with warnings.catch_warnings():
+            # class_weight='balanced' is computed on this batch only, which is what we want here
+            warnings.simplefilter('ignore', UserWarning)
+            model.fit(Z, y)
+        model.set_params(warm_start=False)
+        return 'warm_start'
+    if 'warm_start' in model.get_params():
+        model.set_params(warm_start=True)
+    model.fit(_stack(preprocessor.transform(X_seen), Z_new), np.concatenate([np.asarray(y_seen), y_new]))
+    if 'warm_start' in model.get_params():
+        model.set_params(warm_start=False)
+    return 'refit'
+
+
+def _training_info(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Where a served model stands; models trained before the labeled store existed have seen none of it."""
+    info = {'mode': 'full', 'labeledRows': 0, 'fullLabeledRows': 0, 'fullAt': entry.get('trained_at'), 'updates': 0}
+    info.update(entry.get('training') or {})
+    return info
+
+
+def full_retrain_reason(entry: Dict[str, Any], now: Optional[datetime] = None) -> Optional[str]:
+    """Why a served model's schedule calls for a full retrain, or None."""
+    info = _training_info(entry)
+    if info['fullAt']:
+        full_at = datetime.fromisoformat(info['fullAt'].rstrip('Z'))
+        days = ((now or datetime.utcnow()) - full_at).total_seconds() / 86400
+        if days >= FULL_RETRAIN_DAYS:
+            return f'last full training {days:.1f} days ago'
+    if info['updates'] >= MAX_UPDATES:
+        return f"{info['updates']} incremental updates since the last full training"
+    return None
+
+
+def _artifact(source_dir: Path, entry: Dict[str, Any]) -> Optional[Path]:
+    """The served file of a manifest entry: its `file`, else `<name>.joblib` in source_dir (as the registry
+    finds it); None when neither exists."""
+    for path in (entry.get('file'), source_dir / f"{entry['name']}.joblib"):
+        if path and Path(path).is_file():
+            return Path(path)
+    return None
+
+
+def _split(full_labeled_rows: int):
+    """The train/test split of a model's last full training: the same rows, the same seed."""
+    X, y = split_xy(load_data(full_labeled_rows))
+    return train_test_split(X, y, test_size=0.25, random_state=42, stratify=y)
+
+
+def update(algorithms: Optional[List[str]] = None, model_dir=MODEL_DIR, source_dir=MODEL_DIR,
+           progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+           should_stop: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
+    """Update the served models in `source_dir` with the labeled rows they have not seen yet.
+
+    Updated models are saved and recorded in `model_dir` like `train` does.
+    They are scored on the test split of their last full training, which
+    new rows never enter; models with nothing new are left out.
+    """
+    started = time.perf_counter()
+    source_dir, model_dir = Path(source_dir), Path(model_dir)
+    served = {e['name']: e for e in _read_json(source_dir / MANIFEST_NAME, []) if e.get('name') in ESTIMATORS}
+    names = [n for n in served if not algorithms or n in algorithms]
+    if not names:
+        raise ValueError('No trained model to update; run a full training first')
+    store = get_training_store()
+    total = store.count()
+    tracker = _Progress(1 + len(names), progress, should_stop)
+    tracker.check()
+    splits: Dict[int, Any] = {}
+    tracker.step('load', f'{total} labeled rows in the training store', labeledRows=total)
+    model_dir.mkdir(parents=True, exist_ok=True)
+
+    models, manifest, timings = {}, [], {}
+    for name in names:
+        info = _training_info(served[name])
+        artifact = _artifact(source_dir, served[name])
+        if artifact is None:
+            log.warning('No model file for %s in %s; it needs a full training', name, source_dir)
+            tracker.step('skip', f'{name}: model file missing, run a full training', algorithm=name)
+            continue
+        new = clean(store.frame(info['labeledRows'], total))
+        if new.empty:
+            tracker.step('skip', f'{name}: no new labeled rows', algorithm=name)
+            continue
+        if info['fullLabeledRows'] not in splits:
+            splits[info['fullLabeledRows']] = _split(info['fullLabeledRows'])
+        X_train, X_test, y_train, y_test = splits[info['fullLabeledRows']]
+        # Rows taken in by earlier updates count as seen too
+        earlier = clean(store.frame(info['fullLabeledRows'], info['labeledRows']))
+        X_seen, y_seen = X_train, y_train
+        if not earlier.empty:
+            X_seen = pd.concat([X_train, earlier[FEATURE_COLUMNS]], ignore_index=True)
+            y_seen = pd.concat([y_train, earlier[TARGET_COL]], ignore_index=True)
+
+        pipeline = load_model(str(artifact))
+        t0 = time.perf_counter()
+        method = update_pipeline(pipeline, new[FEATURE_COLUMNS], new[TARGET_COL], X_seen, y_seen,
+                                 seed=info['updates'])
+        seconds = time.perf_counter() - t0
+        metrics = evaluate(pipeline, X_test, y_test)
+        model_path = model_dir / f'{name}.joblib'
+        dump_joblib(pipeline, model_path)
+        if EXPORT_COMPACT:
+            export_compact(pipeline, compact_path(str(model_path)), float32=EXPORT_FLOAT32, X=X_test)
+        trained_at = datetime.utcnow().isoformat() + 'Z'
+        entry = {'name': name, 'file': str(model_path), 'trained_at': trained_at,
+                 'training': {**info, 'mode': 'incremental', 'method': method, 'labeledRows': total,
+                              'updates': info['updates'] + 1, 'newRows': len(new)}}
+        _record_models(model_dir, [entry], {name: metrics})
+        manifest.append(entry)
+        models[name] = metrics
+        timings[name] = {'fit': seconds}
+        tracker.step('fit', f"{name}: {method} with {len(new)} new rows in {seconds:.2f}s, "
+                            f"ROC AUC {metrics['roc_auc'] or 0:.4f}",
+                     algorithm=name, method=method, rows=len(new), metrics=metrics, seconds=seconds)
+
+    wall = time.perf_counter() - started
+    log.info('Updated %d models into %s in %.1fs', len(manifest), model_dir, wall)
+    return {'mode': 'incremental', 'modelDir': str(model_dir), 'models': models, 'manifest': manifest,
+            'seconds': wall, 'timings': timings, 'labeledRows': total}
+
+
+def _scaled(progress, start: float, share: float):
+    if progress is None:
+        return None
+    return lambda event: progress({**event, 'progress': round(start + share * event['progress'], 1)})
+
+
+def retrain(mode: str = 'full', algorithms: Optional[List[str]] = None, model_dir=MODEL_DIR,
+            source_dir=MODEL_DIR, progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+            should_stop: Optional[Callable[[], bool]] = None, **train_options) -> Dict[str, Any]:
+    """Full training, an incremental update, or ('auto') a full retrain of the models whose
+    schedule calls for one (see full_retrain_reason) and an update of the others."""
+    if mode not in MODES:
+        raise ValueError(f'mode must be one of {", ".join(MODES)}')
+    if mode == 'full':
+        return {'mode': 'full', **train(algorithms=algorithms, model_dir=model_dir, progress=progress,
+                                        should_stop=should_stop, **train_options)}
+    if mode == 'incremental':
+        return update(algorithms, model_dir, source_dir, progress, should_stop)
+
+    served = {e['name']: e for e in _read_json(Path(source_dir) / MANIFEST_NAME, [])}
+    names = [n for n in ESTIMATORS if not algorithms or n in algorithms]
+    reasons = {n: 'not trained yet' if n not in served else
+               'model file missing' if _artifact(Path(source_dir), served[n]) is None else
+               full_retrain_reason(served[n]) for n in names}
+    full = [n for n in names if reasons[n]]
+    incremental = [n for n in names if not reasons[n]]
+    for name in full:
+        log.info('Scheduled full retrain of %s: %s', name, reasons[name])
+    share = len(full) / len(names)
+    result = {'mode': 'auto', 'reasons': {n: r for n, r in reasons.items() if r}, 'models': {}, 'manifest': []}
+    if full:
+        result['full'] = train(algorithms=full, model_dir=model_dir, progress=_scaled(progress, 0, share),
+                               should_stop=should_stop, **train_options)
+    if incremental:
+        result['incremental'] = update(incremental, model_dir, source_dir,
+                                       _scaled(progress, 100 * share, 1 - share), should_stop)
+    for part in ('full', 'incremental'):
+        if part in result:
+            result['models'].update(result[part]['models'])
+            result['manifest'].extend(result[part]['manifest'])
+    return result
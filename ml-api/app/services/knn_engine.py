@@ -0,0 +1,184 @@
+import os
+from typing import Dict, Any, Optional, Tuple
+
+import numpy as np
+
+INDEXES = ('brute', 'kdtree', 'ivf')
+
+
+class KNNEngine:
+    """Serving-time replacement for a fitted KNeighborsClassifier.
+
+    The training rows are copied once into a contiguous float32 array and
+    searched through an index built at load time:
+
+    - `brute`:  exact, one BLAS matrix product per batch over centred float32 data
+    - `kdtree`: exact, scipy cKDTree (the features are dominated by the three
+                unscaled numeric columns, so the tree prunes well)
+    - `ivf`:    approximate, k-means lists; only the `n_probe` lists closest to
+                the query are searched. More probes = higher recall, slower.
+
+    Distances stay in the model's own (unscaled Euclidean) feature space so
+    the neighbours, and therefore the probabilities, are those the model was
+    validated with. Only uniform weights are supported.
+    """
+
+    def __init__(self, knn, index: str = 'kdtree', n_lists: int = 0, n_probe: int = 8):
+        if index not in INDEXES:
+            raise ValueError(f"Unknown KNN index '{index}' (expected one of {', '.join(INDEXES)})")
+        if knn.weights != 'uniform' or knn.effective_metric_ != 'euclidean':
+            raise ValueError(f'Unsupported KNN configuration: weights={knn.weights}, '
+                             f'metric={knn.effective_metric_}')
+        self.index = index
+        self.classes_ = knn.classes_
+        self.n_neighbors = knn.n_neighbors
+        self.n_features_in_ = knn.n_features_in_
+        self._center = np.asarray(knn._fit_X, dtype=np.float64).mean(axis=0)
+        # Centring keeps the float32 values (and ||x||^2 in the brute index) small
+        self._X = np.ascontiguousarray(knn._fit_X - self._center, dtype=np.float32)
+        self._y = np.asarray(knn._y, dtype=np.int32)
+        self.n_probe = n_probe
+        self._tree = None
+        if index == 'brute':
+            self._norms = np.einsum('ij,ij->i', self._X, self._X)
+        elif index == 'kdtree':
+            from scipy.spatial import cKDTree
+            self._tree = cKDTree(self._X)
+        else:
+            self._build_lists(n_lists or int(np.sqrt(len(self._X))))
+
+    def _build_lists(self, n_lists: int):
+        from sklearn.cluster import MiniBatchKMeans
+        n_lists = max(1, min(n_lists, len(self._X)))
+        rng = np.random.RandomState(0)
+        sample = self._X[rng.choice(len(self._X), min(len(self._X), 64 * n_lists), replace=False)]
+        kmeans = MiniBatchKMeans(n_clusters=n_lists, n_init=1, batch_size=4096, random_state=0).fit(sample)
+        self._centroids = kmeans.cluster_centers_.astype(np.float32)
+        assignment = np.concatenate([self._nearest_centroid(chunk)
+                                     for chunk in np.array_split(self._X, max(1, len(self._X) // 65536))])
+        # Lists stored as one permutation plus offsets instead of n_lists small arrays
+        self._order = np.argsort(assignment, kind='stable').astype(np.int32)
+        self._offsets = np.searchsorted(assignment[self._order], np.arange(n_lists + 1)).astype(np.int64)
+
+    def _nearest_centroid(self, X: np.ndarray, n: int = 1) -> np.ndarray:
+        d = (np.einsum('ij,ij->i', self._centroids, self._centroids)[None, :]
+             - 2 * X @ self._centroids.T)
+        if n == 1:
+            return d.argmin(axis=1)
+        n = min(n, d.shape[1])
+        return np.argpartition(d, n - 1, axis=1)[:, :n]
+
+    def kneighbors(self, X) -> Tuple[np.ndarray, np.ndarray]:
+        """(distances, indices) of the n_neighbors closest training rows, nearest first."""
+        Q = np.ascontiguousarray(np.asarray(X, dtype=np.float64) - self._center, dtype=np.float32)
+        k = min(self.n_neighbors, len(self._X))
+        if self.index == 'kdtree':
+            dist, idx = self._tree.query(Q, k=k)
+            return dist.reshape(len(Q), k), idx.reshape(len(Q), k)
+        if self.index == 'brute':
+            return self._brute(Q, k)
+        return self._ivf(Q, k)
+
+    def _brute(self, Q: np.ndarray, k: int):
+        dists, idxs = [], []
+        # Chunk so the distance block stays around 64 MB
+        step = max(1, (1 << 24) // max(1, len(self._X)))
+        for start in range(0, len(Q), step):
+            q = Q[start:start + step]
+            d = self._norms[None, :] - 2 * q @ self._X.T + np.einsum('ij,ij->i', q, q)[:, None]
+            idx = np.argpartition(d, k - 1, axis=1)[:, :k] if k < d.shape[1] else np.tile(np.arange(d.shape[1]), (len(q), 1))
+            part = np.take_along_axis(d, idx, axis=1)
+            order = np.argsort(part, axis=1, kind='stable')
+            idxs.append(np.take_along_axis(idx, order, axis=1))
+            dists.append(np.sqrt(np.maximum(np.take_along_axis(part, order, axis=1), 0)))
+        return np.vstack(dists), np.vstack(idxs)
+
+    def _ivf(self, Q: np.ndarray, k: int):
+        probes = self._nearest_centroid(Q, self.n_probe)
+        dist = np.full((len(Q), k), np.inf)
+        idx = np.zeros((len(Q), k), dtype=np.int64)
+        for i, q in enumerate(Q):
+            candidates = np.concatenate([self._order[self._offsets[p]:self._offsets[p + 1]] for p in probes[i]])
+            if not len(candidates):
+                continue
+            diff = self._X[candidates] - q
+            d = np.einsum('ij,ij->i', diff, diff)
+            n = min(k, len(d))
+            top = np.argpartition(d, n - 1)[:n] if n < len(d) else np.arange(len(d))
+            top = top[np.argsort(d[top], kind='stable')]
+            dist[i, :n] = np.sqrt(d[top])
+            idx[i, :n] = candidates[top]
+        return dist, idx
+
+    def predict_proba(self, X) -> np.ndarray:
+        dist, idx = self.kneighbors(X)
+        labels = self._y[idx]
+        found = np.isfinite(dist)
+        counts = np.stack([((labels == c) & found).sum(axis=1) for c in range(len(self.classes_))], axis=1)
+        return counts / np.maximum(found.sum(axis=1, keepdims=True), 1)
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    def describe(self) -> Dict[str, Any]:
+        info = {'index': self.index, 'rows': len(self._X), 'bytes': int(self._X.nbytes)}
+        if self.index == 'ivf':
+            info.update(lists=len(self._centroids), probes=self.n_probe)
+        return info
+
+
+def compare(knn, engine: KNNEngine, X) -> Dict[str, float]:
+    """How closely the engine reproduces the sklearn model on rows X.
+
+    `agreement` is the share of rows with identical probabilities and
+    `recall` the share of the exact neighbours the engine found.
+    """
+    expected = knn.predict_proba(X)
+    actual = engine.predict_proba(X)
+    exact = knn.kneighbors(X, return_distance=False)
+    found = engine.kneighbors(X)[1]
+    recall = np.mean([len(np.intersect1d(a, b)) / len(a) for a, b in zip(exact, found)])
+    return {
+        'agreement': float(np.mean(np.all(np.abs(expected - actual) < 1e-9, axis=1))),
+        'recall': float(recall),
+        'maxDiff': float(np.max(np.abs(expected - actual)))
+    }
+
+
+def engine_options_from_env() -> Optional[Dict[str, Any]]:
+    """KNN_ENGINE settings, or None when the plain sklearn estimator should serve."""
+    index = os.getenv('KNN_ENGINE', 'kdtree').lower()
+    if index in ('', 'sklearn', 'off'):
+        return None
+    return {
+        'index': index,
+        'n_lists': int(os.getenv('KNN_LISTS', 0)),
+        'n_probe': int(os.getenv('KNN_PROBES', 8)),
+        'min_agreement': float(os.getenv('KNN_MIN_AGREEMENT', 0.98))
+    }
+
+
+def with_knn_engine(pipeline, options: Dict[str, Any], sample_size: int = 200):
+    """A copy of `pipeline` whose KNeighborsClassifier step is replaced by a KNNEngine.
+
+    The engine is checked against the original estimator on jittered training
+    rows; returns (pipeline, report), with the original pipeline when the
+    agreement is below `min_agreement` or the model is not a KNN pipeline.
+    """
+    from sklearn.pipeline import Pipeline
+    from sklearn.neighbors import KNeighborsClassifier
+
+    if not isinstance(pipeline, Pipeline) or not isinstance(pipeline.steps[-1][1], KNeighborsClassifier):
+        return pipeline, None
+    knn = pipeline.steps[-1][1]
+    engine = KNNEngine(knn, index=options['index'], n_lists=options.get('n_lists', 0),
+                       n_probe=options.get('n_probe', 8))
+    rng = np.random.RandomState(0)
+    rows = knn._fit_X[rng.choice(len(knn._fit_X), min(sample_size, len(knn._fit_X)), replace=False)]
+    queries = rows + rng.normal(scale=0.5, size=rows.shape) * (rows.std(axis=0) > 1)
+    report = {**engine.describe(), **compare(knn, engine, queries)}
+    if report['agreement'] < options.get('min_agreement', 0.98):
+        report['used'] = False
+        return pipeline, report
+    report['used'] = True
+    return Pipeline(pipeline.steps[:-1] + [(pipeline.steps[-1][0], engine)]), report
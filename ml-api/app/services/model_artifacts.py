@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import shutil
+import pickle
+import tempfile
+from pathlib import Path
+from typing import Dict, Any
+
+import numpy as np
+
+from ..utils.log import get_logger
+
+log = get_logger('ml')
+
+COMPACT_SUFFIX = '.compact'
+FORMAT_VERSION = 1
+# Arrays at least this large go to their own .npy file; smaller ones stay in the pickle
+ARRAY_THRESHOLD = 16 * 1024
+
+
+class _ArrayPickler(pickle.Pickler):
+    """Pickles a model but writes every large plain ndarray to arrays/<n>.npy."""
+
+    def __init__(self, f, array_dir: Path, float32: bool, threshold: int):
+        super().__init__(f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._array_dir = array_dir
+        self._float32 = float32
+        self._threshold = threshold
+        self._saved: Dict[int, str] = {}
+        self._keep = []  # keep arrays alive so their id() is not reused while pickling
+        self.arrays = []
+
+    def persistent_id(self, obj):
+        # Structured arrays (sklearn tree nodes) are copied by their owner on load anyway
+        if (not isinstance(obj, np.ndarray) or obj.dtype.hasobject or obj.dtype.names is not None
+                or obj.nbytes < self._threshold):
+            return None
+        if id(obj) in self._saved:
+            return ('ndarray', self._saved[id(obj)])
+        array = obj
+        if self._float32 and array.dtype == np.float64:
+            array = array.astype(np.float32)
+        name = f'{len(self._saved):04d}.npy'
+        np.save(self._array_dir / name, np.asarray(array), allow_pickle=False)
+        self._saved[id(obj)] = name
+        self._keep.append(obj)
+        self.arrays.append({'file': name, 'shape': list(array.shape), 'dtype': str(array.dtype),
+                            'sourceDtype': str(obj.dtype), 'bytes': int(array.nbytes)})
+        return ('ndarray', name)
+
+
+class _ArrayUnpickler(pickle.Unpickler):
+    def __init__(self, f, array_dir: Path, mmap: bool):
+        super().__init__(f)
+        self._array_dir = array_dir
+        self._mmap_mode = 'r' if mmap else None
+
+    def persistent_load(self, pid):
+        kind, name = pid
+        if kind != 'ndarray':
+            raise pickle.UnpicklingError(f'Unknown persistent id {pid!r}')
+        return np.load(self._array_dir / name, mmap_mode=self._mmap_mode, allow_pickle=False)
+
+
+def save_compact(model, path, float32: bool = False, threshold: int = ARRAY_THRESHOLD) -> Dict[str, Any]:
+    """Write `model` as a compact artifact directory and return its metadata.
+
+    The directory holds model.pkl (the object graph) plus arrays/*.npy for
+    the large arrays, which `load_compact` can memory-map so that every
+    process shares one page-cache copy. With float32=True float64 arrays are
+    stored as float32 (check the predictions before serving such a model).
+    The new directory replaces an existing one by rename, so processes that
+    still map the old arrays keep reading the old, unlinked files.
+    """
+    path = Path(path)
+    tmp = Path(tempfile.mkdtemp(prefix=path.name + '.', suffix='.tmp', dir=path.parent))
+    try:
+        (tmp / 'arrays').mkdir()
+        with open(tmp / 'model.pkl', 'wb') as f:
+            pickler = _ArrayPickler(f, tmp / 'arrays', float32, threshold)
+            pickler.dump(model)
+        meta = {'format': FORMAT_VERSION, 'float32': float32, 'arrays': pickler.arrays,
+                'createdAt': time.time()}
+        with open(tmp / 'meta.json', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+        old = None
+        if path.exists():
+            old = path.with_name(f'{path.name}.old-{os.getpid()}')
+            os.replace(path, old)
+        os.replace(tmp, path)
+        if old is not None:
+            shutil.rmtree(old, ignore_errors=True)
+        return meta
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def export_compact(model, path, float32: bool = False, X=None, max_diff: float = 1e-4) -> Dict[str, Any]:
+    """save_compact with a float32 safety net.
+
+    When float32 is requested and sample rows X are given, the artifact is
+    loaded back and compared with the in-memory model; if it fails to load
+    or moves any probability by more than max_diff it is rewritten as
+    float64. The returned metadata carries the observed `maxDiff`.
+    """
+    meta = save_compact(model, path, float32=float32)
+    if not float32 or X is None or not hasattr(model, 'predict_proba'):
+        return meta
+    try:
+        diff = float(np.max(np.abs(model.predict_proba(X)[:, 1]
+                                   - load_compact(path, mmap=True).predict_proba(X)[:, 1])))
+    except Exception as e:
+        log.warning('float32 artifact at %s is not loadable (%s), keeping float64', path, e)
+        diff = float('inf')
+    if diff > max_diff:
+        if diff != float('inf'):
+            log.warning('float32 moves probabilities by %.2g at %s, keeping float64', diff, path)
+        meta = save_compact(model, path, float32=False)
+        diff = 0.0
+    return {**meta, 'maxDiff': diff}
+
+
+def load_compact(path, mmap: bool = True):
+    path = Path(path)
+    with open(path / 'meta.json', 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('format') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format {meta.get('format')} in {path}")
+    with open(path / 'model.pkl', 'rb') as f:
+        return _ArrayUnpickler(f, path / 'arrays', mmap).load()
+
+
+def load_model(path, mmap: bool = False):
+    """Load a .joblib file or a compact artifact directory.
+
+    With mmap=True the arrays are memory-mapped read-only: from the .npy
+    files of a compact artifact, or from inside an uncompressed .joblib.
+    """
+    if os.path.isdir(path):
+        return load_compact(path, mmap=mmap)
+    import joblib
+    return joblib.load(path, mmap_mode='r' if mmap else None)
+
+
+def dump_joblib(model, path):
+    """joblib.dump through a temporary file and rename, never rewriting a mapped file in place."""
+    import joblib
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(prefix=path.name + '.', suffix='.tmp', dir=path.parent)
+    os.close(fd)
+    try:
+        joblib.dump(model, tmp)
+        os.replace(tmp, path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def copy_artifact(source, target):
+    """Copy a .joblib file or compact directory over `target` by rename, like dump_joblib/save_compact."""
+    source, target = Path(source), Path(target)
+    if source.is_dir():
+        tmp = Path(tempfile.mkdtemp(prefix=target.name + '.', suffix='.tmp', dir=target.parent))
+        shutil.rmtree(tmp)
+        shutil.copytree(source, tmp)
+        old = None
+        if target.exists():
+            old = target.with_name(f'{target.name}.old-{os.getpid()}')
+            os.replace(target, old)
+        os.replace(tmp, target)
+        if old is not None:
+            shutil.rmtree(old, ignore_errors=True)
+        return
+    fd, tmp = tempfile.mkstemp(prefix=target.name + '.', suffix='.tmp', dir=target.parent)
+    os.close(fd)
+    try:
+        shutil.copyfile(source, tmp)
+        os.replace(tmp, target)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def artifact_size(path) -> int:
+    """Bytes on disk of a .joblib file or a compact artifact directory."""
+    if os.path.isdir(path):
+        return sum(p.stat().st_size for p in Path(path).rglob('*') if p.is_file())
+    return os.path.getsize(path)
+
+
+def compact_path(joblib_path) -> str:
+    return os.path.splitext(joblib_path)[0] + COMPACT_SUFFIX
@@ -0,0 +1,243 @@
+import os
+import glob
+import time
+import hashlib
+import threading
+from typing import Dict, Any, List, Optional
+
+from ..utils.log import get_logger
+
+log = get_logger('ml')
+
+
+class ModelRegistry:
+    """Knows which model files exist and loads each pipeline on first use.
+
+    Discovery is only a directory listing, so constructing the registry is
+    cheap. Models are loaded by `get` on demand or all at once by `warm_up`
+    (optionally in a background thread); `is_ready` turns true once every
+    served model is in memory. `allow` restricts which models are served.
+
+    A registry is one model version: hot reload builds a new registry and
+    swaps it in, it never mutates a registry that requests are using.
+
+    With `fast=True` each pipeline is also compiled for pandas-free single-row
+    scoring (see fast_inference); a compiled model is only kept if it matches
+    `Pipeline.predict_proba` on a parity sample. `knn_engine` (options from
+    knn_engine.engine_options_from_env) serves KNN pipelines through an
+    indexed KNNEngine instead of sklearn's neighbour search.
+
+    A compact artifact (`<name>.compact/`, see model_artifacts) is served
+    instead of `<name>.joblib` when it is at least as new; with `mmap=True`
+    the model arrays are memory-mapped and shared between processes.
+    """
+
+    def __init__(self, models_dir: str, model_path: str = '', allow: Optional[List[str]] = None,
+                 version: str = 'initial', fast: bool = False,
+                 knn_engine: Optional[Dict[str, Any]] = None, prefer_compact: bool = True,
+                 mmap: bool = False):
+        self.version = version
+        self._prefer_compact = prefer_compact
+        self._mmap = mmap
+        self._fast = fast
+        self._knn_engine = knn_engine
+        self._engines: Dict[str, Any] = {}
+        self._compiled: Dict[str, Any] = {}
+        self._models_dir = models_dir
+        self._allow = set(allow) if allow else None
+        self._paths: Dict[str, str] = {}
+        self._models: Dict[str, Any] = {}
+        self._errors: Dict[str, str] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._ready = threading.Event()
+        self._discover(model_path)
+
+    def _discover(self, model_path: str):
+        # Try explicit single model path
+        if model_path and os.path.exists(model_path):
+            self._paths['default'] = model_path
+
+        # All .joblib models under models dir
+        try:
+            pattern = os.path.join(self._models_dir, '*.joblib')
+            for file in sorted(glob.glob(pattern)):
+                name = os.path.splitext(os.path.basename(file))[0]
+                if name not in self._paths:
+                    self._paths[name] = file
+            if self._prefer_compact:
+                self._discover_compact()
+        except Exception as e:
+            log.error('Model directory scan failed: %s', e)
+
+        if self._allow is not None:
+            skipped = [n for n in self._paths if n not in self._allow]
+            self._paths = {n: p for n, p in self._paths.items() if n in self._allow}
+            if skipped:
+                log.info('Not serving models outside the allow-list: %s', ', '.join(skipped))
+        self._locks = {name: threading.Lock() for name in self._paths}
+        if not self._paths:
+            self._ready.set()
+
+    def _discover_compact(self):
+        from .model_artifacts import COMPACT_SUFFIX
+        pattern = os.path.join(self._models_dir, '*' + COMPACT_SUFFIX)
+        for directory in sorted(glob.glob(pattern)):
+            meta = os.path.join(directory, 'meta.json')
+            if not os.path.isfile(meta):
+                continue
+            name = os.path.basename(directory)[:-len(COMPACT_SUFFIX)]
+            current = self._paths.get(name)
+            if current and os.path.isfile(current) and os.path.getmtime(current) > os.path.getmtime(meta):
+                log.warning("Ignoring stale compact artifact for '%s' (older than %s)", name, current)
+                continue
+            self._paths[name] = directory
+
+    def names(self) -> List[str]:
+        return list(self._paths)
+
+    def get(self, name: str) -> Optional[Any]:
+        """The loaded pipeline, loading it now if needed (None if it failed to load)."""
+        model = self._models.get(name)
+        if model is not None or name not in self._paths:
+            return model
+        with self._locks[name]:
+            if name not in self._models and name not in self._errors:
+                self._load(name)
+        return self._models.get(name)
+
+    def models(self) -> Dict[str, Any]:
+        """All served models that loaded successfully, in discovery order."""
+        loaded = {}
+        for name in self._paths:
+            model = self.get(name)
+            if model is not None:
+                loaded[name] = model
+        return loaded
+
+    def _load(self, name: str):
+        from .model_artifacts import load_model
+        path = self._paths[name]
+        try:
+            model = load_model(path, mmap=self._mmap)
+            if self._knn_engine:
+                model = self._with_engine(name, model)
+            if self._fast:
+                self._compile(name, model)
+            self._models[name] = model
+            log.info("Loaded model '%s' from %s", name, path)
+        except Exception as e:
+            self._errors[name] = str(e)
+            log.error("Failed to load model '%s': %s", name, e)
+        if all(n in self._models or n in self._errors for n in self._paths):
+            self._ready.set()
+
+    def _with_engine(self, name: str, model):
+        from .knn_engine import with_knn_engine
+        try:
+            model, report = with_knn_engine(model, self._knn_engine)
+        except Exception as e:
+            log.warning("KNN engine disabled for '%s': %s", name, e)
+            return model
+        if report is not None:
+            self._engines[name] = report
+            log.info("KNN engine for '%s': %s index, agreement %.1f%%, recall %.1f%%%s", name,
+                     report['index'], report['agreement'] * 100, report['recall'] * 100,
+                     '' if report['used'] else ' - below threshold, using sklearn')
+        return model
+
+    def _compile(self, name: str, model):
+        from .fast_inference import compile_pipeline, check_parity
+        try:
+            compiled = compile_pipeline(model)
+            if compiled is None:
+                log.info("Model '%s' has no fast path, using the full pipeline", name)
+                return
+            check_parity(model, compiled)
+            self._compiled[name] = compiled
+        except Exception as e:
+            log.warning("Fast path disabled for '%s': %s", name, e)
+
+    def compiled(self, name: str) -> Optional[Any]:
+        """The parity-checked CompiledPipeline of a loaded model, if it has one."""
+        return self._compiled.get(name)
+
+    def warm_up(self, background: bool = True):
+        """Load every served model, in a daemon thread unless background=False."""
+        if not background:
+            self.models()
+            return
+        threading.Thread(target=self.models, name='model-warm-up', daemon=True).start()
+
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'version': self.version,
+            'ready': self.is_ready(),
+            'models': {
+                name: ('loaded' if name in self._models else
+                       'failed' if name in self._errors else 'pending')
+                for name in self._paths
+            },
+            'fastPath': sorted(self._compiled),
+            'engines': dict(self._engines),
+            'errors': dict(self._errors)
+        }
+
+
+def manifest_version(manifest_file: str) -> str:
+    """Short content hash of the training manifest (models.json)."""
+    try:
+        with open(manifest_file, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()[:12]
+    except OSError:
+        return 'initial'
+
+
+class ModelWatcher:
+    """Polls the training outputs and calls `on_change` when they are rewritten.
+
+    Like the history writer it starts its thread lazily per process, so it
+    also runs in workers forked from a preloading master.
+    """
+
+    def __init__(self, files: List[str], on_change, interval: float = 5.0):
+        self._files = files
+        self._on_change = on_change
+        self._interval = interval
+        self._pid = None
+        self._lock = threading.Lock()
+        self._last = self._signature()
+
+    def _signature(self):
+        sig = []
+        for path in self._files:
+            try:
+                st = os.stat(path)
+                sig.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                sig.append(None)
+        return sig
+
+    def ensure_started(self):
+        if self._interval <= 0 or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name='model-watcher', daemon=True).start()
+
+    def _run(self):
+        seen = self._last
+        while True:
+            time.sleep(self._interval)
+            signature = self._signature()
+            # Wait for the files to settle: training writes the manifest and metrics one after another
+            if signature != self._last and signature == seen:
+                self._last = signature
+                try:
+                    self._on_change()
+                except Exception as e:
+                    log.error('Model reload after file change failed: %s', e)
+            seen = signature
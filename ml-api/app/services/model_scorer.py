@@ -0,0 +1,105 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Any, List, Callable
+
+from ..utils.log import get_logger
+from ..utils.metrics import REGISTRY
+
+log = get_logger('ml')
+
+MODEL_SECONDS = REGISTRY.histogram('ml_model_score_seconds', 'Time per scoring call, per model', ('model',))
+MODEL_FAILURES = REGISTRY.counter('ml_model_failures_total', 'Scoring calls that raised or timed out',
+                                  ('model', 'reason'))
+
+
+class ModelScorer:
+    """Runs one scoring call per model, one after another or on a shared thread pool.
+
+    In `parallel` mode every model is submitted at once, so a request takes
+    as long as its slowest model rather than the sum (sklearn releases the
+    GIL in most of its kernels). With a `timeout` the request stops waiting
+    after that many seconds and returns the models that finished; the late
+    ones are reported in `timedOut` and finish in the background. The serial
+    mode cannot interrupt a model, so it ignores the timeout.
+
+    The pool is created lazily per process, like the history writer, so it
+    also works in workers forked from a preloading master.
+    """
+
+    MODES = ('serial', 'parallel')
+
+    def __init__(self, mode: str = 'serial', workers: int = 0, timeout: float = 0):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown scoring mode '{mode}' (expected one of {', '.join(self.MODES)})")
+        self.mode = mode
+        self.timeout = timeout
+        # Timed-out models keep a worker busy until they finish, so leave headroom
+        self._workers = workers or min(32, (os.cpu_count() or 1) + 4)
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'ModelScorer':
+        return cls(mode=os.getenv('SCORING_MODE', 'serial').lower(),
+                   workers=int(os.getenv('SCORING_WORKERS', 0)),
+                   timeout=float(os.getenv('MODEL_TIMEOUT', 0)))
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pool = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix='model-scorer')
+                    self._pid = os.getpid()
+        return self._pool
+
+    def run(self, tasks: Dict[str, Callable[[], Any]]) -> Dict[str, Any]:
+        """Call every task and collect `scores`, per-model `timings` (ms) and `timedOut` names.
+
+        A task that raises is logged and left out of the scores.
+        """
+        scores: Dict[str, Any] = {}
+        timings: Dict[str, float] = {}
+        timed_out: List[str] = []
+
+        def timed(name, task):
+            started = time.perf_counter()
+            try:
+                return task()
+            finally:
+                elapsed = time.perf_counter() - started
+                timings[name] = round(elapsed * 1000, 3)
+                MODEL_SECONDS.observe(elapsed, model=name)
+
+        if self.mode == 'serial' or len(tasks) < 2:
+            for name, task in tasks.items():
+                try:
+                    scores[name] = timed(name, task)
+                except Exception as e:
+                    MODEL_FAILURES.inc(model=name, reason='error')
+                    log.error("Prediction failed for '%s': %s", name, e)
+        else:
+            futures = {name: self._executor().submit(timed, name, task) for name, task in tasks.items()}
+            wait(futures.values(), timeout=self.timeout or None)
+            for name, future in futures.items():
+                if not future.done():
+                    future.cancel()
+                    timed_out.append(name)
+                    MODEL_FAILURES.inc(model=name, reason='timeout')
+                    continue
+                try:
+                    scores[name] = future.result()
+                except Exception as e:
+                    MODEL_FAILURES.inc(model=name, reason='error')
+                    log.error("Prediction failed for '%s': %s", name, e)
+            if timed_out:
+                log.warning('Models timed out after %ss: %s', self.timeout, ', '.join(timed_out))
+
+        # Discovery order, and only timings of models that finished
+        return {
+            'scores': {name: scores[name] for name in tasks if name in scores},
+            'timings': {name: timings[name] for name in tasks if name in timings and name not in timed_out},
+            'timedOut': timed_out
+        }
@@ -0,0 +1,406 @@
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Callable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .features import CAT_COLS, FEATURE_COLUMNS, NUM_COLS, TARGET_COL, build_preprocessor, clean, split_xy
+from .model_artifacts import dump_joblib
+from .training import MODEL_DIR, ESTIMATORS, _Progress, _record_models, algorithm_params, evaluate
+from .validation import DISPLAY_NAMES, _summary
+from ..utils.log import get_logger
+
+log = get_logger('training')
+
+# Training and validation on CSV files larger than memory: the file is read
+# `CHUNK_ROWS` rows at a time, never whole. One pass collects row and class
+# counts, every category and bounded uniform samples; logistic regression is
+# then trained chunk by chunk (SGD, partial_fit) over `EPOCHS` more passes
+# and the other algorithms are fitted on the sample. Peak memory depends on
+# these sizes, not on the number of rows in the file.
+CHUNK_ROWS = int(os.getenv('STREAM_CHUNK_ROWS', 100_000))
+SAMPLE_ROWS = int(os.getenv('STREAM_SAMPLE_ROWS', 100_000))
+TEST_ROWS = int(os.getenv('STREAM_TEST_ROWS', 50_000))
+EPOCHS = int(os.getenv('STREAM_EPOCHS', 1))
+SGD_ALPHA = float(os.getenv('STREAM_SGD_ALPHA', 1e-4))
+TEST_FRACTION = 0.25
+AUC_BINS = 4096
+SEED = 42
+STREAMED = ('logistic_regression',)
+
+
+def read_chunks(path, chunksize: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """The cleaned feature and target columns of a CSV, `chunksize` rows at a time.
+
+    The index of a row is its position in the file, the same on every pass.
+    """
+    wanted = set(FEATURE_COLUMNS + [TARGET_COL])
+    for chunk in pd.read_csv(path, chunksize=chunksize, usecols=lambda c: c in wanted):
+        yield clean(chunk)
+
+
+def uniform(rows: np.ndarray, seed: int) -> np.ndarray:
+    """A fixed pseudo-random number in [0, 1) per row position (splitmix64): splits without a shuffle."""
+    z = rows.astype(np.uint64) + np.uint64((seed * 0x9E3779B97F4A7C15) % (1 << 64))
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def is_test(rows: np.ndarray) -> np.ndarray:
+    return uniform(rows, SEED) < TEST_FRACTION
+
+
+def fold_of(rows: np.ndarray, k: int) -> np.ndarray:
+    return np.minimum((uniform(rows, SEED + 1) * k).astype(np.int64), k - 1)
+
+
+class Reservoir:
+    """A uniform sample of at most `size` rows of a stream (algorithm R, a chunk at a time)."""
+
+    def __init__(self, size: int, columns: List[str], seed: int = SEED):
+        self.size = size
+        self.seen = 0
+        self._columns = columns
+        self._filled = 0
+        self._rng = np.random.default_rng(seed)
+        # Categories stay Python objects, so the sample encodes like the CSV does
+        self._data = {c: np.empty(size, dtype=float if c in NUM_COLS else object if c in CAT_COLS else np.int64)
+                      for c in columns}
+
+    def add(self, chunk: pd.DataFrame):
+        n = len(chunk)
+        values = {c: chunk[c].to_numpy() for c in self._columns}
+        take = min(self.size - self._filled, n)
+        for c in self._columns:
+            self._data[c][self._filled:self._filled + take] = values[c][:take]
+        self._filled += take
+        self.seen += take
+        rest = n - take
+        if rest <= 0:
+            return
+        slots = np.floor(self._rng.random(rest) * (self.seen + np.arange(1, rest + 1))).astype(np.int64)
+        keep = np.flatnonzero(slots < self.size)[::-1]
+        # A later row drawn for the same slot replaces the earlier one, as one row at a time would
+        _, first = np.unique(slots[keep], return_index=True)
+        chosen = keep[first]
+        for c in self._columns:
+            self._data[c][slots[chosen]] = values[c][take:][chosen]
+        self.seen += rest
+
+    def frame(self) -> pd.DataFrame:
+        return pd.DataFrame({c: self._data[c][:self._filled] for c in self._columns})
+
+
+class Scan:
+    """What one pass over a CSV learns: counts, the categories of every column and the samples."""
+
+    def __init__(self, sample_rows: int, test_rows: int, folds: int = 0):
+        columns = FEATURE_COLUMNS + [TARGET_COL]
+        self.rows = 0
+        self.chunks = 0
+        self.classes = np.zeros(2, dtype=np.int64)
+        self.categories = {c: set() for c in CAT_COLS}
+        self.folds = folds
+        # With folds every row belongs to one of them; otherwise TEST_FRACTION of the rows are held out
+        self.train = Reservoir(sample_rows, columns + (['fold'] if folds else []), seed=SEED)
+        self.test = Reservoir(test_rows, columns, seed=SEED + 1) if not folds else None
+
+    def add(self, chunk: pd.DataFrame):
+        self.rows += len(chunk)
+        self.chunks += 1
+        self.classes += np.bincount(chunk[TARGET_COL].to_numpy(dtype=np.int64), minlength=2)[:2]
+        for c in CAT_COLS:
+            self.categories[c].update(chunk[c].dropna().unique().tolist())
+        if self.folds:
+            self.train.add(chunk.assign(fold=fold_of(chunk.index.to_numpy(), self.folds)))
+        else:
+            test = is_test(chunk.index.to_numpy())
+            self.train.add(chunk[~test])
+            self.test.add(chunk[test])
+
+    def preprocessor(self, X_sample, scale: bool = False):
+        """The feature pipeline fitted on the sample, with the one-hot columns of the whole file."""
+        categories = [sorted(self.categories[c]) for c in CAT_COLS]
+        return build_preprocessor(categories=categories, scale=scale).fit(X_sample)
+
+
+def scan(path, chunksize: int = CHUNK_ROWS, sample_rows: int = SAMPLE_ROWS, test_rows: int = TEST_ROWS,
+         folds: int = 0, check: Optional[Callable[[], None]] = None) -> Scan:
+    result = Scan(sample_rows, test_rows, folds)
+    for chunk in read_chunks(path, chunksize):
+        result.add(chunk)
+        if check is not None:
+            check()
+    if not result.rows:
+        raise ValueError(f'No usable rows in {path}')
+    return result
+
+
+# describe() results by (path, content hash)
+_descriptions: Dict[Any, Dict[str, Any]] = {}
+
+
+def describe(path, chunksize: int = CHUNK_ROWS) -> Dict[str, Any]:
+    """/validation/dataset/info of a CSV of any size: rows, columns, classes and missing values, a chunk at a time."""
+    from .dataset import get_dataset
+
+    key = (str(path), get_dataset(path).version())
+    if key not in _descriptions:
+        rows, classes, missing, columns = 0, np.zeros(2, dtype=np.int64), None, []
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            rows += len(chunk)
+            columns = list(chunk.columns)
+            classes += np.bincount(chunk[TARGET_COL].dropna().to_numpy(dtype=np.int64), minlength=2)[:2]
+            counts = chunk.isnull().sum()
+            missing = counts if missing is None else missing + counts
+        _descriptions.clear()
+        _descriptions[key] = {
+            'total_rows': rows,
+            'total_columns': len(columns),
+            'columns': columns,
+            'stroke_distribution': {'no_stroke': int(classes[0]), 'stroke': int(classes[1])},
+            'missing_values': {c: int(n) for c, n in (missing.items() if missing is not None else [])},
+        }
+    return _descriptions[key]
+
+
+def _sgd(params: Dict[str, Any], classes: np.ndarray):
+    """The streamed stand-in for logistic regression: log-loss SGD with the configured penalty and class weights."""
+    from sklearn.linear_model import SGDClassifier
+
+    class_weight = None
+    if params.get('class_weight') == 'balanced':
+        # 'balanced' needs every row at once; the class counts of the scan give the same weights
+        class_weight = {c: float(classes.sum() / (2 * max(classes[c], 1))) for c in (0, 1)}
+    # Averaged SGD: one pass is about as good as the batch solver, plain SGD needs several
+    return SGDClassifier(loss='log_loss', penalty=params.get('penalty', 'l2'), alpha=SGD_ALPHA, average=True,
+                         class_weight=class_weight, random_state=params.get('random_state', SEED))
+
+
+def _epochs(epochs: int, sample_rows: int, rows: int) -> int:
+    """At least `epochs` passes, and enough of them for SGD to see `sample_rows` rows on a small file."""
+    return max(epochs, -(-sample_rows // max(rows, 1)))
+
+
+def _stream_fit(path, chunksize: int, epochs: int, targets, tracker: _Progress):
+    """partial_fit every (rows -> models) target over `epochs` passes; rows(chunk) picks the chunk rows it learns."""
+    rng = np.random.default_rng(SEED)
+    for epoch in range(1, epochs + 1):
+        for chunk in read_chunks(path, chunksize):
+            for select, preprocessor, models in targets:
+                part = chunk[select(chunk.index.to_numpy())]
+                if part.empty:
+                    continue
+                X, y = split_xy(part)
+                # The file may be sorted (e.g. by region or label); SGD needs shuffled rows
+                order = rng.permutation(len(part))
+                Z, y = preprocessor.transform(X)[order], y.to_numpy()[order]
+                for model in models.values():
+                    model.partial_fit(Z, y, classes=np.array([0, 1]))
+            tracker.check()
+        tracker.step('epoch', f'Epoch {epoch}/{epochs} over {path}', epoch=epoch, epochs=epochs)
+
+
+def train(path, algorithms: Optional[List[str]] = None, model_dir=MODEL_DIR,
+          overrides: Optional[Dict[str, Dict[str, Any]]] = None, chunksize: int = CHUNK_ROWS,
+          sample_rows: int = SAMPLE_ROWS, test_rows: int = TEST_ROWS, epochs: int = EPOCHS,
+          progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+          should_stop: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
+    """Train on a CSV of any size and record the models like training.train does.
+
+    A fixed TEST_FRACTION of the rows (by position) is held out; metrics are
+    measured on a uniform sample of at most `test_rows` of them. Logistic
+    regression becomes an SGD model trained on every training row; random
+    forest, gradient boosting and KNN are fitted on a uniform sample of at
+    most `sample_rows` training rows.
+    """
+    started = time.perf_counter()
+    model_dir = Path(model_dir)
+    params = algorithm_params(overrides, algorithms)
+    if not params:
+        raise ValueError(f'No known algorithm in {algorithms}; expected some of {list(ESTIMATORS)}')
+    streamed = [n for n in params if n in STREAMED]
+    cancel = _Progress(1, None, should_stop).check
+    cancel()
+
+    stats = scan(path, chunksize, sample_rows, test_rows, check=cancel)
+    epochs = _epochs(epochs, sample_rows, stats.train.seen)
+    tracker = _Progress(1 + (epochs if streamed else 0) + 2 * len(params), progress, should_stop)
+    X_sample, y_sample = split_xy(stats.train.frame())
+    X_test, y_test = split_xy(stats.test.frame())
+    tracker.step('load', f'Scanned {stats.rows} rows in {stats.chunks} chunks; sample {len(X_sample)} rows, '
+                         f'test sample {len(X_test)} rows', rows=stats.rows, sampleRows=len(X_sample))
+    model_dir.mkdir(parents=True, exist_ok=True)
+
+    preprocessor = stats.preprocessor(X_sample)
+    pipelines, timings, methods = {}, {}, {}
+    if streamed:
+        scaled = stats.preprocessor(X_sample, scale=True)
+        models = {n: _sgd(params[n], stats.classes) for n in streamed}
+        t0 = time.perf_counter()
+        _stream_fit(path, chunksize, epochs, [(lambda rows: ~is_test(rows), scaled, models)], tracker)
+        for name, model in models.items():
+            pipelines[name] = _pipeline(scaled, model)
+            timings[name] = {'fit': time.perf_counter() - t0}
+            methods[name] = 'partial_fit'
+    Z_sample = preprocessor.transform(X_sample)
+    manifest, all_metrics = [], {}
+    for name in params:
+        if name not in streamed:
+            t0 = time.perf_counter()
+            model = ESTIMATORS[name](**params[name]).fit(Z_sample, y_sample)
+            pipelines[name] = _pipeline(preprocessor, model)
+            timings[name] = {'fit': time.perf_counter() - t0}
+            methods[name] = 'sample'
+        metrics = evaluate(pipelines[name], X_test, y_test)
+        all_metrics[name] = metrics
+        tracker.step('fit', f"{name}: {methods[name]} in {timings[name]['fit']:.1f}s, "
+                            f"ROC AUC {metrics['roc_auc'] or 0:.4f}", algorithm=name, metrics=metrics)
+        model_path = model_dir / f'{name}.joblib'
+        dump_joblib(pipelines[name], model_path)
+        trained_at = datetime.utcnow().isoformat() + 'Z'
+        entry = {'name': name, 'file': str(model_path), 'trained_at': trained_at,
+                 'training': {'mode': 'streaming', 'method': methods[name], 'source': str(path), 'rows': stats.rows,
+                              'sampleRows': len(X_sample), 'testRows': len(X_test), 'fullAt': trained_at}}
+        _record_models(model_dir, [entry], {name: metrics})
+        manifest.append(entry)
+        tracker.step('save', f'{name}: saved to {model_path}', algorithm=name, file=str(model_path))
+
+    wall = time.perf_counter() - started
+    log.info('Trained %d models on %d streamed rows into %s in %.1fs', len(manifest), stats.rows, model_dir, wall)
+    return {'mode': 'streaming', 'modelDir': str(model_dir), 'models': all_metrics, 'manifest': manifest,
+            'seconds': wall, 'rows': stats.rows, 'chunks': stats.chunks, 'timings': timings}
+
+
+def _pipeline(preprocessor, model):
+    from sklearn.pipeline import Pipeline
+    return Pipeline(steps=[('preprocessor', preprocessor), ('model', model)])
+
+
+class StreamingScores:
+    """Accuracy, macro precision/recall/F1 and ROC AUC of predictions that arrive in chunks.
+
+    Only a confusion matrix and a histogram of scores per class are kept;
+    ROC AUC is computed from the histograms (ties within a bin count half),
+    which is within about 1/AUC_BINS of the exact value.
+    """
+
+    def __init__(self, bins: int = AUC_BINS):
+        self.bins = bins
+        self.confusion = np.zeros((2, 2), dtype=np.int64)
+        self.histogram = np.zeros((2, bins), dtype=np.int64)
+
+    def add(self, y, proba):
+        y = np.asarray(y, dtype=np.int64)
+        np.add.at(self.confusion, (y, (proba > 0.5).astype(np.int64)), 1)
+        np.add.at(self.histogram, (y, np.minimum((proba * self.bins).astype(np.int64), self.bins - 1)), 1)
+
+    def scores(self) -> Dict[str, float]:
+        (tn, fp), (fn, tp) = self.confusion
+
+        def ratio(a, b):
+            return float(a / b) if b else 0.0
+
+        precision = [ratio(tn, tn + fn), ratio(tp, tp + fp)]
+        recall = [ratio(tn, tn + fp), ratio(tp, tp + fn)]
+        f1 = [ratio(2 * p * r, p + r) for p, r in zip(precision, recall)]
+        negative, positive = self.histogram
+        below = np.cumsum(negative) - negative
+        pairs = negative.sum() * positive.sum()
+        return {
+            'accuracy': ratio(tn + tp, self.confusion.sum()),
+            'precision': float(np.mean(precision)),
+            'recall': float(np.mean(recall)),
+            'f1': float(np.mean(f1)),
+            'roc_auc': float((positive * (below + 0.5 * negative)).sum() / pairs) if pairs else 0.0,
+        }
+
+
+def kfold(path, k: int, config=None, algorithms: Optional[List[str]] = None, chunksize: int = CHUNK_ROWS,
+          sample_rows: int = SAMPLE_ROWS, epochs: int = EPOCHS,
+          progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+          should_stop: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
+    """K-Fold validation of a CSV of any size, in the response shape of ValidationEngine.kfold.
+
+    Rows go to folds by position (see fold_of). Every fold's models are
+    trained the way `train` trains them, on the rows (or sampled rows) of
+    the other folds, and all folds are scored in one more pass over the
+    file with StreamingScores; train_accuracy is measured on the sample.
+    """
+    started = time.perf_counter()
+    params = algorithm_params(config=config or {}, names=algorithms)
+    streamed = [n for n in params if n in STREAMED]
+    sampled = [n for n in params if n not in STREAMED]
+    cancel = _Progress(1, None, should_stop).check
+    cancel()
+
+    stats = scan(path, chunksize, sample_rows, folds=k, check=cancel)
+    epochs = _epochs(epochs, sample_rows, stats.rows * (k - 1) // k)
+    tracker = _Progress(2 + (epochs if streamed else 0) + k * len(sampled), progress, should_stop)
+    sample = stats.train.frame()
+    tracker.step('load', f'Scanned {stats.rows} rows in {stats.chunks} chunks; sample {len(sample)} rows',
+                 rows=stats.rows, sampleRows=len(sample))
+
+    folds = []
+    for fold in range(k):
+        X_fit, y_fit = split_xy(sample[sample['fold'] != fold])
+        preprocessor = stats.preprocessor(X_fit)
+        models, fit_seconds = {}, {}
+        Z_fit = preprocessor.transform(X_fit)
+        for name in sampled:
+            t0 = time.perf_counter()
+            models[name] = ESTIMATORS[name](**params[name]).fit(Z_fit, y_fit)
+            fit_seconds[name] = time.perf_counter() - t0
+            tracker.step('fold', f'{name}: fold {fold + 1}/{k} fitted on {len(X_fit)} sampled rows',
+                         algorithm=DISPLAY_NAMES[name], fold=fold + 1, folds=k)
+        folds.append({'preprocessor': preprocessor, 'models': models, 'seconds': fit_seconds,
+                      'scaled': stats.preprocessor(X_fit, scale=True) if streamed else None})
+    if streamed:
+        t0 = time.perf_counter()
+        targets = []
+        for fold, state in enumerate(folds):
+            state['streamed'] = {n: _sgd(params[n], stats.classes) for n in streamed}
+            targets.append((lambda rows, f=fold: fold_of(rows, k) != f, state['scaled'], state['streamed']))
+        _stream_fit(path, chunksize, epochs, targets, tracker)
+        for state in folds:
+            state['seconds'].update({n: (time.perf_counter() - t0) / k for n in streamed})
+
+    scores = [{n: StreamingScores() for n in params} for _ in range(k)]
+    for chunk in read_chunks(path, chunksize):
+        assigned = fold_of(chunk.index.to_numpy(), k)
+        for fold, state in enumerate(folds):
+            X, y = split_xy(chunk[assigned == fold])
+            if X.empty:
+                continue
+            Z = state['preprocessor'].transform(X)
+            for name, model in state['models'].items():
+                scores[fold][name].add(y, model.predict_proba(Z)[:, 1])
+            if streamed:
+                Z = state['scaled'].transform(X)
+                for name, model in state['streamed'].items():
+                    scores[fold][name].add(y, model.predict_proba(Z)[:, 1])
+        tracker.check()
+    tracker.step('score', f'Scored {stats.rows} rows', rows=stats.rows)
+
+    results = {}
+    for name in params:
+        runs = []
+        for fold, state in enumerate(folds):
+            X_fit, y_fit = split_xy(sample[sample['fold'] != fold])
+            model = state['streamed'][name] if name in streamed else state['models'][name]
+            Z_fit = (state['scaled'] if name in streamed else state['preprocessor']).transform(X_fit)
+            runs.append({'name': DISPLAY_NAMES[name], 'fold': fold, 'scores': scores[fold][name].scores(),
+                         'train_accuracy': float(np.mean(model.predict(Z_fit) == y_fit.to_numpy())),
+                         'seconds': state['seconds'][name]})
+        results[DISPLAY_NAMES[name]] = _summary(runs)
+        tracker.step('algorithm', f'{DISPLAY_NAMES[name]}: done', advance=0, algorithm=DISPLAY_NAMES[name],
+                     result=results[DISPLAY_NAMES[name]])
+    wall = time.perf_counter() - started
+    log.info('Streamed %d-fold validation of %d rows in %.1fs', k, stats.rows, wall)
+    return {'results': results, 'rows': stats.rows, 'chunks': stats.chunks, 'sampleRows': len(sample),
+            'folds': k, 'seconds': wall}
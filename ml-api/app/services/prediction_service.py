@@ -1,11 +1,24 @@
 import os
 import json
-import glob
-import joblib
+import uuid
+import atexit
+import threading
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from pathlib import Path
 from ..utils.helpers import validate_input
+from ..utils.rwlock import ReadWriteLock
+from ..utils.cache import LRUCache
+from ..utils.log import get_logger
+from ..utils.metrics import REGISTRY
+from .history_store import RetentionPolicy, create_history_store
+from .history_index import HistoryIndex
+from .history_writer import HistoryWriter
+from .model_registry import ModelRegistry, ModelWatcher, manifest_version
+from .model_scorer import ModelScorer
+from .knn_engine import engine_options_from_env
+# The columns the models are trained on, shared with training and validation
+from .features import CAT_COLS, FEATURE_COLUMNS, NUM_COLS, to_frame
 
 
 FEATURE_MAPPING = {
@@ -15,125 +28,355 @@ FEATURE_MAPPING = {
     'residenceType': 'Residence_type',
 }
 
+# Dataset → Frontend names, so batch rows (e.g. CSV exports of the dataset) validate too
+REVERSE_FEATURE_MAPPING = {v: k for k, v in FEATURE_MAPPING.items()}
+
+log = get_logger('ml')
+history_log = get_logger('history')
+
+PREDICTIONS = REGISTRY.counter('ml_predictions_total', 'Patients scored', ('kind',))
+STAGE_SECONDS = REGISTRY.histogram('ml_predict_stage_seconds',
+                                   'Time spent per stage of a single prediction', ('stage',))
+BATCH_ROWS = REGISTRY.histogram('ml_batch_rows', 'Rows per batch prediction request',
+                                buckets=(1, 10, 100, 1000, 10000, 100000))
+
+# 0/1 feature columns, accepted as 1/0, "1"/"0", true/false or "yes"/"no"
+FLAG_COLS = ('hypertension', 'heart_disease')
+TRUE_VALUES = ('true', '1', '1.0', 'yes')
+FALSE_VALUES = ('false', '0', '0.0', 'no')
+
+# Criteria of a bulk history delete (the filters of GET /history)
+DELETE_FILTERS = ('citizenId', 'dateFrom', 'dateTo', 'riskLevel')
+
 
 class PredictionService:
+    """Scores patients and keeps the prediction history.
+
+    Safe to share between request threads: history and model/metrics state
+    each sit behind a reader/writer lock held only for in-memory work, while
+    disk writes go through one background HistoryWriter thread.
+    """
+
     def __init__(self):
-        self._models: Dict[str, Any] = {}
+        self._state_lock = ReadWriteLock()  # models and metrics
+        self._history_lock = ReadWriteLock()
         self._model_path = os.getenv('MODEL_PATH', '')  # optional single model path
         self._models_dir = os.getenv('MODELS_DIR', 'app/models')
-        self._history_file = os.getenv('HISTORY_FILE', 'app/data/history.json')
+        # lazy: load on first prediction, background: warm up in a thread, eager: load now
+        self._model_loading = os.getenv('MODEL_LOADING', 'background').lower()
+        # auto: serve <name>.compact artifacts when fresh, joblib: always the .joblib files
+        self._model_format = os.getenv('MODEL_FORMAT', 'auto').lower()
+        self._model_mmap = os.getenv('MODEL_MMAP', '0').lower() in ('1', 'true', 'yes')
+        self._model_allowlist = [n.strip() for n in os.getenv('MODELS_ALLOWLIST', '').split(',') if n.strip()]
+        self._history_store = create_history_store(os.getenv('HISTORY_BACKEND', 'jsonl'),
+                                                   os.getenv('HISTORY_FILE') or None)
+        self._legacy_history_file = os.getenv('LEGACY_HISTORY_FILE', 'app/data/history.json')
+        self._retention = RetentionPolicy.from_env()
+        self._page_size = int(os.getenv('HISTORY_PAGE_SIZE', 100))
+        self._max_page_size = int(os.getenv('HISTORY_MAX_PAGE_SIZE', 1000))
+        # How long a history read waits to pick up other workers' writes (shared stores only)
+        self._sync_timeout = float(os.getenv('HISTORY_SYNC_TIMEOUT', 2.0))
         self._metrics_file = 'app/models/metrics.json'
+        self._manifest_file = os.path.join(self._models_dir, 'models.json')
+        self._reload_lock = threading.Lock()
+        # Per-model scores keyed on (model version, adapted feature tuple)
+        self._score_cache = LRUCache(maxsize=int(os.getenv('PREDICTION_CACHE_SIZE', 1024)),
+                                     ttl=float(os.getenv('PREDICTION_CACHE_TTL', 300)))
+        self._max_batch_size = int(os.getenv('MAX_BATCH_SIZE', 10000))
+        # serial or parallel per-model scoring, with an optional per-request deadline
+        self._scorer = ModelScorer.from_env()
+        # Score single requests with compiled pipelines instead of building a DataFrame
+        self._fast_inference = os.getenv('FAST_INFERENCE', '1').lower() not in ('0', 'false', 'no')
         self._load_models()
         self._load_history()
         self._load_metrics()
+        self._history_writer = HistoryWriter(
+            self._history_store, self._history_lock,
+            live_count_fn=lambda: len(self._history),
+            records_fn=lambda: list(reversed(self._history.records())),
+            reload_fn=self._reload_history
+        )
+        atexit.register(self._history_writer.flush, 5.0)
+        self._register_metrics()
+        # Pick up new models written by train_model.py (MODEL_RELOAD_INTERVAL=0 disables polling)
+        self._model_watcher = ModelWatcher([self._manifest_file, self._metrics_file],
+                                           on_change=self.reload_models,
+                                           interval=float(os.getenv('MODEL_RELOAD_INTERVAL', 5)))
+
+    def _register_metrics(self):
+        cache = self._score_cache
+        REGISTRY.callback('ml_prediction_cache_hits_total', 'Score cache hits', lambda: cache.hits, 'counter')
+        REGISTRY.callback('ml_prediction_cache_misses_total', 'Score cache misses', lambda: cache.misses, 'counter')
+        REGISTRY.callback('ml_prediction_cache_evictions_total', 'Score cache evictions',
+                          lambda: cache.evictions, 'counter')
+        REGISTRY.callback('ml_history_records', 'Records in the in-memory history', lambda: len(self._history))
+        REGISTRY.callback('ml_history_queue_depth', 'History operations waiting for the writer',
+                          self._history_writer.pending)
+        REGISTRY.callback('ml_models_loaded', 'Loaded models of the served version',
+                          lambda: {(self._registry.version,): list(self._registry.status()['models'].values())
+                                   .count('loaded')},
+                          labelnames=('version',))
 
     def _load_models(self):
-        # Try explicit single model path
-        if self._model_path and os.path.exists(self._model_path):
-            try:
-                self._models['default'] = joblib.load(self._model_path)
-                print(f"[ML] Loaded model (default) from {self._model_path}")
-            except Exception as e:
-                print(f"[ML] Failed to load default model: {e}")
+        self._registry = self._new_registry()
+        if self._model_loading == 'eager':
+            self._registry.warm_up(background=False)
+        elif self._model_loading == 'background':
+            self._registry.warm_up(background=True)
 
-        # Load all .joblib models under models dir
-        try:
-            pattern = os.path.join(self._models_dir, '*.joblib')
-            for file in glob.glob(pattern):
-                name = os.path.splitext(os.path.basename(file))[0]
-                if name in self._models:
-                    continue
-                try:
-                    self._models[name] = joblib.load(file)
-                    print(f"[ML] Loaded model '{name}' from {file}")
-                except Exception as e:
-                    print(f"[ML] Failed to load model '{name}': {e}")
-        except Exception as e:
-            print(f"[ML] Model directory scan failed: {e}")
+    def _new_registry(self) -> ModelRegistry:
+        return ModelRegistry(self._models_dir, self._model_path,
+                             allow=self._model_allowlist or None,
+                             version=manifest_version(self._manifest_file),
+                             fast=self._fast_inference,
+                             knn_engine=engine_options_from_env(),
+                             prefer_compact=self._model_format != 'joblib',
+                             mmap=self._model_mmap)
+
+    def _model_state(self):
+        """The (registry, metrics) pair of one model version, taken together."""
+        self._model_watcher.ensure_started()
+        with self._state_lock.read():
+            return self._registry, self._metrics
+
+    def reload_models(self, background: bool = False) -> Dict[str, Any]:
+        """Load the current model files as a new version and swap it in atomically.
+
+        The new models are fully loaded before the swap, so requests keep being
+        served by the previous version meanwhile and always see a consistent set.
+        """
+        if background:
+            threading.Thread(target=self.reload_models, name='model-reload', daemon=True).start()
+            return {'status': 'reloading'}
+        with self._reload_lock:
+            registry = self._new_registry()
+            registry.warm_up(background=False)
+            metrics = self._read_metrics()
+            with self._state_lock.write():
+                previous = self._registry.version
+                self._registry = registry
+                self._metrics = metrics
+                self._score_cache.clear()
+            log.info('Swapped models %s -> %s', previous, registry.version)
+            return registry.status()
+
+    def is_ready(self) -> bool:
+        """True once every served model is loaded."""
+        return self._model_state()[0].is_ready()
+
+    def readiness(self) -> Dict[str, Any]:
+        return self._model_state()[0].status()
 
     def _load_history(self):
-        """Load history from JSON file."""
-        self._history: List[Dict[str, Any]] = []
+        """Load history from the history store into the in-memory index."""
+        self._history = HistoryIndex()
         try:
-            if os.path.exists(self._history_file):
-                with open(self._history_file, 'r', encoding='utf-8') as f:
-                    self._history = json.load(f)
-                print(f"[History] Loaded {len(self._history)} records from {self._history_file}")
-            else:
-                print(f"[History] No history file found at {self._history_file}")
+            records = self._history_store.load()
+            migrated = False
+            if not records and os.path.exists(self._legacy_history_file):
+                # One-off migration from the old full-file history.json (newest first)
+                with open(self._legacy_history_file, 'r', encoding='utf-8') as f:
+                    records = list(reversed(json.load(f)))
+                migrated = True
+                history_log.info('Migrating %d records from %s', len(records), self._legacy_history_file)
+            missing_ids = [r for r in records if not r.get('id')]
+            for record in missing_ids:
+                record['id'] = self._new_id()
+            if missing_ids or migrated:
+                # Persist the migrated records and the ids given to older ones so they stay stable
+                self._history_store.rewrite(records)
+            if migrated:
+                # Renamed once persisted, so a history emptied later (DELETE /history) is not imported again
+                os.replace(self._legacy_history_file, self._legacy_history_file + '.migrated')
+            for record in records:
+                self._history.add(record)
+            self._apply_retention()
+            history_log.info('Loaded %d records from %s', len(self._history), self._history_store.describe())
         except Exception as e:
-            print(f"[History] Failed to load history: {e}")
-            self._history = []
+            history_log.error('Failed to load history: %s', e)
+            self._history = HistoryIndex()
+
+    def _reload_history(self, records: List[Dict[str, Any]]):
+        """Replace the in-memory history with records read back from a shared store.
+        Called by the history writer with the history write lock held."""
+        history = HistoryIndex()
+        for record in records:
+            history.add(record)
+        self._history = history
+        self._apply_retention()
+
+    @staticmethod
+    def _new_id() -> str:
+        return uuid.uuid4().hex
 
     def _load_metrics(self):
+        metrics = self._read_metrics()
+        with self._state_lock.write():
+            self._metrics = metrics
+
+    def _read_metrics(self) -> Dict[str, Dict[str, Any]]:
         """Load training metrics from JSON file."""
-        self._metrics: Dict[str, Dict[str, Any]] = {}
+        metrics: Dict[str, Dict[str, Any]] = {}
         try:
             if os.path.exists(self._metrics_file):
                 with open(self._metrics_file, 'r', encoding='utf-8') as f:
-                    self._metrics = json.load(f)
-                print(f"[Metrics] Loaded metrics for {len(self._metrics)} models from {self._metrics_file}")
+                    metrics = json.load(f)
+                log.info('Loaded metrics for %d models from %s', len(metrics), self._metrics_file)
             else:
-                print(f"[Metrics] No metrics file found at {self._metrics_file}")
+                log.warning('No metrics file found at %s', self._metrics_file)
         except Exception as e:
-            print(f"[Metrics] Failed to load metrics: {e}")
-            self._metrics = {}
+            log.error('Failed to load metrics: %s', e)
+            metrics = {}
+        return metrics
+
+    def _apply_retention(self):
+        """Evict records outside the retention policy from the old end of the history."""
+        while self._retention.max_records and len(self._history) > self._retention.max_records:
+            self._history.remove(self._history.oldest())
+        cutoff = self._retention.cutoff()
+        if cutoff:
+            while len(self._history) and self._history.oldest().get('createdAt', '') < cutoff:
+                self._history.remove(self._history.oldest())
 
     def _save_history(self):
-        """Save history to JSON file."""
-        try:
-            Path(self._history_file).parent.mkdir(parents=True, exist_ok=True)
-            with open(self._history_file, 'w', encoding='utf-8') as f:
-                json.dump(self._history, f, indent=2, ensure_ascii=False)
-            print(f"[History] Saved {len(self._history)} records to {self._history_file}")
-        except Exception as e:
-            print(f"[History] Failed to save history: {e}")
+        """Queue a rewrite of the whole history (used by clear). Call with the history write lock held."""
+        self._history_writer.rewrite(list(reversed(self._history.records())))
+
+    def flush_history(self, timeout: float = None):
+        """Wait until queued history writes reach the store."""
+        self._history_writer.flush(timeout)
 
     def _adapt_payload(self, data: Dict[str, Any]) -> Dict[str, Any]:
         adapted = {}
         for k, v in data.items():
             k2 = FEATURE_MAPPING.get(k, k)
             adapted[k2] = v
+        for column in FEATURE_COLUMNS:
+            if column in adapted:
+                adapted[column] = self._normalize(column, adapted[column])
         return adapted
 
-    def _predict_with_models(self, data: Dict[str, Any]) -> Dict[str, float]:
-        results: Dict[str, float] = {}
-        if not self._models:
-            return results
-        input_df = self._to_dataframe(data)
-        for name, model in self._models.items():
+    @staticmethod
+    def _normalize(column: str, value):
+        """One canonical value per feature, so equal patients score (and cache) the same.
+
+        Numbers become floats, flags 1/0 (as in the dataset, whatever
+        validation accepts as true/false) and strings are stripped; values
+        that do not parse are left for the encoder to treat as unknown.
+        """
+        if value is None or (isinstance(value, str) and not value.strip()):
+            return None
+        if column in NUM_COLS:
             try:
-                if hasattr(model, 'predict_proba'):
-                    proba = model.predict_proba(input_df)[0, 1]
-                    results[name] = float(proba)
-                else:
-                    # fall back: decision_function or predicted class
-                    pred = model.predict(input_df)[0]
-                    results[name] = float(pred)
-            except Exception as e:
-                print(f"[ML] Prediction failed for '{name}': {e}")
-        return results
+                return float(value)
+            except (TypeError, ValueError):
+                return value
+        if column in FLAG_COLS:
+            text = str(value).strip().lower()
+            if text in TRUE_VALUES:
+                return 1
+            if text in FALSE_VALUES:
+                return 0
+            return value
+        if column in CAT_COLS and isinstance(value, str):
+            return value.strip()
+        return value
+
+    def _predict_with_models(self, data: Dict[str, Any], registry: ModelRegistry) -> Dict[str, Any]:
+        """Per-model scores for one request plus how they were computed (see ModelScorer.run)."""
+        key = self._cache_key(data, registry)
+        cached = self._score_cache.get(key) if key is not None else None
+        if cached is not None:
+            return {'scores': dict(cached), 'timings': {}, 'timedOut': [], 'cached': True}
+        run = self._score_single(data, registry)
+        # Partial results (a model timed out) are not worth remembering
+        if key is not None and run['scores'] and not run['timedOut']:
+            self._score_cache.put(key, run['scores'])
+        return {**run, 'cached': False}
+
+    @staticmethod
+    def _cache_key(data: Dict[str, Any], registry: ModelRegistry):
+        """Model version plus the normalized features (see _adapt_payload) the models see (None if unhashable)."""
+        key = (registry.version,) + tuple(data.get(c) for c in FEATURE_COLUMNS)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self._score_cache.stats()
+
+    def _score_single(self, data: Dict[str, Any], registry: ModelRegistry) -> Dict[str, Any]:
+        """Score one request, through the compiled fast path where a model has one."""
+        def score(name, model):
+            compiled = registry.compiled(name)
+            if compiled is not None:
+                try:
+                    return compiled.predict_proba(data)
+                except Exception as e:
+                    log.warning("Fast path failed for '%s', using the full pipeline: %s", name, e)
+            return float(self._predict_proba(model, self._to_dataframe(data))[0])
+
+        return self._scorer.run({name: (lambda n=name, m=model: score(n, m))
+                                 for name, model in registry.models().items()})
+
+    def _score_frame(self, input_df, registry: ModelRegistry) -> Dict[str, Any]:
+        """Score every row of input_df with each model of one version, one call per model."""
+        return self._scorer.run({name: (lambda m=model: self._predict_proba(m, input_df))
+                                 for name, model in registry.models().items()})
+
+    @staticmethod
+    def _predict_proba(model, input_df):
+        if hasattr(model, 'predict_proba'):
+            return model.predict_proba(input_df)[:, 1].astype(float)
+        # fall back: decision_function or predicted class
+        return model.predict(input_df).astype(float)
 
     @staticmethod
     def _to_dataframe(data: Dict[str, Any]):
-        import pandas as pd
-        # The training uses these columns
-        cols = ['age', 'avg_glucose_level', 'bmi', 'gender', 'hypertension',
-                'heart_disease', 'ever_married', 'work_type', 'Residence_type', 'smoking_status']
-        # Ensure presence of keys
-        row = {c: data.get(c) for c in cols}
-        return pd.DataFrame([row])
+        return PredictionService._to_frame([data])
+
+    @staticmethod
+    def _to_frame(rows: List[Dict[str, Any]]):
+        # The columns of the shared feature pipeline; missing keys become None
+        return to_frame(rows)
+
+    @staticmethod
+    def _heuristic_score(data: Dict[str, Any]) -> float:
+        """Fallback score used when no model is available."""
+        age = float(data.get('age', 0))
+        glucose = float(data.get('avgGlucoseLevel', 0))
+        bmi = float(data.get('bmi', 0))
+
+        score = 0.0
+        score += min(age / 120.0, 1.0) * 0.35
+        score += min(glucose / 300.0, 1.0) * 0.35
+        score += min(bmi / 50.0, 1.0) * 0.20
+        if str(data.get('hypertension')).lower() in ['true', '1', 'yes']:
+            score += 0.07
+        if str(data.get('heartDisease')).lower() in ['true', '1', 'yes']:
+            score += 0.08
+        return max(0.0, min(score, 1.0))
 
     def predict(self, data: Dict[str, Any]) -> Dict[str, Any]:
         # Validate
-        errors = validate_input(data)
+        with STAGE_SECONDS.time(stage='validate'):
+            errors = validate_input(data)
         if errors:
             raise ValueError('; '.join(errors))
 
-        adapted = self._adapt_payload(data)
+        with STAGE_SECONDS.time(stage='preprocess'):
+            adapted = self._adapt_payload(data)
+
+        # One consistent model version for the whole request
+        registry, metrics = self._model_state()
 
         # Try models first
-        model_scores = self._predict_with_models(adapted)
+        with STAGE_SECONDS.time(stage='score'):
+            run = self._predict_with_models(adapted, registry)
+        model_scores = run['scores']
+        PREDICTIONS.inc(kind='single')
 
         # Aggregate average probability when available
         score = None
@@ -142,19 +385,7 @@ class PredictionService:
 
         # Fallback heuristic if no model available
         if score is None:
-            age = float(data.get('age', 0))
-            glucose = float(data.get('avgGlucoseLevel', 0))
-            bmi = float(data.get('bmi', 0))
-
-            score = 0.0
-            score += min(age / 120.0, 1.0) * 0.35
-            score += min(glucose / 300.0, 1.0) * 0.35
-            score += min(bmi / 50.0, 1.0) * 0.20
-            if str(data.get('hypertension')).lower() in ['true', '1', 'yes']:
-                score += 0.07
-            if str(data.get('heartDisease')).lower() in ['true', '1', 'yes']:
-                score += 0.08
-            score = max(0.0, min(score, 1.0))
+            score = self._heuristic_score(data)
 
         risk_level = self._risk_level(score)
         recommendations = self._recommendations(data, score)
@@ -165,7 +396,7 @@ class PredictionService:
                 'name': name,
                 'riskScore': s,
                 'riskLevel': self._risk_level(s),
-                'metrics': self._metrics.get(name, {})
+                'metrics': metrics.get(name, {})
             }
             for name, s in model_scores.items()
         ] if model_scores else []
@@ -176,54 +407,215 @@ class PredictionService:
             'prediction': risk_level,
             'models': models_arr,  # Save detailed algorithm comparison
             'recommendations': recommendations,  # Save health recommendations
-            'createdAt': datetime.utcnow().isoformat() + 'Z'
+            'createdAt': datetime.utcnow().isoformat() + 'Z',
+            'id': self._new_id()
         }
-        
-        # Always add new record (keep history of all diagnoses)
-        self._history.insert(0, record)
-        citizen_id = data.get('citizenId')
-        if citizen_id:
-            print(f"[History] Added new record for citizenId: {citizen_id}")
-        else:
-            print(f"[History] Added new record without citizenId")
-        
-        self._history = self._history[:100]  # keep last 100
-        self._save_history()
+
+        # Always add new record (keep history of all diagnoses); the disk write is queued
+        with STAGE_SECONDS.time(stage='history'), self._history_lock.write():
+            self._history.add(record)
+            self._apply_retention()
+            self._history_writer.append(record)
+        history_log.debug('Added record %s for citizenId %s', record['id'], data.get('citizenId'))
 
         return {
+            'id': record['id'],
             'riskScore': score,
             'riskLevel': risk_level,
             'models': models_arr,
-            'recommendations': recommendations
+            'recommendations': recommendations,
+            'scoring': self._scoring_info(run)
+        }
+
+    def predict_batch(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Score many patients at once.
+
+        Rows are validated individually; invalid rows are reported in `errors`
+        and the valid ones are scored as a single DataFrame per model.
+        Batch results are not added to the history.
+        """
+        if not isinstance(rows, list) or not rows:
+            raise ValueError('Batch must be a non-empty list of patients')
+        if len(rows) > self._max_batch_size:
+            raise ValueError(f'Batch too large ({len(rows)} > {self._max_batch_size} rows)')
+
+        valid: List[Dict[str, Any]] = []
+        positions: List[int] = []
+        errors: List[Dict[str, Any]] = []
+        for i, row in enumerate(rows):
+            if not isinstance(row, dict):
+                errors.append({'index': i, 'errors': ['Row must be an object']})
+                continue
+            row = {REVERSE_FEATURE_MAPPING.get(k, k): v for k, v in row.items()}
+            try:
+                row_errors = validate_input(row)
+            except (TypeError, ValueError) as e:
+                row_errors = [str(e)]
+            if row_errors:
+                errors.append({'index': i, 'errors': row_errors})
+                continue
+            valid.append(row)
+            positions.append(i)
+
+        results: List[Dict[str, Any]] = []
+        run = {'timings': {}, 'timedOut': []}
+        BATCH_ROWS.observe(len(rows))
+        PREDICTIONS.inc(len(valid), kind='batch')
+        if valid:
+            registry, _ = self._model_state()
+            run = self._score_frame(self._to_frame([self._adapt_payload(r) for r in valid]), registry)
+            model_scores = run['scores']
+            if model_scores:
+                names = list(model_scores)
+                ensemble = sum(model_scores[n] for n in names) / len(names)
+            else:
+                names = []
+                ensemble = [self._heuristic_score(r) for r in valid]
+
+            for j, i in enumerate(positions):
+                score = float(ensemble[j])
+                results.append({
+                    'index': i,
+                    'citizenId': valid[j].get('citizenId'),
+                    'riskScore': score,
+                    'riskLevel': self._risk_level(score),
+                    'models': {n: float(model_scores[n][j]) for n in names}
+                })
+
+        return {
+            'total': len(rows),
+            'scored': len(results),
+            'failed': len(errors),
+            'results': results,
+            'errors': errors,
+            'scoring': self._scoring_info(run)
+        }
+
+    def _scoring_info(self, run: Dict[str, Any]) -> Dict[str, Any]:
+        """How a request was scored: mode, per-model time in ms and models that timed out."""
+        return {
+            'mode': self._scorer.mode,
+            'cached': run.get('cached', False),
+            'timings': run['timings'],
+            'timedOut': run['timedOut']
         }
 
     def get_history(self) -> List[Dict[str, Any]]:
-        return self._history
+        self._history_writer.sync(self._sync_timeout)
+        with self._history_lock.read():
+            return self._history.records()
 
-    def delete_record(self, index: int) -> bool:
-        """Delete a history record by index."""
+    def query_history(self, citizen_id: Optional[str] = None, date_from: Optional[str] = None,
+                      date_to: Optional[str] = None, risk_level: Optional[str] = None,
+                      limit: Optional[int] = None, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """One page of history filtered server-side through the secondary indexes."""
+        limit = min(limit or self._page_size, self._max_page_size)
+        if limit < 1:
+            raise ValueError('limit must be positive')
+        self._history_writer.sync(self._sync_timeout)
+        with self._history_lock.read():
+            filters = {'citizen_id': citizen_id, 'date_from': date_from,
+                       'date_to': self._inclusive_date_to(date_to), 'risk_level': risk_level}
+            items, next_cursor = self._history.query(limit=limit, cursor=cursor, **filters)
+            # Records matching the filters over all pages, not the size of the history
+            total = self._history.count(**filters)
+        return {'items': items, 'nextCursor': next_cursor, 'total': total}
+
+    @staticmethod
+    def _inclusive_date_to(date_to: Optional[str]) -> Optional[str]:
+        """A bare date upper bound covers the whole day."""
+        if date_to and 'T' not in date_to:
+            return date_to + 'T23:59:59.999999Z'
+        return date_to
+
+    def delete_record(self, record_id: str) -> bool:
+        """Delete a history record by its id."""
         try:
-            if 0 <= index < len(self._history):
-                del self._history[index]
-                self._save_history()
-                print(f"[History] Deleted record at index {index}")
+            self._history_writer.sync(self._sync_timeout)
+            with self._history_lock.write():
+                record = self._history.get(record_id)
+                if record is not None:
+                    self._history.remove(record)
+                    self._history_writer.delete([record_id])
+            if record is not None:
+                history_log.info('Deleted record %s', record_id)
                 return True
             else:
-                print(f"[History] Invalid index {index}, history length: {len(self._history)}")
+                history_log.info('Record %s not found', record_id)
                 return False
         except Exception as e:
-            print(f"[History] Failed to delete record: {e}")
+            history_log.error('Failed to delete record: %s', e)
             return False
 
+    def delete_records(self, record_ids: Optional[List[str]] = None,
+                       filters: Optional[Dict[str, Any]] = None) -> int:
+        """Delete records by a list of ids or by a history filter, with one persisted write."""
+        if record_ids is None and filters is None:
+            raise ValueError('Provide a list of ids or a non-empty filter')
+        if record_ids is not None and (not isinstance(record_ids, list)
+                                       or not all(isinstance(i, str) for i in record_ids)):
+            raise ValueError('ids must be a list of strings')
+        if record_ids is None:
+            if not isinstance(filters, dict):
+                raise ValueError('filter must be an object')
+            unknown = sorted(set(filters) - set(DELETE_FILTERS))
+            if unknown:
+                raise ValueError(f'Unknown filter keys: {", ".join(unknown)}; expected {", ".join(DELETE_FILTERS)}')
+            # A filter without any criterion would match (and delete) the whole history
+            if not any(filters.get(k) for k in DELETE_FILTERS):
+                raise ValueError(f'filter needs at least one of {", ".join(DELETE_FILTERS)}')
+        self._history_writer.sync(self._sync_timeout)
+        with self._history_lock.write():
+            if record_ids is not None:
+                records = [r for r in (self._history.get(i) for i in record_ids) if r is not None]
+            else:
+                records, _ = self._history.query(citizen_id=filters.get('citizenId'),
+                                                 date_from=filters.get('dateFrom'),
+                                                 date_to=self._inclusive_date_to(filters.get('dateTo')),
+                                                 risk_level=filters.get('riskLevel'),
+                                                 limit=None)
+            for record in records:
+                self._history.remove(record)
+            if records:
+                self._history_writer.delete([r['id'] for r in records])
+        history_log.info('Deleted %d records', len(records))
+        return len(records)
+
+    def label_record(self, record_id: str, stroke) -> Optional[Dict[str, Any]]:
+        """Store the real outcome of a past prediction and add the case to the labeled training store."""
+        if str(stroke) not in ('0', '1'):
+            raise ValueError('stroke must be 0 or 1')
+        stroke = int(stroke)
+        self._history_writer.sync(self._sync_timeout)
+        with self._history_lock.write():
+            record = self._history.get(record_id)
+            if record is None:
+                return None
+            if record.get('outcome') not in (None, stroke):
+                raise ValueError('Record already labeled with a different outcome')
+            labeled = {**record, 'outcome': stroke, 'labeledAt': datetime.utcnow().isoformat() + 'Z'}
+            self._history.remove(record)
+            self._history.add(labeled)
+            # Rewritten as delete + append, both through the writer queue in order
+            self._history_writer.delete([record_id])
+            self._history_writer.append(labeled)
+
+        from .training_store import get_training_store, to_dataset_row
+        store = get_training_store()
+        added = store.add([{'id': record_id, **to_dataset_row(record), 'stroke': stroke}], source='history')
+        history_log.info('Labeled record %s with stroke=%d', record_id, stroke)
+        return {'id': record_id, 'outcome': stroke, 'added': bool(added), 'labeledRows': store.count()}
+
     def clear_all_history(self) -> bool:
         """Clear all history records."""
         try:
-            self._history = []
-            self._save_history()
-            print(f"[History] Cleared all history records")
+            with self._history_lock.write():
+                self._history.clear()
+                self._save_history()
+            history_log.info('Cleared all history records')
             return True
         except Exception as e:
-            print(f"[History] Failed to clear history: {e}")
+            history_log.error('Failed to clear history: %s', e)
             return False
 
     @staticmethod
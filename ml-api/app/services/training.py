@@ -0,0 +1,426 @@
+import os
+import json
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Callable, List, Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split, StratifiedKFold
+from sklearn.pipeline import Pipeline
+from sklearn.metrics import (
+    classification_report,
+    roc_auc_score,
+    accuracy_score,
+    f1_score,
+    precision_score,
+    recall_score,
+    mean_absolute_error,
+    mean_squared_error,
+    confusion_matrix,
+)
+from sklearn.linear_model import LogisticRegression
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+from sklearn.neighbors import KNeighborsClassifier
+
+from .dataset import get_dataset
+# The column names and build_preprocessor are re-exported for existing callers
+from .features import (  # noqa: F401
+    TARGET_COL, NUM_COLS, CAT_COLS, build_preprocessor, clean, fit_transform, fold_matrices, load_frame, split_xy,
+)
+from .model_artifacts import dump_joblib, export_compact, compact_path, copy_artifact
+from ..utils.log import get_logger
+
+log = get_logger('training')
+
+DATA_PATH = Path('app/Dataset/healthcare-dataset-stroke-data.csv')
+MODEL_DIR = Path('app/models')
+CONFIG_FILE = Path('app/config/model_config.json')
+MANIFEST_NAME = 'models.json'
+METRICS_NAME = 'metrics.json'
+# Also write <name>.compact artifacts (memory-mappable arrays), optionally as float32
+EXPORT_COMPACT = os.getenv('MODEL_COMPACT', '0').lower() in ('1', 'true', 'yes')
+EXPORT_FLOAT32 = os.getenv('MODEL_FLOAT32', '0').lower() in ('1', 'true', 'yes')
+
+DEFAULT_PARAMS = {
+    'logistic_regression': {
+        'max_iter': 1000, 'solver': 'liblinear', 'class_weight': 'balanced', 'C': 1.0, 'penalty': 'l2', 'random_state': 42
+    },
+    'random_forest': {
+        'n_estimators': 300, 'random_state': 42, 'class_weight': 'balanced'
+    },
+    'gradient_boosting': {
+        'n_estimators': 100, 'learning_rate': 0.1, 'max_depth': 3, 'random_state': 42
+    },
+    'knn': {
+        'n_neighbors': 15, 'weights': 'uniform', 'algorithm': 'auto'
+    },
+}
+ESTIMATORS = {
+    'logistic_regression': LogisticRegression,
+    'random_forest': RandomForestClassifier,
+    'gradient_boosting': GradientBoostingClassifier,
+    'knn': KNeighborsClassifier,
+}
+
+
+class TrainingCancelled(Exception):
+    """Raised inside `train` when `should_stop` asks it to stop."""
+
+
+def load_data(labeled_rows: Optional[int] = None):
+    """The cleaned training frame (read-only): the CSV, parsed and cleaned once per version,
+    followed by the first `labeled_rows` rows of the labeled store (all of them by default)."""
+    from .training_store import get_training_store
+    base = load_frame(DATA_PATH)
+    labeled = get_training_store().frame(stop=labeled_rows) if labeled_rows != 0 else None
+    if labeled is None or labeled.empty:
+        return base
+    return pd.concat([base, clean(labeled)], ignore_index=True)
+
+
+def split_key(labeled_rows: int):
+    """Names the training split (dataset version + labeled rows) in the feature transform cache."""
+    return ('train', get_dataset(DATA_PATH).version(), labeled_rows)
+
+
+def load_config() -> Dict[str, Any]:
+    if not CONFIG_FILE.exists():
+        return {}
+    try:
+        with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        log.info('Loaded config from %s', CONFIG_FILE)
+        return config
+    except Exception as e:
+        log.warning('Failed to load config: %s', e)
+        return {}
+
+
+def algorithm_params(overrides: Optional[Dict[str, Dict[str, Any]]] = None,
+                     names: Optional[List[str]] = None,
+                     config: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+    """Parameters from model_config.json (or `config`, or the defaults), with per-algorithm `overrides` merged on top."""
+    config = load_config() if config is None else config
+    params = {}
+    for name in ESTIMATORS:
+        if names and name not in names:
+            continue
+        merged = dict(config.get(name, DEFAULT_PARAMS[name]))
+        merged.update((overrides or {}).get(name, {}))
+        # Remove None values for params
+        params[name] = {k: v for k, v in merged.items() if v is not None}
+    return params
+
+
+def get_algorithms(overrides: Optional[Dict[str, Dict[str, Any]]] = None,
+                   names: Optional[List[str]] = None):
+    """Estimators built from model_config.json, with per-algorithm `overrides` merged on top."""
+    return {name: ESTIMATORS[name](**params) for name, params in algorithm_params(overrides, names).items()}
+
+
+def evaluate(pipeline, X_test, y_test) -> Dict[str, Any]:
+    y_pred = pipeline.predict(X_test)
+    try:
+        y_proba = pipeline.predict_proba(X_test)[:, 1]
+        auc = roc_auc_score(y_test, y_proba)
+        mae_proba = mean_absolute_error(y_test, y_proba)
+        mse_proba = mean_squared_error(y_test, y_proba)
+    except Exception:
+        auc = None
+        mae_proba = None
+        mse_proba = None
+
+    # Calculate confusion matrix
+    cm = confusion_matrix(y_test, y_pred)
+    tn, fp, fn, tp = cm.ravel() if cm.size == 4 else (0, 0, 0, 0)
+
+    acc = accuracy_score(y_test, y_pred)
+    f1 = f1_score(y_test, y_pred, zero_division=0)
+    prec = precision_score(y_test, y_pred, zero_division=0)
+    rec = recall_score(y_test, y_pred, zero_division=0)
+
+    # MAE and MSE for predictions (0/1)
+    mae = mean_absolute_error(y_test, y_pred)
+    mse = mean_squared_error(y_test, y_pred)
+    log.debug('Classification report:\n%s', classification_report(y_test, y_pred, zero_division=0))
+
+    return {
+        'roc_auc': float(auc) if auc is not None else None,
+        'accuracy': float(acc),
+        'f1_score': float(f1),
+        'precision': float(prec),
+        'recall': float(rec),
+        'mae': float(mae),
+        'mse': float(mse),
+        'mae_proba': float(mae_proba) if mae_proba is not None else None,
+        'mse_proba': float(mse_proba) if mse_proba is not None else None,
+        'confusion_matrix': {
+            'true_negative': int(tn),
+            'false_positive': int(fp),
+            'false_negative': int(fn),
+            'true_positive': int(tp)
+        },
+        'specificity': float(tn / (tn + fp)) if (tn + fp) > 0 else 0.0,
+        'sensitivity': float(tp / (tp + fn)) if (tp + fn) > 0 else 0.0,
+    }
+
+
+class _Progress:
+    """Turns training steps into events with an overall percentage."""
+
+    def __init__(self, total_steps: int, callback: Optional[Callable[[Dict[str, Any]], None]],
+                 should_stop: Optional[Callable[[], bool]]):
+        self._total = max(total_steps, 1)
+        self._done = 0
+        self._callback = callback
+        self._should_stop = should_stop
+
+    def check(self):
+        if self._should_stop is not None and self._should_stop():
+            raise TrainingCancelled('Training cancelled')
+
+    def step(self, stage: str, message: str, advance: int = 1, **fields):
+        self._done = min(self._done + advance, self._total)
+        if self._callback is not None:
+            self._callback({'stage': stage, 'message': message,
+                            'progress': round(100.0 * self._done / self._total, 1), **fields})
+        self.check()
+
+
+def _fold_task(data, name, model, fold) -> Dict[str, Any]:
+    Z_fit, y_fit, Z_val, y_val = data['folds'][fold - 1]
+    started = time.perf_counter()
+    model = model.fit(Z_fit, y_fit)
+    proba = model.predict_proba(Z_val)[:, 1]
+    return {'kind': 'fold', 'name': name, 'fold': fold,
+            'roc_auc': float(roc_auc_score(y_val, proba)),
+            'seconds': time.perf_counter() - started}
+
+
+def _fit_task(data, name, model, model_dir, compact, float32) -> Dict[str, Any]:
+    """Fit on the training split, evaluate on the test split and save the artifact."""
+    started = time.perf_counter()
+    model.fit(data['Z_train'], data['y_train'])
+    seconds = time.perf_counter() - started
+    metrics = evaluate(model, data['Z_test'], data['y_test'])
+    # The served pipeline: the preprocessor fitted once on the training split, then this model
+    pipeline = Pipeline(steps=[('preprocessor', data['preprocessor']), ('model', model)])
+    # Written via rename: API workers may have the previous file memory-mapped
+    model_path = Path(model_dir) / f'{name}.joblib'
+    dump_joblib(pipeline, model_path)
+    if compact:
+        export_compact(pipeline, compact_path(str(model_path)), float32=float32, X=data['X_test'])
+    return {'kind': 'fit', 'name': name, 'metrics': metrics, 'file': str(model_path), 'seconds': seconds}
+
+
+# Data of a pool worker (see run_tasks), sent once by the initializer rather than with every task
+_worker_data = None
+
+
+def _init_worker(data):
+    global _worker_data
+    _worker_data = data
+
+
+def _pool_task(fn, *args):
+    return fn(_worker_data, *args)
+
+
+def _write_json(path, data):
+    tmp = Path(f'{path}.{os.getpid()}.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _record_models(model_dir, entries: List[Dict[str, Any]], metrics: Dict[str, Any]):
+    """Replace these models' entries in metrics.json, then models.json, keeping the others.
+
+    Both files are replaced by rename so the API's hot reload never reads a
+    half-written file; models.json goes last because it is what triggers it.
+    """
+    model_dir = Path(model_dir)
+    _write_json(model_dir / METRICS_NAME, {**_read_json(model_dir / METRICS_NAME, {}), **metrics})
+    # Keep the existing order; models not listed yet go at the end
+    by_name = {entry['name']: entry for entry in entries}
+    manifest = [by_name.pop(e.get('name'), e) for e in _read_json(model_dir / MANIFEST_NAME, [])]
+    _write_json(model_dir / MANIFEST_NAME, manifest + list(by_name.values()))
+
+
+# Slowest first, so a pool does not end up waiting on one late random forest
+_COST_ORDER = ['random_forest', 'gradient_boosting', 'knn', 'logistic_regression']
+
+
+def train(overrides: Optional[Dict[str, Dict[str, Any]]] = None, algorithms: Optional[List[str]] = None,
+          cv_folds: int = 0, model_dir=MODEL_DIR,
+          progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+          should_stop: Optional[Callable[[], bool]] = None,
+          workers: Optional[int] = None, rf_jobs: Optional[int] = None) -> Dict[str, Any]:
+    """Fit every algorithm, save the pipelines and record them in models.json/metrics.json in `model_dir`.
+
+    `progress` receives one event per step (data loaded, each CV fold, each
+    fitted and saved model) with the overall `progress` in percent.
+    `should_stop` is polled between steps; when it returns True the run
+    raises TrainingCancelled. With cv_folds >= 2 each algorithm is also
+    cross-validated on the training split and its metrics gain a `cv` entry.
+
+    workers > 1 runs the fits and CV folds concurrently in a process pool
+    (0 = one per CPU; default TRAINING_PROCESSES, else serial). rf_jobs sets
+    the random forest's n_jobs (default TRAINING_RF_JOBS; the config's
+    n_jobs otherwise). Each model is saved and recorded as soon as it and
+    its folds are done, so models finished before a crash or cancellation
+    are kept.
+    """
+    started = time.perf_counter()
+    model_dir = Path(model_dir)
+    workers = int(os.getenv('TRAINING_PROCESSES', 1)) if workers is None else workers
+    workers = workers or os.cpu_count() or 1
+    if rf_jobs is None and os.getenv('TRAINING_RF_JOBS'):
+        rf_jobs = int(os.getenv('TRAINING_RF_JOBS'))
+    if rf_jobs is not None and 'n_jobs' not in (overrides or {}).get('random_forest', {}):
+        overrides = {**(overrides or {}), 'random_forest': {**(overrides or {}).get('random_forest', {}),
+                                                            'n_jobs': rf_jobs}}
+    algos = get_algorithms(overrides, algorithms)
+    if not algos:
+        raise ValueError(f'No known algorithm in {algorithms}; expected some of {list(ESTIMATORS)}')
+    folds = cv_folds if cv_folds >= 2 else 0
+    # load + per algorithm: folds, fit, save
+    tracker = _Progress(1 + len(algos) * (folds + 2), progress, should_stop)
+    tracker.check()
+
+    from .training_store import get_training_store
+    labeled = get_training_store().count()
+    df = load_data(labeled)
+    # Prepare features/target
+    X, y = split_xy(df)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.25, random_state=42, stratify=y
+    )
+    tracker.step('load', f'Loaded dataset {df.shape[0]} rows x {df.shape[1]} columns ({labeled} labeled later)',
+                 rows=int(df.shape[0]), labeledRows=labeled)
+    model_dir.mkdir(parents=True, exist_ok=True)
+
+    # Every model (and CV fold) shares one fitted preprocessor and its matrices, cached per split
+    key = split_key(labeled)
+    preprocessor, Z_train, _, Z_test, _ = fit_transform((key, 'split'), X_train, y_train, X_test, y_test)
+    splits = StratifiedKFold(n_splits=folds, shuffle=True, random_state=42).split(X_train, y_train) \
+        if folds else []
+    data = {'preprocessor': preprocessor, 'Z_train': Z_train, 'y_train': y_train.to_numpy(), 'Z_test': Z_test,
+            'y_test': y_test.to_numpy(), 'X_test': X_test,
+            'folds': fold_matrices((key, None, folds, 42), X_train, y_train, splits)}
+
+    tasks = []
+    for name in sorted(algos, key=lambda n: _COST_ORDER.index(n) if n in _COST_ORDER else len(_COST_ORDER)):
+        tasks.append((_fit_task, name, algos[name], str(model_dir), EXPORT_COMPACT, EXPORT_FLOAT32))
+        tasks.extend((_fold_task, name, clone(algos[name]), fold) for fold in range(1, folds + 1))
+
+    fits, scores, timings, manifest, all_metrics = {}, {}, {}, [], {}
+
+    def collect(result):
+        name = result['name']
+        timings.setdefault(name, {})
+        if result['kind'] == 'fold':
+            scores.setdefault(name, {})[result['fold']] = result['roc_auc']
+            timings[name].setdefault('folds', []).append(result['seconds'])
+            tracker.step('fold', f"{name}: fold {result['fold']}/{folds} ROC AUC {result['roc_auc']:.4f}",
+                         algorithm=name, fold=result['fold'], folds=folds, roc_auc=result['roc_auc'])
+        else:
+            fits[name] = result
+            timings[name]['fit'] = result['seconds']
+            tracker.step('fit', f"{name}: trained in {result['seconds']:.1f}s, "
+                                f"ROC AUC {result['metrics']['roc_auc'] or 0:.4f}",
+                         algorithm=name, metrics=result['metrics'], seconds=result['seconds'])
+        if name in fits and len(scores.get(name, {})) == folds:
+            record(name)
+
+    def record(name):
+        metrics = fits[name]['metrics']
+        if folds:
+            values = [scores[name][f] for f in sorted(scores[name])]
+            metrics['cv'] = {'folds': folds, 'roc_auc_mean': float(np.mean(values)),
+                             'roc_auc_std': float(np.std(values)), 'roc_auc_scores': values}
+        trained_at = datetime.utcnow().isoformat() + 'Z'
+        # What incremental updates (see incremental.py) continue from
+        training = {'mode': 'full', 'labeledRows': labeled, 'fullLabeledRows': labeled, 'fullAt': trained_at,
+                    'updates': 0}
+        entry = {'name': name, 'file': fits[name]['file'], 'trained_at': trained_at, 'training': training}
+        _record_models(model_dir, [entry], {name: metrics})
+        manifest.append(entry)
+        all_metrics[name] = metrics
+        tracker.step('save', f"{name}: saved to {fits[name]['file']}", algorithm=name, file=fits[name]['file'])
+
+    workers = run_tasks(tasks, data, workers, collect, tracker.check)
+
+    wall = time.perf_counter() - started
+    task_seconds = sum(t.get('fit', 0) + sum(t.get('folds', [])) for t in timings.values())
+    log.info('Trained %d models into %s in %.1fs with %d worker(s) (fits and folds took %.1fs)',
+             len(manifest), model_dir, wall, workers, task_seconds)
+    return {'modelDir': str(model_dir), 'models': all_metrics, 'manifest': manifest, 'seconds': wall,
+            'workers': workers, 'timings': timings, 'taskSeconds': task_seconds}
+
+
+def run_tasks(tasks, data, workers: int, collect: Callable[[Any], None], check: Callable[[], None]) -> int:
+    """Run `fn(data, *args)` for each (fn, *args) task, handing results to `collect` as they finish.
+
+    workers <= 1 runs them in order in this process; otherwise in a process
+    pool that receives `data` once per worker (fn must be a module-level
+    function). `check` is called between results and may raise to stop: tasks
+    not started yet are then dropped, running ones finish in the background
+    and are not collected. Returns the number of workers used.
+    """
+    if workers <= 1 or len(tasks) <= 1:
+        for fn, *args in tasks:
+            collect(fn(data, *args))
+            check()
+        return 1
+    workers = min(workers, len(tasks))
+    context = multiprocessing.get_context(os.getenv('TRAINING_START_METHOD', 'spawn'))
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                               initializer=_init_worker, initargs=(data,))
+    finished = False
+    try:
+        pending = {pool.submit(_pool_task, fn, *args) for fn, *args in tasks}
+        while pending:
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                collect(future.result())
+            check()
+        finished = True
+    finally:
+        pool.shutdown(wait=finished, cancel_futures=True)
+    return workers
+
+
+def publish(source_dir, model_dir=MODEL_DIR):
+    """Install the models trained into `source_dir` as the served ones in `model_dir`.
+
+    Artifacts are copied by rename, then recorded like freshly trained
+    models; models the job did not train stay as they are.
+    """
+    source_dir, model_dir = Path(source_dir), Path(model_dir)
+    manifest = _read_json(source_dir / MANIFEST_NAME, [])
+    metrics = _read_json(source_dir / METRICS_NAME, {})
+    model_dir.mkdir(parents=True, exist_ok=True)
+    for entry in manifest:
+        source = Path(entry['file'])
+        target = model_dir / source.name
+        copy_artifact(source, target)
+        entry['file'] = str(target)
+        source_compact = Path(compact_path(str(source)))
+        if source_compact.is_dir():
+            copy_artifact(source_compact, compact_path(str(target)))
+
+    _record_models(model_dir, manifest, metrics)
+    log.info('Published %d models from %s to %s', len(manifest), source_dir, model_dir)
+
+
+def _read_json(path, default):
+    if not Path(path).exists():
+        return default
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
@@ -0,0 +1,472 @@
+import os
+import json
+import time
+import uuid
+import queue
+import socket
+import shutil
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Callable, List, Optional
+
+from ..utils.log import get_logger
+from ..utils.metrics import REGISTRY
+
+log = get_logger('training')
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = 'queued', 'running', 'succeeded', 'failed', 'cancelled'
+ACTIVE = (QUEUED, RUNNING)
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+JOB_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+# Shown by the model config page, which polls GET /train/status
+MESSAGES = {
+    QUEUED: 'Đang chờ trong hàng đợi...',
+    RUNNING: 'Bắt đầu training models...',
+    SUCCEEDED: 'Training hoàn tất thành công!',
+    FAILED: 'Training thất bại',
+    CANCELLED: 'Training đã bị hủy',
+}
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat() + 'Z'
+
+
+class JobStore:
+    """Training jobs and their progress events in one SQLite file.
+
+    Every gunicorn worker opens the same file, so a job submitted to one
+    worker can be listed, streamed and cancelled through any other.
+    """
+
+    _COLUMNS = ('id', 'status', 'params', 'progress', 'message', 'error', 'result',
+                'created_at', 'started_at', 'finished_at', 'cancel_requested', 'owner')
+
+    def __init__(self, path: str):
+        self._path = Path(path)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'id TEXT UNIQUE NOT NULL, '
+                'status TEXT NOT NULL, '
+                'params TEXT NOT NULL, '
+                'progress REAL NOT NULL DEFAULT 0, '
+                'message TEXT, error TEXT, result TEXT, '
+                'created_at TEXT, started_at TEXT, finished_at TEXT, '
+                'cancel_requested INTEGER NOT NULL DEFAULT 0, '
+                'owner TEXT)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS job_events ('
+                'seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'job_id TEXT NOT NULL, '
+                'type TEXT NOT NULL, '
+                'created_at TEXT, '
+                'data TEXT NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_job_events_job ON job_events (job_id, seq)')
+            conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections must not cross a fork (e.g. gunicorn preload)
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(str(self._path), check_same_thread=False, timeout=30)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._pid = os.getpid()
+        return self._conn
+
+    def _row(self, row) -> Dict[str, Any]:
+        job = dict(zip(self._COLUMNS, row))
+        return {
+            'id': job['id'],
+            'status': job['status'],
+            'params': json.loads(job['params']),
+            'progress': job['progress'],
+            'message': job['message'],
+            'error': job['error'],
+            'result': json.loads(job['result']) if job['result'] else None,
+            'createdAt': job['created_at'],
+            'startedAt': job['started_at'],
+            'finishedAt': job['finished_at'],
+            'cancelRequested': bool(job['cancel_requested']),
+            'owner': job['owner'],
+        }
+
+    def create(self, params: Dict[str, Any], owner: str) -> Dict[str, Any]:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            conn = self._connection()
+            conn.execute('INSERT INTO jobs (id, status, params, message, created_at, owner) VALUES (?, ?, ?, ?, ?, ?)',
+                         (job_id, QUEUED, json.dumps(params), MESSAGES[QUEUED], _now(), owner))
+            conn.commit()
+        return self.get(job_id)
+
+    def update(self, job_id: str, **fields):
+        names = {'startedAt': 'started_at', 'finishedAt': 'finished_at'}
+        assignments, values = [], []
+        for key, value in fields.items():
+            if key == 'result':
+                value = json.dumps(value)
+            assignments.append(f'{names.get(key, key)} = ?')
+            values.append(value)
+        with self._lock:
+            conn = self._connection()
+            conn.execute(f"UPDATE jobs SET {', '.join(assignments)} WHERE id = ?", (*values, job_id))
+            conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connection().execute(
+                f"SELECT {', '.join(self._COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def list(self, limit: int = 50, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        where, args = ('WHERE status = ?', (status,)) if status else ('', ())
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT {', '.join(self._COLUMNS)} FROM jobs {where} ORDER BY seq DESC LIMIT ?",
+                (*args, limit)).fetchall()
+        return [self._row(r) for r in rows]
+
+    def add_event(self, job_id: str, kind: str, data: Dict[str, Any]) -> int:
+        with self._lock:
+            conn = self._connection()
+            cursor = conn.execute('INSERT INTO job_events (job_id, type, created_at, data) VALUES (?, ?, ?, ?)',
+                                  (job_id, kind, _now(), json.dumps(data)))
+            conn.commit()
+            return cursor.lastrowid
+
+    def events(self, job_id: Optional[str] = None, after: int = 0, limit: int = 500) -> List[Dict[str, Any]]:
+        """Events with seq > after, oldest first; all jobs when job_id is None."""
+        where, args = ('AND job_id = ?', (job_id,)) if job_id else ('', ())
+        with self._lock:
+            rows = self._connection().execute(
+                f'SELECT seq, job_id, type, created_at, data FROM job_events WHERE seq > ? {where} '
+                'ORDER BY seq LIMIT ?', (after, *args, limit)).fetchall()
+        return [{'seq': seq, 'jobId': jid, 'type': kind, 'createdAt': created, 'data': json.loads(data)}
+                for seq, jid, kind, created, data in rows]
+
+    def last_event_seq(self) -> int:
+        with self._lock:
+            row = self._connection().execute('SELECT MAX(seq) FROM job_events').fetchone()
+        return row[0] or 0
+
+    def request_cancel(self, job_id: str) -> bool:
+        with self._lock:
+            conn = self._connection()
+            cursor = conn.execute(
+                f"UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status IN ({', '.join('?' * len(ACTIVE))})",
+                (job_id, *ACTIVE))
+            conn.commit()
+            return cursor.rowcount > 0
+
+    def cancel_requested(self, job_id: str) -> bool:
+        with self._lock:
+            row = self._connection().execute('SELECT cancel_requested FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def active(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT {', '.join(self._COLUMNS)} FROM jobs WHERE status IN ({', '.join('?' * len(ACTIVE))})",
+                ACTIVE).fetchall()
+        return [self._row(r) for r in rows]
+
+    def prune(self, keep: int) -> List[str]:
+        """Delete finished jobs beyond the newest `keep` (and their events); returns their ids."""
+        if keep <= 0:
+            return []
+        with self._lock:
+            conn = self._connection()
+            ids = [r[0] for r in conn.execute(
+                f"SELECT id FROM jobs WHERE status IN ({', '.join('?' * len(FINISHED))}) "
+                'ORDER BY seq DESC LIMIT -1 OFFSET ?', (*FINISHED, keep)).fetchall()]
+            if ids:
+                marks = ', '.join('?' * len(ids))
+                conn.execute(f'DELETE FROM job_events WHERE job_id IN ({marks})', ids)
+                conn.execute(f'DELETE FROM jobs WHERE id IN ({marks})', ids)
+                conn.commit()
+        return ids
+
+    def counts(self) -> Dict[tuple, int]:
+        with self._lock:
+            rows = self._connection().execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        return {(status,): n for status, n in rows}
+
+
+class TrainingJobManager:
+    """Queue of training jobs run in-process by a small pool of worker threads.
+
+    `runner(params, progress, should_stop, workdir)` does the work (see
+    services.training.train), writing its models into the job's own
+    directory, and returns a JSON-serialisable result; its progress events
+    are stored and can be streamed while it runs. A successful job with
+    params['publish'] is handed to `publisher(workdir)`, which installs the
+    models for serving; other jobs keep their artifacts (the newest
+    `keep_artifacts` of them) so they can be published later.
+
+    Cancellation is cooperative: a queued job is dropped before it starts,
+    a running one stops at the next progress step (between CV folds or
+    models). The same applies to the per-job timeout.
+
+    Other long-running work (e.g. validation) reuses the manager under its
+    own `name`, which prefixes its metrics and logs, with its own `messages`
+    and no artifacts directory.
+    """
+
+    def __init__(self, store: JobStore, runner: Callable[..., Dict[str, Any]], artifacts_dir: Optional[str],
+                 publisher: Optional[Callable[[Path], None]] = None, workers: int = 1, timeout: float = 0,
+                 keep: int = 200, keep_artifacts: int = 20,
+                 on_finished: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 name: str = 'training', messages: Optional[Dict[str, str]] = None):
+        self._store = store
+        self._runner = runner
+        self._artifacts_dir = Path(artifacts_dir) if artifacts_dir else None
+        self._name = name
+        self._messages = messages or MESSAGES
+        self._publisher = publisher
+        self._workers = max(1, workers)
+        self._timeout = timeout
+        self._keep = keep
+        self._keep_artifacts = keep_artifacts
+        self._on_finished = on_finished
+        self._publish_lock = threading.Lock()
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._pid = None
+        self._owner = None
+        self._start_lock = threading.Lock()
+        title = name.capitalize()
+        self._job_seconds = REGISTRY.histogram(f'ml_{name}_job_seconds', f'{title} job run time', ('status',),
+                                               buckets=JOB_BUCKETS)
+        self._jobs_finished = REGISTRY.counter(f'ml_{name}_jobs_total', f'{title} jobs finished', ('status',))
+        REGISTRY.callback(f'ml_{name}_jobs', f'{title} jobs in the job store', store.counts,
+                          labelnames=('status',))
+        REGISTRY.callback(f'ml_{name}_queue_depth', f'{title} jobs queued in this process',
+                          lambda: self._queue.qsize() if self._running() else 0)
+
+    @classmethod
+    def from_env(cls, runner, publisher=None, on_finished=None):
+        return cls(
+            JobStore(os.getenv('TRAINING_JOBS_DB', 'app/data/training_jobs.sqlite3')),
+            runner,
+            artifacts_dir=os.getenv('TRAINING_ARTIFACTS_DIR', 'app/models/jobs'),
+            publisher=publisher,
+            workers=int(os.getenv('TRAINING_WORKERS', 1)),
+            timeout=float(os.getenv('TRAINING_TIMEOUT', 600)),
+            keep=int(os.getenv('TRAINING_JOB_HISTORY', 200)),
+            keep_artifacts=int(os.getenv('TRAINING_KEEP_ARTIFACTS', 20)),
+            on_finished=on_finished,
+        )
+
+    # Submitting and inspecting jobs
+
+    def submit(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        self._ensure_started()
+        job = self._store.create(params, self._owner)
+        self._store.add_event(job['id'], 'status', {'status': QUEUED, 'message': self._messages[QUEUED]})
+        self._queue.put(job['id'])
+        self._prune()
+        log.info('Queued %s job %s', self._name, job['id'])
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        self._ensure_started()
+        return self._store.get(job_id)
+
+    def list(self, limit: int = 50, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        # Starting the pool also fails jobs orphaned by an exited process
+        self._ensure_started()
+        return self._store.list(limit, status)
+
+    def events(self, job_id: Optional[str] = None, after: int = 0) -> List[Dict[str, Any]]:
+        return self._store.events(job_id, after)
+
+    def last_event_seq(self) -> int:
+        return self._store.last_event_seq()
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Ask a queued or running job to stop; returns the job, or None if unknown."""
+        if self._store.request_cancel(job_id):
+            log.info('Cancellation requested for %s job %s', self._name, job_id)
+        return self._store.get(job_id)
+
+    def publish(self, job_id: str) -> Dict[str, Any]:
+        """Install the models of a finished job for serving; raises ValueError if it cannot be."""
+        job = self._store.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        if job['status'] != SUCCEEDED:
+            raise ValueError(f"Job {job_id} is {job['status']}, only succeeded jobs can be published")
+        path = self.artifacts_dir(job_id)
+        if path is None or not path.is_dir():
+            raise ValueError(f'The models of job {job_id} are no longer kept')
+        if self._publisher is None:
+            raise ValueError('Publishing is not configured')
+        with self._publish_lock:
+            self._publisher(path)
+        result = {**(job['result'] or {}), 'published': True, 'publishedAt': _now()}
+        self._store.update(job_id, result=result)
+        self._store.add_event(job_id, 'status', {'status': SUCCEEDED, 'message': 'Published', 'published': True})
+        log.info('Published the models of training job %s', job_id)
+        return self._store.get(job_id)
+
+    def artifacts_dir(self, job_id: str) -> Optional[Path]:
+        return self._artifacts_dir / job_id if self._artifacts_dir else None
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        self._ensure_started()
+        jobs = self._store.list(limit=1)
+        return jobs[0] if jobs else None
+
+    # Worker pool
+
+    def _running(self) -> bool:
+        return bool(self._threads) and self._pid == os.getpid()
+
+    def _ensure_started(self):
+        # Threads do not survive fork(), so a forked worker starts its own pool
+        if self._running():
+            return
+        with self._start_lock:
+            if self._running():
+                return
+            self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._owner = f'{socket.gethostname()}:{self._pid}:{uuid.uuid4().hex[:8]}'
+            self._reap_orphans()
+            self._threads = [threading.Thread(target=self._work, name=f'{self._name}-{i}', daemon=True)
+                             for i in range(self._workers)]
+            for thread in self._threads:
+                thread.start()
+
+    def _reap_orphans(self):
+        """Fail jobs left queued/running by a process that no longer exists."""
+        host = socket.gethostname()
+        for job in self._store.active():
+            owner_host, _, rest = (job['owner'] or '').partition(':')
+            pid = int(rest.partition(':')[0] or 0)
+            if owner_host != host or (pid != self._pid and _alive(pid)):
+                continue
+            # Also a job of our own pid from an earlier run (pids repeat across container restarts)
+            self._finish(job['id'], FAILED, error='Interrupted: the process running it exited')
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._run(job_id)
+            except Exception as e:
+                log.exception('%s job %s crashed: %s', self._name.capitalize(), job_id, e)
+
+    def _run(self, job_id: str):
+        job = self._store.get(job_id)
+        if job is None or job['status'] != QUEUED:
+            return
+        if job['cancelRequested']:
+            self._finish(job_id, CANCELLED)
+            return
+        self._store.update(job_id, status=RUNNING, startedAt=_now(), message=self._messages[RUNNING])
+        self._store.add_event(job_id, 'status', {'status': RUNNING, 'message': self._messages[RUNNING]})
+        log.info('%s job %s started', self._name.capitalize(), job_id)
+
+        started = time.monotonic()
+        timeout = float(job['params'].get('timeout') or self._timeout)
+        timed_out = threading.Event()
+
+        def progress(event):
+            self._store.update(job_id, progress=event['progress'], message=event['message'])
+            self._store.add_event(job_id, 'progress', event)
+
+        def should_stop():
+            if timeout and time.monotonic() - started > timeout:
+                timed_out.set()
+                return True
+            return self._store.cancel_requested(job_id)
+
+        from .training import TrainingCancelled
+        try:
+            result = self._runner(job['params'], progress, should_stop, self.artifacts_dir(job_id))
+        except TrainingCancelled:
+            if timed_out.is_set():
+                title = self._name.capitalize()
+                self._finish(job_id, FAILED, started, message=f'{title} timeout',
+                             error=f'{title} took too long (>{timeout:g} s)')
+            else:
+                self._finish(job_id, CANCELLED, started)
+            return
+        except Exception as e:
+            log.error('%s job %s failed: %s', self._name.capitalize(), job_id, e)
+            self._finish(job_id, FAILED, started, error=str(e))
+            return
+        result = {**result, 'published': False}
+        if job['params'].get('publish'):
+            try:
+                with self._publish_lock:
+                    self._publisher(self.artifacts_dir(job_id))
+                result.update(published=True, publishedAt=_now())
+            except Exception as e:
+                log.error('Training job %s could not publish its models: %s', job_id, e)
+                self._finish(job_id, FAILED, started, error=f'Publishing failed: {e}', result=result)
+                return
+        self._finish(job_id, SUCCEEDED, started, result=result)
+
+    def _finish(self, job_id: str, status: str, started: Optional[float] = None,
+                message: Optional[str] = None, error: Optional[str] = None, result=None):
+        message = message or self._messages[status]
+        fields = {'status': status, 'finishedAt': _now(), 'message': message, 'error': error}
+        if status == SUCCEEDED:
+            fields['progress'] = 100.0
+        if result is not None:
+            fields['result'] = result
+        if status != SUCCEEDED:
+            self._remove_artifacts(job_id)
+        self._store.update(job_id, **fields)
+        self._store.add_event(job_id, 'status', {'status': status, 'message': message, 'error': error})
+        if started is not None:
+            self._job_seconds.observe(time.monotonic() - started, status=status)
+        self._jobs_finished.inc(status=status)
+        log.info('%s job %s %s%s', self._name.capitalize(), job_id, status, f': {error}' if error else '')
+        if self._on_finished is not None:
+            try:
+                self._on_finished(self._store.get(job_id))
+            except Exception as e:
+                log.error('%s job %s completion hook failed: %s', self._name.capitalize(), job_id, e)
+
+    def _prune(self):
+        for job_id in self._store.prune(self._keep):
+            self._remove_artifacts(job_id)
+        if self._keep_artifacts <= 0 or self._artifacts_dir is None or not self._artifacts_dir.is_dir():
+            return
+        active = {job['id'] for job in self._store.active()}
+        kept = sorted((p for p in self._artifacts_dir.iterdir() if p.is_dir() and p.name not in active),
+                      key=lambda p: p.stat().st_mtime, reverse=True)
+        for path in kept[self._keep_artifacts:]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def _remove_artifacts(self, job_id: str):
+        path = self.artifacts_dir(job_id)
+        if path is not None and path.exists():
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,127 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .features import NUM_COLS, CAT_COLS, TARGET_COL
+from ..utils.log import get_logger
+
+log = get_logger('training')
+
+COLUMNS = NUM_COLS + CAT_COLS
+# 0/1 flags in the CSV; everything else in CAT_COLS is text
+FLAG_COLS = ('hypertension', 'heart_disease')
+
+
+def _camel(name: str) -> str:
+    head, *rest = name.split('_')
+    return head[0].lower() + head[1:] + ''.join(part.title() for part in rest)
+
+
+def to_dataset_row(record: Dict[str, Any]) -> Dict[str, Any]:
+    """A patient as the API sees it (camelCase keys, booleans) -> the CSV's columns and values."""
+    row = {}
+    for column in COLUMNS:
+        value = record.get(column, record.get(_camel(column)))
+        if column in FLAG_COLS and value is not None:
+            value = 1 if str(value).lower() in ('true', '1', 'yes') else 0
+        elif column in NUM_COLS and value is not None:
+            value = float(value)
+        row[column] = value
+    return row
+
+
+class LabeledStore:
+    """Labeled cases collected after the dataset CSV, appended in arrival order.
+
+    Rows keep the dataset's column names so they can be concatenated with
+    the CSV for training; `id` (e.g. the history record id) makes adding
+    the same case twice a no-op. Positions in the store never change, so a
+    model can remember how many rows it has seen.
+    """
+
+    def __init__(self, path: str):
+        self._path = Path(path)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        types = {**{c: 'REAL' for c in NUM_COLS}, **{c: 'INTEGER' for c in FLAG_COLS}}
+        columns = ', '.join(f'"{c}" {types.get(c, "TEXT")}' for c in COLUMNS)
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS labeled ('
+                'seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'id TEXT UNIQUE NOT NULL, '
+                f'{columns}, '
+                f'"{TARGET_COL}" INTEGER NOT NULL, '
+                'source TEXT, added_at TEXT)'
+            )
+            conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections must not cross a fork (e.g. gunicorn preload)
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(str(self._path), check_same_thread=False, timeout=30)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._pid = os.getpid()
+        return self._conn
+
+    def add(self, rows: List[Dict[str, Any]], source: str = 'api') -> int:
+        """Append rows ({'id', <dataset columns>, 'stroke'}); returns how many were new."""
+        now = datetime.utcnow().isoformat() + 'Z'
+        values = []
+        for row in rows:
+            if row.get(TARGET_COL) not in (0, 1):
+                raise ValueError(f'{TARGET_COL} must be 0 or 1')
+            values.append((str(row['id']), *(row.get(c) for c in COLUMNS), int(row[TARGET_COL]), source, now))
+        names = ', '.join(['id', *(f'"{c}"' for c in COLUMNS), f'"{TARGET_COL}"', 'source', 'added_at'])
+        with self._lock:
+            conn = self._connection()
+            before = conn.total_changes
+            conn.executemany(f"INSERT OR IGNORE INTO labeled ({names}) VALUES ({', '.join('?' * (len(COLUMNS) + 4))})",
+                             values)
+            conn.commit()
+            added = conn.total_changes - before
+        if added:
+            log.info('Added %d labeled rows to %s', added, self._path)
+        return added
+
+    def count(self) -> int:
+        with self._lock:
+            return self._connection().execute('SELECT COUNT(*) FROM labeled').fetchone()[0]
+
+    def frame(self, start: int = 0, stop: Optional[int] = None) -> pd.DataFrame:
+        """Rows [start, stop) in arrival order, with the dataset's columns."""
+        limit = -1 if stop is None else max(stop - start, 0)
+        names = ', '.join(f'"{c}"' for c in COLUMNS + [TARGET_COL])
+        with self._lock:
+            rows = self._connection().execute(
+                f'SELECT {names} FROM labeled ORDER BY seq LIMIT ? OFFSET ?', (limit, start)).fetchall()
+        frame = pd.DataFrame(rows, columns=COLUMNS + [TARGET_COL])
+        # Missing text as NaN, like read_csv, so the imputers see it
+        text = [c for c in CAT_COLS if c not in FLAG_COLS]
+        frame[text] = frame[text].where(frame[text].notna(), np.nan)
+        return frame
+
+    def describe(self) -> Dict[str, Any]:
+        return {'path': str(self._path), 'rows': self.count()}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_training_store() -> LabeledStore:
+    """The process-wide store of labeled cases (TRAINING_STORE, default app/data/labeled.sqlite3)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = LabeledStore(os.getenv('TRAINING_STORE', 'app/data/labeled.sqlite3'))
+        return _store
@@ -0,0 +1,473 @@
+import os
+import json
+import time
+import atexit
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Callable, List, Optional
+
+import numpy as np
+
+from . import features
+from .dataset import get_dataset
+from .features import load_frame, split_xy
+from .training import DEFAULT_PARAMS, ESTIMATORS, algorithm_params
+from ..utils.cache import LRUCache
+from ..utils.log import get_logger
+from ..utils.metrics import REGISTRY
+
+log = get_logger('validation')
+
+RUNS = REGISTRY.counter('ml_validation_runs_total', 'K-Fold validation requests by how they were answered',
+                        ('source',))
+
+# Used when model_config.json is missing or empty: the same defaults as training
+DEFAULT_CONFIG = DEFAULT_PARAMS
+DISPLAY_NAMES = {
+    'logistic_regression': 'Logistic Regression',
+    'random_forest': 'Random Forest',
+    'gradient_boosting': 'Gradient Boosting',
+    'knn': 'KNN',
+}
+METRICS = ('accuracy', 'precision', 'recall', 'f1', 'roc_auc')
+SEED = 42
+
+# How the folds are drawn. Plain K-Fold leaves some folds with very few strokes (~5% of the
+# rows), so the stratified modes are the default; 'nested' tunes each model (NESTED_GRIDS)
+# on the training part of every outer fold and scores the tuned model on the held-out part
+CV_MODES = ('kfold', 'stratified', 'repeated_stratified', 'nested')
+DEFAULT_CV = os.getenv('VALIDATION_CV', 'stratified')
+NESTED_INNER_FOLDS = int(os.getenv('VALIDATION_NESTED_INNER_FOLDS', 3))
+NESTED_GRIDS = {
+    'LogisticRegression': {'C': [0.1, 1.0, 10.0]},
+    'RandomForestClassifier': {'max_depth': [None, 8], 'min_samples_leaf': [1, 5]},
+    'GradientBoostingClassifier': {'learning_rate': [0.05, 0.1], 'max_depth': [2, 3]},
+    'KNeighborsClassifier': {'n_neighbors': [5, 15, 31]},
+}
+# Racing drops a candidate once a one-sided paired t-test on the folds run so far says
+# its ROC AUC is below the leader's at this level, after at least RACE_MIN_FOLDS folds
+RACE_ALPHA = float(os.getenv('VALIDATION_RACE_ALPHA', 0.05))
+RACE_MIN_FOLDS = int(os.getenv('VALIDATION_RACE_MIN_FOLDS', 3))
+
+
+def classifiers(config=None) -> Dict[str, Any]:
+    """Unfitted classifiers by display name, from a model_config.json-style dict, built like training builds them."""
+    return {DISPLAY_NAMES[name]: ESTIMATORS[name](**params)
+            for name, params in algorithm_params(config=config or DEFAULT_CONFIG).items()}
+
+
+def candidates(config=None) -> Dict[str, Any]:
+    """classifiers() of a config, or of every config of a list (named 'KNN #1', 'KNN #2', ...)."""
+    if not isinstance(config, list):
+        return classifiers(config)
+    return {(f'{name} #{i}' if len(config) > 1 else name): estimator
+            for i, variant in enumerate(config, start=1) for name, estimator in classifiers(variant).items()}
+
+
+def nested_search(estimator, inner: int = NESTED_INNER_FOLDS):
+    """The estimator tuned over its NESTED_GRIDS entry by an inner stratified CV on ROC AUC."""
+    from sklearn.model_selection import GridSearchCV, StratifiedKFold
+
+    grid = NESTED_GRIDS.get(type(estimator).__name__)
+    if not grid:
+        return estimator
+    return GridSearchCV(estimator, grid, scoring='roc_auc', n_jobs=1,
+                        cv=StratifiedKFold(n_splits=inner, shuffle=True, random_state=SEED))
+
+
+def splitter(cv: str, k: int, repeats: int = 1):
+    from sklearn.model_selection import KFold, StratifiedKFold, RepeatedStratifiedKFold
+
+    if cv == 'kfold':
+        return KFold(n_splits=k, shuffle=True, random_state=SEED)
+    if cv == 'repeated_stratified':
+        return RepeatedStratifiedKFold(n_splits=k, n_repeats=repeats, random_state=SEED)
+    if cv in ('stratified', 'nested'):
+        return StratifiedKFold(n_splits=k, shuffle=True, random_state=SEED)
+    raise ValueError(f'cv must be one of {", ".join(CV_MODES)}')
+
+
+def fold_matrices(path: str, scheme):
+    """(dataset version, [(X_fit, y_fit, X_val, y_val)] per fold) through the shared feature pipeline.
+
+    `scheme` is (cv, k, repeats), see splitter. Each fold is encoded the
+    way the served models encode their input, with the preprocessor fitted
+    once on the fold's training part; the matrices are cached per process
+    (see features.fold_matrices) and shared by all algorithms.
+    """
+    version = get_dataset(path).version()
+    X, y = split_xy(load_frame(path))
+    splits = splitter(*scheme).split(X, y)
+    return version, features.fold_matrices(('validation', str(path), version, tuple(scheme)), X, y, splits)
+
+
+def _fold_scores(path: str, scheme, fold: int, name: str, estimator) -> Dict[str, Any]:
+    """Fit one algorithm on one fold; the unit of work of the engine."""
+    from sklearn.base import clone
+    from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
+
+    started = time.perf_counter()
+    version, folds = fold_matrices(path, scheme)
+    X_fit, y_fit, X_val, y_val = folds[fold]
+    result = {'name': name, 'fold': fold, 'version': version}
+    try:
+        model = clone(estimator).fit(X_fit, y_fit)
+        predicted = model.predict(X_val)
+        result['scores'] = {
+            'accuracy': float(accuracy_score(y_val, predicted)),
+            'precision': float(precision_score(y_val, predicted, average='macro', zero_division=0)),
+            'recall': float(recall_score(y_val, predicted, average='macro', zero_division=0)),
+            'f1': float(f1_score(y_val, predicted, average='macro', zero_division=0)),
+            'roc_auc': float(roc_auc_score(y_val, model.predict_proba(X_val)[:, 1])),
+        }
+        result['train_accuracy'] = float(accuracy_score(y_fit, model.predict(X_fit)))
+        if hasattr(model, 'best_params_'):
+            # Nested CV: what the inner search chose on this fold
+            result['params'] = model.best_params_
+    except Exception as e:
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+def _summary(folds: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """One algorithm's fold results in the response shape of /validation/kfold."""
+    failed = [f for f in folds if 'error' in f]
+    if failed:
+        empty = {'mean': 0.0, 'std': 0.0, 'folds': []}
+        return {'error': failed[0]['error'], **{m: dict(empty) for m in METRICS},
+                'train_accuracy': {'mean': 0.0, 'std': 0.0}}
+    folds = sorted(folds, key=lambda f: f['fold'])
+    summary = {}
+    for metric in METRICS:
+        values = [f['scores'][metric] for f in folds]
+        summary[metric] = {'mean': float(np.mean(values)), 'std': float(np.std(values)), 'folds': values}
+    train = [f['train_accuracy'] for f in folds]
+    summary['train_accuracy'] = {'mean': float(np.mean(train)), 'std': float(np.std(train))}
+    if any('params' in f for f in folds):
+        summary['params'] = [f.get('params') for f in folds]
+    return summary
+
+
+def race(folds: Dict[str, List[Dict[str, Any]]], alive: List[str], alpha: float = RACE_ALPHA,
+         min_folds: int = RACE_MIN_FOLDS) -> Dict[str, Dict[str, Any]]:
+    """The candidates of `alive` to drop after the folds run so far, with why.
+
+    A failed candidate is dropped at once. The others are compared with the
+    leader (best mean ROC AUC) on the folds both have run: a one-sided
+    paired t-test below `alpha` means the candidate is very unlikely to
+    catch up, so its remaining folds are not worth fitting.
+    """
+    from scipy.stats import ttest_rel
+
+    dropped = {name: {'reason': 'failed'} for name in alive if any('error' in f for f in folds[name])}
+    scores = {name: [f['scores']['roc_auc'] for f in sorted(folds[name], key=lambda f: f['fold'])]
+              for name in alive if name not in dropped}
+    if len(scores) < 2 or min(len(v) for v in scores.values()) < min_folds:
+        return dropped
+    leader = max(scores, key=lambda name: np.mean(scores[name]))
+    for name, values in scores.items():
+        gap = np.asarray(scores[leader]) - np.asarray(values)
+        if name == leader or not gap.any():
+            continue
+        p_value = float(ttest_rel(scores[leader], values, alternative='greater').pvalue)
+        if p_value < alpha:
+            dropped[name] = {'reason': 'dominated', 'leader': leader, 'afterFolds': len(values),
+                             'pValue': p_value, 'gap': float(gap.mean())}
+    return dropped
+
+
+def config_hash(config) -> str:
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def _emit(progress, stage: str, message: str, percent: float, **fields):
+    if progress is not None:
+        progress({'stage': stage, 'message': message, 'progress': round(percent, 1), **fields})
+
+
+def holdout(path, config, test_size: float = 0.2, random_state: int = 42,
+            progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+            should_stop: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
+    """Fit every algorithm on one stratified train/test split; an 'algorithm' event per finished model."""
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score, confusion_matrix
+    from .training import TrainingCancelled
+
+    version = get_dataset(path).version()
+    X, y = split_xy(load_frame(path))
+
+    # Split data
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y,
+        test_size=test_size,
+        random_state=random_state,
+        stratify=y  # Đảm bảo tỷ lệ class giống nhau ở train và test
+    )
+
+    log.info('Train samples: %d (Stroke: %d, No stroke: %d)', len(X_train), y_train.sum(), (1 - y_train).sum())
+    log.info('Test samples: %d (Stroke: %d, No stroke: %d)', len(X_test), y_test.sum(), (1 - y_test).sum())
+
+    # The feature pipeline does not depend on the model: fit it once for all of them
+    _, Z_train, _, Z_test, _ = features.fit_transform(('holdout', str(path), version, test_size, random_state),
+                                                      X_train, y_train, X_test, y_test)
+
+    # Evaluate each algorithm
+    estimators = classifiers(config)
+    results = {}
+    for i, (name, model) in enumerate(estimators.items(), start=1):
+        if should_stop is not None and should_stop():
+            raise TrainingCancelled('Validation cancelled')
+        log.info('Running Holdout for %s...', name)
+
+        try:
+            # Train
+            model.fit(Z_train, y_train)
+
+            # Predict
+            y_train_pred = model.predict(Z_train)
+            y_test_pred = model.predict(Z_test)
+            y_test_proba = model.predict_proba(Z_test)[:, 1] if hasattr(model, 'predict_proba') else None
+
+            # Calculate metrics
+            train_metrics = {
+                'accuracy': float(accuracy_score(y_train, y_train_pred)),
+                'precision': float(precision_score(y_train, y_train_pred, average='macro', zero_division=0)),
+                'recall': float(recall_score(y_train, y_train_pred, average='macro', zero_division=0)),
+                'f1': float(f1_score(y_train, y_train_pred, average='macro', zero_division=0))
+            }
+
+            test_metrics = {
+                'accuracy': float(accuracy_score(y_test, y_test_pred)),
+                'precision': float(precision_score(y_test, y_test_pred, average='macro', zero_division=0)),
+                'recall': float(recall_score(y_test, y_test_pred, average='macro', zero_division=0)),
+                'f1': float(f1_score(y_test, y_test_pred, average='macro', zero_division=0))
+            }
+
+            if y_test_proba is not None:
+                test_metrics['roc_auc'] = float(roc_auc_score(y_test, y_test_proba))
+            else:
+                test_metrics['roc_auc'] = 0.0
+
+            # Confusion matrix
+            cm = confusion_matrix(y_test, y_test_pred)
+
+            results[name] = {
+                'train_metrics': train_metrics,
+                'test_metrics': test_metrics,
+                'confusion_matrix': {
+                    'tn': int(cm[0][0]),
+                    'fp': int(cm[0][1]),
+                    'fn': int(cm[1][0]),
+                    'tp': int(cm[1][1])
+                }
+            }
+
+            log.info('%s - Test Accuracy: %.4f, ROC-AUC: %.4f', name,
+                     test_metrics['accuracy'], test_metrics['roc_auc'])
+
+        except Exception as e:
+            log.error('Error in %s: %s', name, e)
+            results[name] = {'error': str(e)}
+        _emit(progress, 'algorithm', f'{name}: done', 100.0 * i / len(estimators), algorithm=name,
+              result=results[name])
+
+    return {
+        'results': results,
+        'method': 'holdout',
+        'test_size': test_size,
+        'train_samples': len(X_train),
+        'test_samples': len(X_test),
+        'dataset_size': len(y)
+    }
+
+
+class ValidationEngine:
+    """Cross-validation of every algorithm as one batch of (algorithm x fold) fits.
+
+    With workers > 1 the fits run on a process pool that is created once
+    and reused by every request; each worker keeps the encoded fold matrices
+    it has built (see fold_matrices), so only the estimator and the fold
+    number travel with a task. Results are memoised by (config hash, CV
+    scheme, racing, dataset hash): asking again for the same validation returns at once.
+    """
+
+    def __init__(self, workers: int = 1, cache_size: int = 32):
+        self.workers = workers or os.cpu_count() or 1
+        self._results = LRUCache(maxsize=cache_size)
+        self._pool = None
+        self._pool_pid = None
+        self._pool_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(workers=int(os.getenv('VALIDATION_WORKERS', 1)),
+                   cache_size=int(os.getenv('VALIDATION_CACHE_SIZE', 32)))
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            # A pool must not cross a fork (e.g. gunicorn preload)
+            if self._pool is None or self._pool_pid != os.getpid():
+                context = multiprocessing.get_context(os.getenv('TRAINING_START_METHOD', 'spawn'))
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                self._pool_pid = os.getpid()
+                log.info('Started validation pool with %d workers', self.workers)
+            return self._pool
+
+    def close(self):
+        with self._pool_lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def kfold(self, path, config, k: int, cv: str = DEFAULT_CV, repeats: int = 1, racing: bool = False,
+              progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+              should_stop: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
+        """{'results': {algorithm: summary}, 'cached', 'seconds', ...}.
+
+        `config` is a model_config.json dict, or a list of them to compare
+        (see candidates). `cv` is one of CV_MODES; `repeats` only applies
+        to 'repeated_stratified'. With `racing` the folds run one at a time
+        for every candidate still in the race and dominated candidates are
+        dropped (see race); their summaries cover the folds they ran and
+        carry an 'eliminated' entry.
+
+        `progress` gets a 'fold' event for every finished fit and an
+        'algorithm' event with the summary once an algorithm is done or
+        dropped (also for a memoised result). `should_stop` is polled between
+        fits; when it returns True the run raises TrainingCancelled.
+        """
+        if cv not in CV_MODES:
+            raise ValueError(f'cv must be one of {", ".join(CV_MODES)}')
+        started = time.perf_counter()
+        config = config or DEFAULT_CONFIG
+        repeats = repeats if cv == 'repeated_stratified' else 1
+        scheme = (cv, k, repeats)
+        version = get_dataset(path).version()
+        key = (config_hash(config), scheme, bool(racing), version)
+        cached = self._results.get(key)
+        if cached is not None:
+            RUNS.inc(source='cache')
+            for i, (name, summary) in enumerate(cached['results'].items(), start=1):
+                _emit(progress, 'algorithm', f'{name}: cached', 100.0 * i / len(cached['results']),
+                      algorithm=name, result=summary)
+            return {**cached, 'cached': True, 'seconds': time.perf_counter() - started}
+
+        estimators = candidates(config)
+        if cv == 'nested':
+            estimators = {name: nested_search(estimator) for name, estimator in estimators.items()}
+        n_folds = k * repeats
+        total = len(estimators) * n_folds
+        folds: Dict[str, List[Dict[str, Any]]] = {name: [] for name in estimators}
+        eliminated: Dict[str, Dict[str, Any]] = {}
+
+        def summary(name):
+            result = _summary(folds[name])
+            if name in eliminated:
+                result['eliminated'] = eliminated[name]
+            return result
+
+        def collect(result):
+            name = result['name']
+            folds[name].append(result)
+            done = sum(len(runs) for runs in folds.values())
+            auc = result.get('scores', {}).get('roc_auc')
+            _emit(progress, 'fold', f"{name}: fold {result['fold'] + 1}/{n_folds} "
+                                    f"{'ROC AUC %.4f' % auc if auc is not None else 'failed'}", 100.0 * done / total,
+                  algorithm=name, fold=result['fold'] + 1, folds=n_folds, scores=result.get('scores'),
+                  error=result.get('error'))
+            if len(folds[name]) == n_folds:
+                _emit(progress, 'algorithm', f'{name}: done', 100.0 * done / total, algorithm=name,
+                      result=summary(name))
+
+        def check():
+            if should_stop is not None and should_stop():
+                from .training import TrainingCancelled
+                raise TrainingCancelled('Validation cancelled')
+
+        def run(tasks):
+            if self.workers <= 1:
+                for task in tasks:
+                    collect(_fold_scores(*task))
+                    check()
+            else:
+                self._run_pool(tasks, collect, check)
+
+        if not racing:
+            run([(str(path), scheme, fold, name, estimator)
+                 for name, estimator in estimators.items() for fold in range(n_folds)])
+        else:
+            alive = list(estimators)
+            for fold in range(n_folds):
+                run([(str(path), scheme, fold, name, estimators[name]) for name in alive])
+                if fold + 1 == n_folds:
+                    break
+                for name, why in race(folds, alive).items():
+                    alive.remove(name)
+                    eliminated[name] = {**why, 'afterFolds': len(folds[name])}
+                    log.info('Racing: dropped %s after %d folds (%s)', name, len(folds[name]), why['reason'])
+                    done = sum(len(runs) for runs in folds.values())
+                    _emit(progress, 'algorithm', f"{name}: dropped ({why['reason']})", 100.0 * done / total,
+                          algorithm=name, result=summary(name))
+
+        results = {name: summary(name) for name in estimators}
+        for name, result in results.items():
+            if 'error' in result:
+                log.error('Error in %s: %s', name, result['error'])
+            else:
+                log.info('%s - Accuracy: %.4f (+/- %.4f)', name,
+                         result['accuracy']['mean'], result['accuracy']['std'])
+        fits = sum(len(runs) for runs in folds.values())
+        fit_seconds = sum(f['seconds'] for runs in folds.values() for f in runs)
+        outcome = {'results': results, 'datasetHash': version, 'configHash': key[0], 'fitSeconds': fit_seconds,
+                   'cv': cv, 'folds': n_folds, 'fits': fits}
+        if racing:
+            outcome['racing'] = {'fits': fits, 'fitsTotal': total, 'eliminated': eliminated,
+                                 'alpha': RACE_ALPHA, 'minFolds': RACE_MIN_FOLDS}
+        # Only a consistent run is worth remembering: every fit saw the dataset this key names
+        if all(f['version'] == version for runs in folds.values() for f in runs) \
+                and not any('error' in r for r in results.values()):
+            self._results.put(key, outcome)
+        RUNS.inc(source='computed')
+        return {**outcome, 'cached': False, 'seconds': time.perf_counter() - started}
+
+    def _run_pool(self, tasks, collect, check):
+        try:
+            pending = {self._executor().submit(_fold_scores, *task) for task in tasks}
+        except BrokenProcessPool:
+            self.close()
+            pending = {self._executor().submit(_fold_scores, *task) for task in tasks}
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future.result())
+                check()
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory): the next request starts a fresh pool
+            self.close()
+            raise
+        finally:
+            # Fits already running finish in the pool; the rest are dropped
+            for future in pending:
+                future.cancel()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self._results.stats()
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> ValidationEngine:
+    """The process-wide validation engine (VALIDATION_WORKERS, VALIDATION_CACHE_SIZE)."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = ValidationEngine.from_env()
+            atexit.register(_engine.close)
+        return _engine
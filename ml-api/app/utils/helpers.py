@@ -18,3 +18,12 @@ def validate_input(data):
         errors.append('Giới tính không hợp lệ.')
 
     return errors
+
+
+def read_csv_records(stream):
+    """Parse an uploaded CSV file into a list of row dicts (empty cells become None)."""
+    import pandas as pd
+
+    df = pd.read_csv(stream)
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict(orient='records')
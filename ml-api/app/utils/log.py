@@ -0,0 +1,32 @@
+import os
+import sys
+import logging
+import threading
+
+_lock = threading.Lock()
+_configured = False
+
+
+def _configure():
+    global _configured
+    with _lock:
+        if _configured:
+            return
+        root = logging.getLogger('ml_api')
+        root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s [%(name)s] %(message)s'))
+        root.addHandler(handler)
+        root.propagate = False
+        _configured = True
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger `ml_api.<name>`; the level comes from LOG_LEVEL (DEBUG, INFO, WARNING, ...).
+
+    Pass arguments separately (log.debug('x %s', y)) so messages below the
+    level are neither formatted nor written.
+    """
+    if not _configured:
+        _configure()
+    return logging.getLogger(f'ml_api.{name}')
@@ -0,0 +1,78 @@
+"""Training time vs dataset size: full retrain against an incremental update.
+
+For each size N the cleaned dataset is resampled (with small noise on the
+numeric columns) to N rows. Every algorithm is fitted once on them; then a
+batch of new rows is added either by refitting from scratch on N + batch
+rows (full) or with update_pipeline (incremental). Nothing is written to
+app/models or the labeled store.
+
+    python benchmarks/incremental.py --sizes 5000 20000 50000 --batch 500
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import numpy as np  # noqa: E402
+from sklearn.base import clone  # noqa: E402
+from sklearn.pipeline import Pipeline  # noqa: E402
+
+from app.services.training import NUM_COLS, CAT_COLS, TARGET_COL, build_preprocessor, get_algorithms, load_data  # noqa: E402
+from app.services.incremental import update_pipeline  # noqa: E402
+
+
+def resample(df, n, rng):
+    rows = df.iloc[rng.integers(len(df), size=n)].reset_index(drop=True)
+    for column in NUM_COLS:
+        rows[column] = rows[column] * rng.normal(1.0, 0.02, size=n)
+    return rows
+
+
+def run(size, batch, algorithms, rng):
+    df = resample(load_data(0), size + batch, rng)
+    X, y = df[NUM_COLS + CAT_COLS], df[TARGET_COL]
+    X_seen, y_seen, X_new, y_new = X.iloc[:size], y.iloc[:size], X.iloc[size:], y.iloc[size:]
+    results = []
+    for name, estimator in algorithms.items():
+        pipeline = Pipeline(steps=[('preprocessor', build_preprocessor()), ('model', estimator)])
+        started = time.perf_counter()
+        clone(pipeline).fit(X, y)
+        full = time.perf_counter() - started
+        pipeline.fit(X_seen, y_seen)
+        started = time.perf_counter()
+        method = update_pipeline(pipeline, X_new, y_new, X_seen, y_seen)
+        incremental = time.perf_counter() - started
+        results.append({'rows': size, 'algorithm': name, 'full': full, 'incremental': incremental,
+                        'method': method, 'speedup': full / incremental})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5000, 20000, 50000])
+    parser.add_argument('--batch', type=int, default=500, help='new labeled rows per update')
+    parser.add_argument('--algorithms', nargs='*', default=None)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    algorithms = get_algorithms(names=args.algorithms)
+    print(f'New rows per update: {args.batch}')
+    print(f"{'rows':>8}  {'algorithm':<20}{'full s':>9}{'update s':>10}  {'method':<12}{'speedup':>8}")
+    results = []
+    for size in args.sizes:
+        for r in run(size, args.batch, algorithms, rng):
+            results.append(r)
+            print(f"{r['rows']:>8}  {r['algorithm']:<20}{r['full']:>9.3f}{r['incremental']:>10.3f}  "
+                  f"{r['method']:<12}{r['speedup']:>7.1f}x")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'batch': args.batch, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+"""Latency / throughput benchmark for the prediction service and routes.
+
+Runs in-process: per-model scoring, PredictionService.predict and
+predict_batch (the ensemble), and the Flask routes through the test client,
+each over a grid of batch sizes and thread counts. Patients are sampled from
+the stroke dataset with a little jitter on the numeric fields.
+
+    python benchmarks/inference.py                          # full grid
+    python benchmarks/inference.py --quick
+    python benchmarks/inference.py --compare benchmarks/baseline.json
+
+Results (p50/p95/p99 ms per call, rows/s) are written as JSON to --output;
+with --compare, cells whose p95 latency rose or whose throughput fell by more
+than --threshold are listed and the exit status is 1.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DATASET = os.path.join(ROOT, 'app', 'data', 'healthcare-dataset-stroke-data.csv')
+SCENARIOS = ('model', 'predict', 'predict_batch', 'route_predict', 'route_batch')
+# Settings that change what is being measured, recorded with every run
+ENV_KEYS = ('FAST_INFERENCE', 'SCORING_MODE', 'SCORING_WORKERS', 'MODEL_TIMEOUT', 'KNN_ENGINE',
+            'MODEL_FORMAT', 'MODEL_MMAP', 'PREDICTION_CACHE_SIZE', 'MODELS_ALLOWLIST')
+
+
+def synthetic_patients(n: int, seed: int = 0):
+    """n request payloads (frontend field names) drawn from the dataset."""
+    import pandas as pd
+    rng = np.random.RandomState(seed)
+    df = pd.read_csv(DATASET)
+    df['bmi'] = pd.to_numeric(df['bmi'], errors='coerce')
+    df['bmi'] = df['bmi'].fillna(df['bmi'].median())
+    df = df.sample(n, replace=True, random_state=rng).reset_index(drop=True)
+    df['age'] = (df['age'] + rng.uniform(-1, 1, n)).clip(0.1, 120).round(1)
+    df['avg_glucose_level'] = (df['avg_glucose_level'] * rng.uniform(0.95, 1.05, n)).round(2)
+    df['bmi'] = (df['bmi'] * rng.uniform(0.95, 1.05, n)).clip(10, 95).round(1)
+    patients = []
+    for row in df.to_dict('records'):
+        patients.append({
+            'citizenId': f"BENCH{row['id']}",
+            'gender': row['gender'],
+            'age': float(row['age']),
+            'hypertension': int(row['hypertension']),
+            'heartDisease': int(row['heart_disease']),
+            'ever_married': row['ever_married'],
+            'work_type': row['work_type'],
+            'residenceType': row['Residence_type'],
+            'avgGlucoseLevel': float(row['avg_glucose_level']),
+            'bmi': float(row['bmi']),
+            'smoking_status': row['smoking_status'],
+        })
+    return patients
+
+
+def measure(make_call, batch: int, threads: int, duration: float, min_calls: int):
+    """Run calls from `threads` threads for about `duration` seconds.
+
+    make_call(thread_index) returns the zero-argument function one thread
+    calls repeatedly; each call handles `batch` rows.
+    """
+    latencies, errors = [], []
+    lock = threading.Lock()
+    calls = [0]
+    barrier = threading.Barrier(threads + 1)
+    deadline = [0.0]
+
+    def worker(i):
+        call = make_call(i)
+        local = []
+        barrier.wait()
+        while True:
+            with lock:
+                if calls[0] >= min_calls and time.perf_counter() >= deadline[0]:
+                    break
+                calls[0] += 1
+            started = time.perf_counter()
+            try:
+                call()
+            except Exception as e:  # keep measuring, report the failure count
+                errors.append(str(e))
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    deadline[0] = time.perf_counter() + duration
+    started = time.perf_counter()
+    barrier.wait()
+    for t in workers:
+        t.join()
+    wall = time.perf_counter() - started
+
+    ms = np.array(latencies) * 1000
+    return {
+        'calls': len(ms),
+        'errors': len(errors),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'rows_per_s': len(ms) * batch / wall if wall else 0.0,
+    }
+
+
+def run_suite(args):
+    from app import create_app
+    from app.routes import predictions
+
+    service = predictions.service
+    service.flush_history()
+    registry, _ = service._model_state()
+    app = create_app()
+    prefix = f"/api/{app.config['API_VERSION']}/predictions"
+
+    pool = synthetic_patients(max(args.batch_sizes) * 2)
+    adapted = [service._adapt_payload(p) for p in pool]
+    frames = {b: service._to_frame(adapted[:b]) for b in args.batch_sizes}
+    results = []
+
+    def cell(scenario, target, batch, threads, make_call):
+        stats = measure(make_call, batch, threads, args.duration, args.min_calls)
+        row = {'scenario': scenario, 'target': target, 'batch': batch, 'threads': threads, **stats}
+        results.append(row)
+        print(f"{scenario:<14}{target:<20}{batch:>7}{threads:>4}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+              f"{stats['p99_ms']:>10.2f}{stats['rows_per_s']:>12.0f}{stats['errors']:>6}", file=sys.stderr)
+
+    def rotating(items, i):
+        # Each thread walks the pool from its own offset
+        state = {'k': i * 7919}
+
+        def next_item():
+            state['k'] += 1
+            return items[state['k'] % len(items)]
+        return next_item
+
+    print(f"{'scenario':<14}{'target':<20}{'batch':>7}{'thr':>4}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'p99 ms':>10}{'rows/s':>12}{'err':>6}", file=sys.stderr)
+    for threads in args.threads:
+        if 'model' in args.scenarios:
+            for name, model in registry.models().items():
+                compiled = registry.compiled(name)
+                for batch in args.batch_sizes:
+                    if batch == 1 and compiled is not None:
+                        # Single rows are served by the compiled fast path
+                        cell('model', name, 1, threads,
+                             lambda i, c=compiled: (lambda nxt=rotating(adapted, i): c.predict_proba(nxt())))
+                    else:
+                        cell('model', name, batch, threads,
+                             lambda i, m=model, f=frames[batch]: (lambda: m.predict_proba(f)))
+        if 'predict' in args.scenarios:
+            cell('predict', 'ensemble', 1, threads,
+                 lambda i: (lambda nxt=rotating(pool, i): service.predict(nxt())))
+        if 'predict_batch' in args.scenarios:
+            for batch in args.batch_sizes:
+                cell('predict_batch', 'ensemble', batch, threads,
+                     lambda i, b=batch: (lambda: service.predict_batch(pool[:b])))
+        if 'route_predict' in args.scenarios:
+            def route_predict(i):
+                client, nxt = app.test_client(), rotating(pool, i)
+
+                def call():
+                    response = client.post(f'{prefix}/predict', json=nxt())
+                    if response.status_code != 200:
+                        raise RuntimeError(f'HTTP {response.status_code}')
+                return call
+            cell('route_predict', 'POST /predict', 1, threads, route_predict)
+        if 'route_batch' in args.scenarios:
+            for batch in args.batch_sizes:
+                def route_batch(i, b=batch):
+                    client, body = app.test_client(), json.dumps(pool[:b])
+
+                    def call():
+                        response = client.post(f'{prefix}/predict/batch', data=body,
+                                               content_type='application/json')
+                        if response.status_code != 200:
+                            raise RuntimeError(f'HTTP {response.status_code}')
+                    return call
+                cell('route_batch', 'POST /predict/batch', batch, threads, route_batch)
+    service.flush_history()
+    return results
+
+
+def metadata(args):
+    import sklearn
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'createdAt': datetime.utcnow().isoformat() + 'Z',
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'duration': args.duration,
+        'env': {k: os.environ[k] for k in ENV_KEYS if k in os.environ},
+    }
+
+
+def key(row):
+    return (row['scenario'], row['target'], row['batch'], row['threads'])
+
+
+def compare(results, baseline, threshold):
+    """Cells that got slower (p95) or lost throughput by more than threshold."""
+    previous = {key(r): r for r in baseline['results']}
+    regressions = []
+    for row in results:
+        old = previous.get(key(row))
+        if old is None:
+            continue
+        p95 = row['p95_ms'] / old['p95_ms'] - 1 if old['p95_ms'] else 0.0
+        rate = 1 - row['rows_per_s'] / old['rows_per_s'] if old['rows_per_s'] else 0.0
+        if p95 > threshold or rate > threshold:
+            regressions.append({**dict(zip(('scenario', 'target', 'batch', 'threads'), key(row))),
+                                'p95_change': p95, 'throughput_change': -rate,
+                                'p95_ms': [old['p95_ms'], row['p95_ms']],
+                                'rows_per_s': [old['rows_per_s'], row['rows_per_s']]})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 100, 1000, 10000])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--duration', type=float, default=1.0, help='seconds per cell')
+    parser.add_argument('--min-calls', type=int, default=5, help='calls per cell at least')
+    parser.add_argument('--quick', action='store_true', help='batch sizes 1/100, threads 1/4, 0.3 s per cell')
+    parser.add_argument('--output', default=os.path.join(ROOT, 'benchmarks', 'results', 'latest.json'))
+    parser.add_argument('--compare', help='baseline results file to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.15, help='allowed relative change (default 15%%)')
+    args = parser.parse_args()
+    if args.quick:
+        args.batch_sizes, args.threads, args.duration = [1, 100], [1, 4], 0.3
+
+    # Measure scoring, not the cache, and keep the real history untouched
+    tmp = tempfile.mkdtemp(prefix='bench-')
+    os.environ.setdefault('PREDICTION_CACHE_SIZE', '0')
+    os.environ.setdefault('MODEL_LOADING', 'eager')
+    os.environ.setdefault('MODEL_RELOAD_INTERVAL', '0')
+    os.environ['HISTORY_FILE'] = os.path.join(tmp, 'history.jsonl')
+    os.environ['HISTORY_BACKEND'] = 'jsonl'
+    os.environ['LEGACY_HISTORY_FILE'] = os.path.join(tmp, 'history.json')
+    os.environ.setdefault('MAX_BATCH_SIZE', str(max(args.batch_sizes)))
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.chdir(ROOT)
+
+    results = run_suite(args)
+
+    report = {'meta': metadata(args), 'results': results}
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f'Wrote {len(results)} results to {args.output}')
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for r in regressions:
+            print(f"REGRESSION {r['scenario']} {r['target']} batch={r['batch']} threads={r['threads']}: "
+                  f"p95 {r['p95_ms'][0]:.2f} -> {r['p95_ms'][1]:.2f} ms ({r['p95_change']:+.0%}), "
+                  f"rows/s {r['rows_per_s'][0]:.0f} -> {r['rows_per_s'][1]:.0f} ({r['throughput_change']:+.0%})")
+        print(f'{len(regressions)} regression(s) against {args.compare} (threshold {args.threshold:.0%})')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
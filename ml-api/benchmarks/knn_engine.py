@@ -0,0 +1,96 @@
+"""Exact sklearn KNN vs the KNNEngine indexes as the training set grows.
+
+The trained knn.joblib is the 1x reference; larger training sets are made by
+replicating its rows with jitter on the numeric columns. For each size and
+index it reports build time, single-query p50, 1000-row batch time, and how
+closely the engine reproduces sklearn (agreement / neighbour recall).
+
+    python benchmarks/knn_engine.py --scales 1 10 100 --probes 2 8 32
+"""
+import os
+import sys
+import time
+import json
+import argparse
+import statistics
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.knn_engine import KNNEngine, compare  # noqa: E402
+
+
+def scaled_training_set(knn, scale: int, rng):
+    X, y = knn._fit_X, knn.classes_[knn._y]
+    if scale == 1:
+        return X, y
+    numeric = X.std(axis=0) > 1
+    big = np.vstack([X + rng.normal(scale=1.0, size=X.shape) * numeric for _ in range(scale)])
+    return big, np.tile(y, scale)
+
+
+def p50_ms(fn, queries):
+    times = []
+    for q in queries:
+        started = time.perf_counter()
+        fn(q[None, :])
+        times.append(time.perf_counter() - started)
+    return statistics.median(times) * 1000
+
+
+def batch_ms(fn, queries):
+    started = time.perf_counter()
+    fn(queries)
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default='app/models/knn.joblib')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 30, 100])
+    parser.add_argument('--probes', type=int, nargs='+', default=[2, 8, 32])
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    import joblib
+    from sklearn.neighbors import KNeighborsClassifier
+
+    reference = joblib.load(args.model)[-1]
+    rng = np.random.RandomState(0)
+    results = []
+    for scale in args.scales:
+        X, y = scaled_training_set(reference, scale, rng)
+        knn = KNeighborsClassifier(n_neighbors=reference.n_neighbors).fit(X, y)
+        queries = X[rng.choice(len(X), args.queries, replace=False)] + rng.normal(size=(args.queries, X.shape[1])) * (X.std(axis=0) > 1)
+        single = queries[:100]
+
+        rows = [{'engine': 'sklearn', 'build_s': 0.0,
+                 'single_p50_ms': p50_ms(knn.predict_proba, single),
+                 'batch_ms': batch_ms(knn.predict_proba, queries),
+                 'agreement': 1.0, 'recall': 1.0}]
+        configs = [('brute', {}), ('kdtree', {})] + [(f'ivf/{p}', {'n_probe': p}) for p in args.probes]
+        for label, options in configs:
+            started = time.perf_counter()
+            engine = KNNEngine(knn, index=label.split('/')[0], **options)
+            build = time.perf_counter() - started
+            rows.append({'engine': label, 'build_s': build,
+                         'single_p50_ms': p50_ms(engine.predict_proba, single),
+                         'batch_ms': batch_ms(engine.predict_proba, queries),
+                         **{k: v for k, v in compare(knn, engine, queries[:200]).items() if k != 'maxDiff'}})
+
+        print(f'\n{len(X):,} training rows ({scale}x)')
+        print(f"{'engine':<10}{'build s':>9}{'single p50 ms':>15}{'batch ms':>10}{'agree':>8}{'recall':>8}")
+        for row in rows:
+            print(f"{row['engine']:<10}{row['build_s']:>9.2f}{row['single_p50_ms']:>15.3f}"
+                  f"{row['batch_ms']:>10.1f}{row['agreement']:>8.1%}{row['recall']:>8.1%}")
+            results.append({'rows': len(X), 'scale': scale, **row})
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Streaming (out-of-core) training and validation on large synthetic datasets: time and peak memory.
+
+For each size N a CSV of N rows is written (once, a chunk at a time) by
+resampling the cleaned dataset with small noise on the numeric columns.
+out_of_core.train, and with --cv-folds out_of_core.kfold, then run on it in
+a fresh process each, so the peak RSS reported is theirs alone. --in-memory
+adds training.train on the same file for comparison (only sizes that fit).
+Models are written to a temporary directory, never app/models.
+
+    python benchmarks/out_of_core.py --sizes 1000000 10000000 --algorithms logistic_regression gradient_boosting
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import numpy as np  # noqa: E402
+
+
+def generate(path, size, chunk=500_000, seed=0):
+    from app.services.features import NUM_COLS, TARGET_COL, FEATURE_COLUMNS
+    from app.services.training import load_data
+
+    df = load_data(0)[FEATURE_COLUMNS + [TARGET_COL]]
+    rng = np.random.default_rng(seed)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for start in range(0, size, chunk):
+            n = min(chunk, size - start)
+            rows = df.iloc[rng.integers(len(df), size=n)].reset_index(drop=True)
+            for column in NUM_COLS:
+                rows[column] = (rows[column] * rng.normal(1.0, 0.02, size=n)).round(2)
+            rows.to_csv(f, header=start == 0, index=False)
+
+
+def _child(args):
+    """Runs in the measured process: one job, then its result and peak RSS as JSON on stdout."""
+    from app.services import out_of_core, training
+
+    started = time.perf_counter()
+    if args.job == 'train':
+        run = out_of_core.train(args.data, algorithms=args.algorithms, model_dir=args.model_dir)
+        scores = {name: m['roc_auc'] for name, m in run['models'].items()}
+    elif args.job == 'kfold':
+        run = out_of_core.kfold(args.data, args.cv_folds, algorithms=args.algorithms)
+        scores = {name: r['roc_auc']['mean'] for name, r in run['results'].items()}
+    else:
+        training.DATA_PATH = args.data
+        run = training.train(algorithms=args.algorithms, model_dir=args.model_dir)
+        scores = {name: m['roc_auc'] for name, m in run['models'].items()}
+    # ru_maxrss is in KiB on Linux
+    print(json.dumps({'seconds': time.perf_counter() - started, 'scores': scores,
+                      'peak_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+
+
+def measure(job, data, args, model_dir):
+    command = [sys.executable, os.path.abspath(__file__), '--child', job, '--data', data, '--model-dir', model_dir,
+               '--cv-folds', str(args.cv_folds)]
+    if args.algorithms:
+        command += ['--algorithms', *args.algorithms]
+    output = subprocess.run(command, check=True, capture_output=True, text=True, cwd=ROOT).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000_000, 10_000_000])
+    parser.add_argument('--algorithms', nargs='*', default=['logistic_regression', 'gradient_boosting'])
+    parser.add_argument('--cv-folds', type=int, default=0, help='also run a streamed K-Fold validation')
+    parser.add_argument('--in-memory', type=int, default=0,
+                        help='also run the in-memory training for sizes up to this many rows')
+    parser.add_argument('--dir', default=tempfile.gettempdir(), help='where the synthetic CSVs are written')
+    parser.add_argument('--keep', action='store_true', help='keep the synthetic CSVs (reused by the next run)')
+    parser.add_argument('--json', help='also write the results to this file')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--data', help=argparse.SUPPRESS)
+    parser.add_argument('--model-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        args.job = args.child
+        return _child(args)
+
+    print(f"{'rows':>10}  {'job':<10}{'MB csv':>9}{'seconds':>9}{'peak MB':>9}  ROC AUC")
+    results = []
+    for size in args.sizes:
+        data = os.path.join(args.dir, f'stroke-synthetic-{size}.csv')
+        if not os.path.exists(data):
+            generate(data, size)
+        jobs = ['train'] + (['kfold'] if args.cv_folds else []) + (['in-memory'] if size <= args.in_memory else [])
+        with tempfile.TemporaryDirectory() as model_dir:
+            for job in jobs:
+                r = {'rows': size, 'job': job, 'csv_mb': os.path.getsize(data) / 2 ** 20,
+                     **measure(job, data, args, model_dir)}
+                results.append(r)
+                scores = ', '.join(f'{name} {auc:.4f}' for name, auc in r['scores'].items())
+                print(f"{size:>10}  {job:<10}{r['csv_mb']:>9.0f}{r['seconds']:>9.1f}{r['peak_mb']:>9.0f}  {scores}")
+        if not args.keep:
+            os.remove(data)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Wall-clock time of serial vs process-pool training.
+
+Trains every algorithm once serially and once per worker count, each into
+a temporary directory, and reports wall time, the time the fits and CV
+folds themselves took, and the speedup against the serial run. The served
+models in app/models are not touched.
+
+    python benchmarks/training.py --workers 2 4 --cv-folds 5 --rf-jobs 1
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from app.services.training import train  # noqa: E402
+
+
+def run(workers, args):
+    with tempfile.TemporaryDirectory(prefix='train-bench-') as model_dir:
+        result = train(algorithms=args.algorithms, cv_folds=args.cv_folds, model_dir=model_dir,
+                       workers=workers, rf_jobs=args.rf_jobs)
+    return {
+        'workers': result['workers'],
+        'seconds': result['seconds'],
+        'taskSeconds': result['taskSeconds'],
+        'fitSeconds': {name: t.get('fit') for name, t in result['timings'].items()},
+        'rocAuc': {name: m['roc_auc'] for name, m in result['models'].items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4],
+                        help='pool sizes to compare with the serial run (0 = one per CPU)')
+    parser.add_argument('--cv-folds', type=int, default=0)
+    parser.add_argument('--rf-jobs', type=int, default=None, help='random forest n_jobs in every run')
+    parser.add_argument('--algorithms', nargs='*', default=None)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    print(f'CPUs: {os.cpu_count()}, CV folds: {args.cv_folds or "-"}, random forest n_jobs: {args.rf_jobs}')
+    runs = [run(1, args)] + [run(w, args) for w in args.workers]
+    serial = runs[0]['seconds']
+    print(f"{'workers':>8}{'wall s':>9}{'tasks s':>9}{'speedup':>9}")
+    for r in runs:
+        r['speedup'] = serial / r['seconds']
+        print(f"{r['workers']:>8}{r['seconds']:>9.2f}{r['taskSeconds']:>9.2f}{r['speedup']:>8.2f}x")
+    # Parallel runs must train the same models
+    drift = max(abs((r['rocAuc'][n] or 0) - (runs[0]['rocAuc'][n] or 0)) for r in runs for n in r['rocAuc'])
+    print(f'Max ROC AUC difference from the serial run: {drift:.2g}')
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'cpus': os.cpu_count(), 'cvFolds': args.cv_folds, 'rfJobs': args.rf_jobs, 'runs': runs},
+                      f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
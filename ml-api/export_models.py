@@ -0,0 +1,76 @@
+import sys
+import json
+import time
+import argparse
+import subprocess
+from pathlib import Path
+
+from app.services.dataset import get_dataset
+from app.services.model_artifacts import (
+    export_compact, load_model, artifact_size, compact_path
+)
+
+MODEL_DIR = Path('app/models')
+MANIFEST_FILE = MODEL_DIR / 'models.json'
+DATA_PATH = Path('app/Dataset/healthcare-dataset-stroke-data.csv')
+FEATURE_COLS = ['age', 'avg_glucose_level', 'bmi', 'gender', 'hypertension', 'heart_disease',
+                'ever_married', 'work_type', 'Residence_type', 'smoking_status']
+
+
+def timed_load(path, mmap):
+    """Load time measured in a fresh interpreter, so nothing is cached in-process."""
+    code = ('import time, sys, sklearn.pipeline, sklearn.compose, sklearn.impute, sklearn.preprocessing, '
+            'sklearn.linear_model, sklearn.ensemble, sklearn.neighbors; '
+            'from app.services.model_artifacts import load_model; '
+            f't = time.perf_counter(); load_model(sys.argv[1], mmap={mmap}); print(time.perf_counter() - t)')
+    out = subprocess.run([sys.executable, '-c', code, str(path)], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def sample_rows(n=2000):
+    if not DATA_PATH.exists():
+        return None
+    df = get_dataset(DATA_PATH).frame()
+    return df[FEATURE_COLS].sample(min(n, len(df)), random_state=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export trained .joblib models as compact artifacts')
+    parser.add_argument('names', nargs='*', help='models to export (default: all)')
+    parser.add_argument('--float32', action='store_true', help='store float64 arrays as float32')
+    parser.add_argument('--max-diff', type=float, default=1e-4,
+                        help='refuse a float32 export whose probabilities move more than this')
+    args = parser.parse_args()
+
+    X = sample_rows()
+    files = sorted(MODEL_DIR.glob('*.joblib'))
+    if args.names:
+        files = [f for f in files if f.stem in args.names]
+
+    print(f"{'model':<22}{'joblib KB':>10}{'compact KB':>11}{'load ms':>9}{'mmap ms':>9}{'max diff':>10}")
+    exported = []
+    for path in files:
+        model = load_model(path)
+        target = compact_path(str(path))
+        meta = export_compact(model, target, float32=args.float32, X=X, max_diff=args.max_diff)
+        diff = meta.get('maxDiff', 0.0)
+        print(f"{path.stem:<22}{artifact_size(path) / 1024:>10.0f}{artifact_size(target) / 1024:>11.0f}"
+              f"{timed_load(path, False) * 1000:>9.1f}{timed_load(target, True) * 1000:>9.1f}{diff:>10.2g}")
+        exported.append((path.stem, target, meta))
+
+    # Record the artifacts in the manifest; rewriting it also triggers the API's hot reload
+    if MANIFEST_FILE.exists() and exported:
+        with open(MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        by_name = {name: (target, meta) for name, target, meta in exported}
+        for entry in manifest:
+            if entry.get('name') in by_name:
+                target, meta = by_name[entry['name']]
+                entry['compact'] = {'path': target, 'float32': meta['float32'],
+                                    'arrays': len(meta['arrays']), 'exported_at': time.time()}
+        with open(MANIFEST_FILE, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Production server config: gunicorn -c gunicorn.conf.py run:app
+
+The app (and every model) is loaded once in the master before the workers
+are forked, so the model arrays are shared copy-on-write between workers.
+Use /health/memory to compare RSS/PSS per worker.
+"""
+import gc
+import os
+
+os.environ.setdefault('APP_SERVER', 'gunicorn')
+os.environ.setdefault('FLASK_DEBUG', '0')
+
+bind = f"0.0.0.0:{os.getenv('PORT', 8000)}"
+workers = int(os.getenv('WEB_WORKERS', 2))
+threads = int(os.getenv('WEB_THREADS', 8))
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.getenv('WEB_TIMEOUT', 120))
+preload_app = os.getenv('WEB_PRELOAD', '1') == '1'
+accesslog = '-'
+
+# Models must be in memory before fork to be shared (and no warm-up thread may cross a fork)
+if preload_app:
+    os.environ.setdefault('MODEL_LOADING', 'eager')
+
+# Memory-map model arrays so hot reloads in each worker still share one page-cache copy
+os.environ.setdefault('MODEL_MMAP', '1')
+
+# A JSONL log cannot be compacted safely by several processes; SQLite can. A .jsonl HISTORY_FILE is
+# then read from the .sqlite3 file next to it, its records imported once (see create_history_store)
+if workers > 1:
+    os.environ.setdefault('HISTORY_BACKEND', 'sqlite')
+
+# Keep the collector from touching (and so un-sharing) preloaded pages while they are loaded
+if preload_app:
+    gc.disable()
+
+
+def when_ready(server):
+    # Everything allocated so far (models included) moves to the permanent generation
+    gc.freeze()
+    # Frozen objects are never scanned, so the master can collect again
+    gc.enable()
+    from app.utils.memory import process_memory
+    server.log.info(f"Master memory after preload: {process_memory()}")
+
+
+def post_fork(server, worker):
+    gc.enable()
+
+
+def post_worker_init(worker):
+    from app.utils.memory import process_memory
+    worker.log.info(f"Worker memory: {process_memory()}")